@@ -0,0 +1,9 @@
+"""Run the command line interface with python -m apsjournals
+"""
+
+
+import sys
+from apsjournals import cli
+
+
+sys.exit(cli.main())
@@ -18,9 +18,14 @@ Classes defined with brief descriptions:
 import collections
 import datetime
 import itertools
+import sys
 import typing
+from apsjournals.web import aio
 from apsjournals.web import scrapers
-from apsjournals import pdf
+from apsjournals.web import store
+from apsjournals import export
+from apsjournals import metrics
+from apsjournals import util
 
 
 class Journal:
@@ -46,13 +51,39 @@ class Journal:
     def __repr__(self):
         return 'Journal({!r})'.format(self.name if self.short_name is None else self.short_name)
 
+    def _load_index(self, volume: int=None) -> scrapers.JournalIndexInfo:
+        """Load the journal index page, caching the volume list along with the issue list
+        of every volume expanded on the page, so that both come from a single fetch. Volumes
+        and issues already cached are kept (along with their cached contents), new ones are added.
+
+        Args:
+            volume:
+                int, default None, the volume whose issues to expand. If None, the page
+                expands the current volume
+
+        Returns:
+            JournalIndexInfo, the scraped index
+        """
+        s = scrapers.JournalIndexScraper()
+        index = s.load(journal=self.url_path, volume=volume)
+        volumes = collections.OrderedDict()
+        for i in index.volumes:
+            v = self._volumes.get(i.num)
+            if v is None:
+                v = Volume(journal=self, num=i.num, start=i.start, end=i.end)
+            else:
+                v.start, v.end = i.start, i.end  # the current volume's end date moves
+            volumes[i.num] = v
+        self._volumes = volumes
+        for num, info in index.issues.items():
+            if num in self._volumes:
+                self._volumes[num]._load_issues(info)
+        return index
+
     @property
     def volumes(self) -> typing.List[int]:
         if not self._volumes:
-            s = scrapers.VolumeIndexScraper()
-            info = s.load(journal=self.url_path, volume=None)
-            for i in info:
-                self._volumes[i.num] = Volume(journal=self, num=i.num, start=i.start, end=i.end)
+            self._load_index()
         return list(self._volumes.keys())
 
     def volume(self, n: int=None):
@@ -65,6 +96,8 @@ class Journal:
         Returns:
             Volume
         """
+        if not self._volumes and n is not None:
+            self._load_index(volume=n)  # loads the volume list and the issues of volume n at once
         volumes = self.volumes
         if n is None:
             n = volumes[0]
@@ -75,6 +108,92 @@ class Journal:
     def issue(self, vol: int, issue: int):
         return self.volume(vol).issue(issue)
 
+    async def avolumes(self) -> typing.List[int]:
+        """Awaitable counterpart of volumes, loading the index on the async transport"""
+        if not self._volumes:
+            await aio.run(self._load_index)
+        return self.volumes
+
+    async def avolume(self, n: int=None):
+        """Awaitable counterpart of volume, loading the index on the async transport"""
+        if not self._volumes:
+            await aio.run(self._load_index, volume=n)
+        return self.volume(n)
+
+    async def aissue(self, vol: int, issue: int):
+        """Awaitable counterpart of issue, loading the index on the async transport"""
+        volume = await self.avolume(vol)
+        return await volume.aissue(issue)
+
+    def export(self, out_dir: str, format: str=None, overwrite: bool=False) -> typing.List[str]:
+        """Export the article metadata of every issue of the journal to columnar files, one
+        file per issue, without building the object tree. See apsjournals.export.
+
+        Args:
+            out_dir:
+                str, the output directory
+            format:
+                str, default None, "parquet" or "csv". If None, parquet if pyarrow is installed
+            overwrite:
+                bool, default False, if False issues that were already exported are skipped,
+                so an interrupted export resumes where it stopped
+
+        Returns:
+            List[str], the paths of the exported files
+        """
+        return list(itertools.chain.from_iterable(self.volume(v).export(out_dir, format=format, overwrite=overwrite) for v in self.volumes))
+
+    def issues_between(self, start: datetime.date, end: datetime.date) -> typing.List['Issue']:
+        """Get the issues published within a date range, oldest first. Volumes are visited
+        newest first, loading the issue list of each, until a volume starts before the range.
+
+        Args:
+            start:
+                datetime.date, the first publication date (inclusive)
+            end:
+                datetime.date, the last publication date (inclusive)
+
+        Returns:
+            List[Issue]
+        """
+        issues = []
+        for num in self.volumes:
+            volume = self.volume(num)
+            dated = [volume.issue(n) for n in volume.issues]
+            dated = [i for i in dated if i.date is not None]
+            issues.extend(i for i in dated if start <= i.date <= end)
+            if dated and min(i.date for i in dated) < start:
+                break  # earlier volumes were published before this one
+        return sorted(issues, key=lambda i: i.date)
+
+    def pdf(self, out_file: str, start: datetime.date, end: datetime.date, workers: int=4, rate: float=1.0,
+            work_dir: str=None):
+        """Download the articles of every issue published within a date range (e.g. a year)
+        and compile them into a single pdf, like Volume.pdf
+
+        Args:
+            out_file:
+                str, the path of the output pdf
+            start:
+                datetime.date, the first publication date (inclusive)
+            end:
+                datetime.date, the last publication date (inclusive)
+            workers:
+                int, default 4, the maximum number of concurrent article downloads
+            rate:
+                float, default 1.0, the average number of downloads started per second
+            work_dir:
+                str, default None, a directory to keep the downloaded articles in, so that
+                building again resumes instead of downloading every article again
+
+        Returns:
+            List[ArticleMeta], the meta data of the articles that failed to download
+        """
+        title = [self.name, '{} - {}'.format(*('{d.day:d} {d:%B %Y}'.format(d=d) for d in (start, end)))]
+        from apsjournals import pdf  # imports fpdf and PyPDF2
+        return pdf.compile_issues(self.issues_between(start, end), out_file, title=title,
+                                  workers=workers, rate=rate, work_dir=work_dir)
+
 
 class Volume:
     def __init__(self, journal: Journal, num: int, start: datetime.date, end: datetime.date):
@@ -99,13 +218,19 @@ class Volume:
     def __repr__(self):
         return 'Volume({!r}, {:d})'.format(self.journal.name if self.journal.short_name is None else self.journal.short_name, self.num)
 
+    def _load_issues(self, info: typing.List[scrapers.IssueInfo]):
+        """Cache the issues of the volume from scraped index info, keeping issues already cached"""
+        issues = collections.OrderedDict()
+        for i in info:
+            issue = self._issues.get(i.num) or Issue(vol=self, num=i.num)
+            issue.date = util.parse_issue_date(i.label)
+            issues[i.num] = issue
+        self._issues = issues
+
     @property
     def issues(self) -> typing.List[int]:
         if not self._issues:
-            s = scrapers.IssueIndexScraper()
-            info = s.load(journal=self.journal.url_path, volume=self.num, issue=None)
-            for i in info:
-                self._issues[i.num] = Issue(vol=self, num=i.num)
+            self.journal._load_index(volume=self.num)
         return list(self._issues.keys())
 
     def issue(self, num: int):
@@ -125,9 +250,63 @@ class Volume:
             pass # load issue from web and cache
         return self._issues[num]
 
+    async def aissues(self) -> typing.List[int]:
+        """Awaitable counterpart of issues, loading the index on the async transport"""
+        if not self._issues:
+            await aio.run(self.journal._load_index, volume=self.num)
+        return self.issues
+
+    async def aissue(self, num: int):
+        """Awaitable counterpart of issue, loading the index on the async transport"""
+        await self.aissues()
+        return self.issue(num)
+
+    def export(self, out_dir: str, format: str=None, overwrite: bool=False) -> typing.List[str]:
+        """Export the article metadata of every issue of the volume to columnar files, one
+        file per issue, without building the object tree. See apsjournals.export.
+
+        Args:
+            out_dir:
+                str, the output directory
+            format:
+                str, default None, "parquet" or "csv". If None, parquet if pyarrow is installed
+            overwrite:
+                bool, default False, if False issues that were already exported are skipped,
+                so an interrupted export resumes where it stopped
+
+        Returns:
+            List[str], the paths of the exported files
+        """
+        targets = [(self.journal.url_path, self.num, n) for n in self.issues]
+        return export.export_issues(targets, out_dir, format=format, overwrite=overwrite)
+
+    def pdf(self, out_file: str, workers: int=4, rate: float=1.0, work_dir: str=None):
+        """Download the articles of every issue and compile them into a single pdf, with a
+        title page and, for each issue, a cover page, table of contents and outline entry.
+        Issues are streamed into the output one at a time. See apsjournals.pdf.compile_issues.
+
+        Args:
+            out_file:
+                str, the path of the output pdf
+            workers:
+                int, default 4, the maximum number of concurrent article downloads
+            rate:
+                float, default 1.0, the average number of downloads started per second
+            work_dir:
+                str, default None, a directory to keep the downloaded articles in, so that
+                building again resumes instead of downloading every article again
+
+        Returns:
+            List[ArticleMeta], the meta data of the articles that failed to download
+        """
+        issues = [self._issues[n] for n in self.issues]
+        from apsjournals import pdf  # imports fpdf and PyPDF2
+        return pdf.compile_issues(issues, out_file, title=[self.journal.name, 'Volume {:d}'.format(self.num)],
+                                  workers=workers, rate=rate, work_dir=work_dir)
+
 
 class Issue:
-    def __init__(self, vol: Volume, num: int):
+    def __init__(self, vol: Volume, num: int, date: datetime.date=None):
         """An Issue is the most granular unit of the Journal, in that it is the immediate
         container of Articles
 
@@ -136,10 +315,13 @@ class Issue:
                 Volume, the Volume from which the Issue comes
             num: 
                 int, the issue number
+            date:
+                datetime.date, default None, the publication date of the Issue (if known)
         """
         self.vol = vol
         self.num = num
-        self.__contents = None
+        self.date = date
+        self.__contents = None  # None until loaded
 
     def __repr__(self):
         return "Issue({!r}, {:d}, {:d})".format(self.journal.name, self.vol.num, self.num)
@@ -148,6 +330,14 @@ class Issue:
     def journal(self):
         return self.vol.journal
 
+    @property
+    def closed(self) -> bool:
+        """Whether the issue is complete, so that its page no longer changes: any issue but the
+        latest issue of the latest volume, to which articles are still being added. An issue
+        whose journal and volume indexes are not loaded is assumed open"""
+        volumes, issues = list(self.journal._volumes), list(self.vol._issues)
+        return bool(volumes and issues) and (self.vol.num != max(volumes) or self.num != max(issues))
+
     @property
     def _contents(self):
         """Load the contents of the Issue, returning a list of Sections and Articles
@@ -155,15 +345,40 @@ class Issue:
         Returns:
             List[Union[Section, Article]]
         """
-        if not self.__contents:
+        if self.__contents is None:
             s = scrapers.IssueScraper()
-            info = s.load(journal=self.journal.url_path, volume=self.vol.num, issue=self.num)
-            self.__contents = parse_contents_from_info(info, issue=self)
+            source = s.get(journal=self.journal.url_path, volume=self.vol.num, issue=self.num, closed=self.closed)
+            self._load_contents(s.iter_extract(source))
         return self.__contents
 
+    @property
+    def _loaded(self) -> bool:
+        """Whether the contents are cached, even if the issue has no articles"""
+        return self.__contents is not None
+
+    def _load_contents(self, info: typing.Iterable[typing.Union[scrapers.DividerInfo, scrapers.SectionInfo, scrapers.ArticleInfo]]):
+        """Cache the contents of the issue from scraped issue info"""
+        with metrics.span('api.parse_contents'):
+            self.__contents = parse_contents_from_info(metrics.timed_iter('scrape.extract', info, scraper='IssueScraper'), issue=self)
+
     def contents(self, include_level: bool=False):
         return traverse_issue_contents(self, include_level=include_level)
 
+    async def _aload(self):
+        """Load the contents on the async transport, unless already loaded"""
+        if not self._loaded:
+            await aio.run(getattr, self, '_contents')
+
+    async def acontents(self, include_level: bool=False) -> list:
+        """Awaitable counterpart of contents, returning a list instead of a generator"""
+        await self._aload()
+        return list(self.contents(include_level=include_level))
+
+    async def aarticles(self) -> list:
+        """Awaitable counterpart of articles"""
+        await self._aload()
+        return self.articles
+
     @property
     def articles(self):
         def extract_articles(x):
@@ -173,12 +388,34 @@ class Issue:
                 return list(itertools.chain.from_iterable([extract_articles(m) for m in x.members]))
         return list(itertools.chain.from_iterable([extract_articles(c) for c in self._contents]))
 
-    def pdf(self, out_file: str):
+    def pdf(self, out_file: str, workers: int=4, rate: float=1.0, work_dir: str=None):
+        """Download all articles and compile them into a single pdf with a cover page
+        and table of contents
+
+        Args:
+            out_file:
+                str, the path of the output pdf
+            workers:
+                int, default 4, the maximum number of concurrent article downloads
+            rate:
+                float, default 1.0, the average number of downloads started per second
+            work_dir:
+                str, default None, a directory to keep the downloaded articles in, so that
+                building again resumes instead of downloading every article again
+
+        Returns:
+            List[ArticleMeta], the meta data of the articles that failed to download
+        """
+        from apsjournals import pdf  # imports fpdf and PyPDF2
         doc = pdf.ApsPDF(self, out_file)
-        doc.build()
+        return doc.build(workers=workers, rate=rate, work_dir=work_dir)
 
 
 class Author:
+    # Authors are the most numerous objects in memory, so they are slot based and their
+    # names are interned, sharing a single string per name across all loaded issues
+    __slots__ = ('first_name', 'last_name')
+
     def __init__(self, name: str):
         """An author is a contributor to an Article.
 
@@ -193,8 +430,8 @@ class Author:
         else:
             first, last = name, name
             # raise ValueError('Unable to parse Author name: {}'.format(name))
-        self.first_name = first
-        self.last_name = last
+        self.first_name = sys.intern(first)
+        self.last_name = sys.intern(last)
 
     def __repr__(self):
         return "Author({!r})".format(self.name)
@@ -205,6 +442,8 @@ class Author:
 
 
 class Section:
+    __slots__ = ('name', 'members')
+
     def __init__(self, name, members):
         """A section contains subsections or Articles
 
@@ -222,6 +461,10 @@ class Section:
 
 
 class Article:
+    # slot based to keep the footprint small when many issues are loaded; the journal and
+    # volume are not stored per article but shared through the Issue reference
+    __slots__ = ('issue', 'name', 'authors', 'url', 'pdf_url', 'teaser')
+
     def __init__(self, issue: Issue, name: str, authors: typing.List[Author], url: str, pdf_url: str, teaser: str=None):
         """An article represents a published paper in an APS journal. It is organized into 
         a parent Issue, and has several pieces of meta data (authors, url, etc.).
@@ -254,16 +497,53 @@ class Article:
     def journal(self):
         return self.issue.vol.journal
 
-    def pdf(self, filepath: str):
-        scrapers.download_pdf(self.pdf_url, out_file=filepath)
+    def pdf(self, filepath: typing.Union[str, typing.BinaryIO]) -> scrapers.DownloadInfo:
+        """Download the Article PDF. If a default PdfStore is set (see apsjournals.web.store),
+        a stored copy is used instead of downloading, and downloads are added to the store.
+
+        Args:
+            filepath:
+                str or file-like, the path of the output file, or a binary file object
+                (e.g. io.BytesIO) to write the PDF into
+
+        Returns:
+            DownloadInfo, the size and sha256 digest of the PDF
+        """
+        pdf_store = store.get_default_store()
+        if pdf_store is not None:
+            return pdf_store.fetch(self.pdf_url, filepath)
+        return scrapers.download_pdf(self.pdf_url, out_file=filepath)
+
+    async def apdf(self, filepath: typing.Union[str, typing.BinaryIO]) -> scrapers.DownloadInfo:
+        """Awaitable counterpart of pdf, downloading on the async transport"""
+        return await aio.run(self.pdf, filepath)
+
+
+async def gather_contents(issues: typing.Iterable[Issue], include_level: bool=False) -> typing.List[list]:
+    """Load the contents of many issues at once, possibly across journals. The number of
+    concurrent requests is capped by the async transport (see apsjournals.web.aio).
+
+    Args:
+        issues:
+            Iterable[Issue], the issues to load
+        include_level:
+            bool, default False, passed to Issue.acontents
+
+    Returns:
+        List[list], the contents of every issue, in the order given
+    """
+    import asyncio  # already imported by whoever runs the event loop
+    return await asyncio.gather(*(i.acontents(include_level=include_level) for i in issues))
 
 
-def parse_contents_from_info(info: typing.List[typing.Union[scrapers.DividerInfo, scrapers.SectionInfo, scrapers.ArticleInfo]], issue: Issue) -> typing.List[Section]:
-    """Convert an iterable of raw web-scraped information into api objects.
+def parse_contents_from_info(info: typing.Iterable[typing.Union[scrapers.DividerInfo, scrapers.SectionInfo, scrapers.ArticleInfo]], issue: Issue) -> typing.List[Section]:
+    """Convert an iterable of raw web-scraped information into api objects, in a single
+    pass. The info is not modified, and may be a generator (e.g. IssueScraper.iter_extract)
+    so that it is consumed as it is scraped.
 
     Args:
         info: 
-            List[Union[DividerInfo, SectionInfo, ArticleInfo]]
+            Iterable[Union[DividerInfo, SectionInfo, ArticleInfo]]
         issue:
             Issue, the issue to which the contents belong 
 
@@ -271,22 +551,21 @@ def parse_contents_from_info(info: typing.List[typing.Union[scrapers.DividerInfo
         List of Section and Article instances
     """
     contents = []
-    for n, i in enumerate(info):
+    members = contents  # a divider opens a section holding everything up to the next divider
+    for i in info:
         if isinstance(i, scrapers.DividerInfo):
-            divider_info = []
-            while len(info) > n + 1 and not isinstance(info[n+1], scrapers.DividerInfo):
-                divider_info.append(info.pop(n+1))
-            divider_contents = parse_contents_from_info(divider_info, issue=issue)
-            contents.append(Section(i.name, members=divider_contents))
+            divider = Section(i.name, members=[])
+            contents.append(divider)
+            members = divider.members
         elif isinstance(i, scrapers.SectionInfo):
-            contents.append(Section(name=i.name, members=parse_contents_from_info(i.articles, issue=issue)))
+            members.append(Section(name=i.name, members=parse_contents_from_info(i.articles, issue=issue)))
         elif isinstance(i, scrapers.ArticleInfo):
-            contents.append(Article(issue=issue,
-                                    name=i.name,
-                                    authors=[Author(n.strip()) for n in i.author.replace('and', '').encode('ascii', 'ignore').decode('ascii').split(',')],
-                                    url=i.url,
-                                    pdf_url=i.pdf_url,
-                                    teaser=i.teaser))
+            members.append(Article(issue=issue,
+                                   name=i.name,
+                                   authors=[Author(n) for n in util.split_author_names(i.author)],
+                                   url=i.url,
+                                   pdf_url=i.pdf_url,
+                                   teaser=i.teaser))
         else:
             raise ValueError('Unable to parse contents from type {}'.format(type(i)))
     return contents
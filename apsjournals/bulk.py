@@ -0,0 +1,106 @@
+"""Bulk loading of issue contents
+
+Loading issues one at a time through Issue.contents() is network serial and single core: each
+issue page is fetched, then parsed, before the next fetch starts. load_issues loads many issues,
+possibly across journals, as a pipeline instead: pages are fetched concurrently on a thread
+pool under a token bucket rate limit, and each page is handed to a process pool for parsing as
+soon as it arrives, so parsing runs on all cores while the next pages are downloading. The
+parsed contents are stored in the Issue caches, exactly as if they had been loaded lazily.
+
+Example:
+    >>> targets = [(apsjournals.PRL, 121, n) for n in range(1, 27)] + [(apsjournals.PRA, 98, 1)]
+    >>> failed = [r for r in bulk.load_issues(targets, rate=2.0) if r.error is not None]
+"""
+
+
+import collections
+import concurrent.futures
+import contextlib
+import multiprocessing
+import typing
+from apsjournals import api
+from apsjournals.web import scrapers, throttle
+
+
+LoadInfo = collections.namedtuple('LoadInfo', 'issue error')
+
+Target = typing.Union[api.Issue, typing.Tuple[api.Journal, int, int]]
+
+
+def _parse(source: str, backend: scrapers.Backend) -> list:
+    """Parse an issue page, run in the worker processes (module level so it can be pickled)"""
+    return scrapers.IssueScraper(backend=backend).extract(source)
+
+
+def resolve(targets: typing.Iterable[Target]) -> typing.List[api.Issue]:
+    """Convert targets to Issue instances. The volume and issue indexes are loaded as needed,
+    one index page per volume not yet loaded.
+
+    Args:
+        targets:
+            Iterable of Issue or (Journal, volume, issue) tuples
+
+    Returns:
+        List[Issue], in the order given
+    """
+    return [t if isinstance(t, api.Issue) else t[0].issue(t[1], t[2]) for t in targets]
+
+
+def load_issues(targets: typing.Iterable[Target], workers: int=4, processes: int=None, rate: float=1.0, burst: int=1,
+                backend: scrapers.Backend=None, reload: bool=False) -> typing.List[LoadInfo]:
+    """Load the contents of many issues at once, storing them in the Issue caches. A failed
+    issue does not abort the others, instead the error is recorded in the returned info.
+
+    Args:
+        targets:
+            Iterable of Issue or (Journal, volume, issue) tuples
+        workers:
+            int, default 4, the maximum number of concurrent page fetches
+        processes:
+            int, default None, the number of parsing processes. If None, one per cpu. If 0,
+            pages are parsed on the fetching threads instead
+        rate:
+            float, default 1.0, the average number of page fetches started per second
+        burst:
+            int, default 1, the number of page fetches that may start at once
+        backend:
+            Backend, default None, the parsing backend. If None, the default backend
+        reload:
+            bool, default False, if False issues whose contents are already cached are skipped
+
+    Returns:
+        List[LoadInfo], in the order of the targets, the error being None for loaded issues
+    """
+    issues = resolve(targets)
+    bucket = throttle.TokenBucket(rate=rate, capacity=burst)
+    backend = scrapers.IssueScraper(backend=backend).backend  # resolve the default in this process
+
+    def fetch(issue):
+        bucket.acquire()
+        source = scrapers.IssueScraper(backend=backend).get(journal=issue.journal.url_path, volume=issue.vol.num, issue=issue.num, closed=issue.closed)
+        return source if processes != 0 else _parse(source, backend)
+
+    errors = {}
+    todo = [i for i in collections.OrderedDict.fromkeys(issues) if reload or not i._loaded]
+    with contextlib.ExitStack() as stack:
+        # the pool forks all its processes as it is created, before the fetch threads start, so
+        # that no process inherits a lock held by a running thread (e.g. of the session pool)
+        pool = None if processes == 0 else stack.enter_context(multiprocessing.Pool(processes))
+        threads = stack.enter_context(concurrent.futures.ThreadPoolExecutor(max_workers=workers))
+        fetched = {threads.submit(fetch, i): i for i in todo}
+        if pool is None:
+            parsed = fetched
+        else:
+            parsed = {}
+            for f in concurrent.futures.as_completed(fetched):
+                issue = fetched[f]
+                try:
+                    parsed[pool.apply_async(_parse, (f.result(), backend))] = issue
+                except Exception as e:
+                    errors[issue] = e
+        for result, issue in parsed.items():
+            try:
+                issue._load_contents(result.result() if pool is None else result.get())
+            except Exception as e:
+                errors[issue] = e
+    return [LoadInfo(i, errors.get(i)) for i in issues]
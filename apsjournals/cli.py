@@ -0,0 +1,246 @@
+"""Command line interface
+
+Every command runs in a single process, so a batch of targets shares the pooled session, the
+response cache, the PDF store and the authentication, rather than paying process startup and a
+new login per issue. Targets are "journal/volume/issue" (or "journal/volume" for every issue of
+a volume), given as arguments or, when none are given (or "-" is), read from stdin one per line.
+Listings and contents are written as JSON lines, for use in pipelines. A target that fails does
+not stop the batch: the error is reported on stderr and the exit status is 1.
+
+Example:
+    $ apsjournals issues prl 121
+    $ printf 'prl/121/6\\nprl/121/7\\n' | apsjournals --cache ~/.aps-cache contents > articles.jsonl
+    $ apsjournals --username me download prl/121/6 prl/121/7 --out-dir pdfs
+    $ apsjournals --username me compile prl/121 --out prl-121.pdf
+    $ apsjournals --session ~/.aps-session --username me download prl/121/6  # logs in, once
+    $ apsjournals --session ~/.aps-session download prl/121/7  # reuses the stored login
+"""
+
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import typing
+from apsjournals import api
+from apsjournals import export
+from apsjournals import metrics
+from apsjournals.journals import JOURNALS
+from apsjournals.web import auth, cache, scrapers, sessionstore, store
+
+
+PASSWORD_ENV = 'APSJOURNALS_PASSWORD'
+
+_JOURNALS = {j.url_path: j for j in JOURNALS}
+
+
+class TargetError(ValueError):
+    """A target that does not name an issue or volume"""
+    pass
+
+
+def journal(url_path: str) -> api.Journal:
+    """Look up a journal by its url path, e.g. "prl"
+
+    Raises:
+        TargetError: if there is no such journal
+    """
+    try:
+        return _JOURNALS[url_path.lower()]
+    except KeyError:
+        raise TargetError('Unknown journal {!r}, valid journals are: {}'.format(url_path, ', '.join(_JOURNALS)))
+
+
+def parse_target(target: str) -> typing.List[api.Issue]:
+    """Resolve a target to issues, loading the issue index of its volume
+
+    Args:
+        target:
+            str, "journal/volume/issue", or "journal/volume" for every issue of the volume
+
+    Returns:
+        List[Issue]
+
+    Raises:
+        TargetError: if the target is malformed
+    """
+    parts = target.strip().strip('/').split('/')
+    try:
+        nums = [int(p) for p in parts[1:]]
+    except ValueError:
+        nums = None
+    if nums is None or len(parts) not in (2, 3):
+        raise TargetError('Invalid target {!r}, expected journal/volume/issue or journal/volume'.format(target))
+    volume = journal(parts[0]).volume(nums[0])
+    return [volume.issue(n) for n in (nums[1:] or volume.issues)]
+
+
+def read_targets(targets: typing.List[str], stdin: typing.TextIO) -> typing.Iterator[str]:
+    """The targets given as arguments, or read from stdin (blank lines and # comments skipped)"""
+    for target in targets or ['-']:
+        if target == '-':
+            for line in stdin:
+                line = line.split('#')[0].strip()
+                if line:
+                    yield line
+        else:
+            yield target
+
+
+def _write(out: typing.TextIO, record: dict):
+    out.write(json.dumps(record, default=str) + '\n')
+    out.flush()  # downstream stages of a pipeline see each record as it is produced
+
+
+def _issue_record(issue: api.Issue, **fields) -> dict:
+    record = {'journal': issue.journal.url_path, 'volume': issue.vol.num, 'issue': issue.num}
+    record.update(fields)
+    return record
+
+
+def _failed(failed) -> typing.List[dict]:
+    return [{'title': m.article.name, 'pdf_url': m.article.pdf_url, 'error': str(m.error)} for m in failed]
+
+
+def cmd_volumes(args, out):
+    j = journal(args.journal)
+    for num in j.volumes:
+        v = j.volume(num)
+        _write(out, {'journal': j.url_path, 'volume': num, 'start': v.start, 'end': v.end})
+
+
+def cmd_issues(args, out):
+    v = journal(args.journal).volume(args.volume)
+    for num in v.issues:
+        issue = v.issue(num)
+        _write(out, _issue_record(issue, date=issue.date))
+
+
+def cmd_contents(args, out, issue: api.Issue):
+    for record in export.iter_issue_records(issue.journal.url_path, issue.vol.num, issue.num):
+        record = record._asdict()
+        record['authors'] = record['authors'].split(export.AUTHOR_SEPARATOR) if record['authors'] else []
+        _write(out, record)
+
+
+def cmd_download(args, out, issue: api.Issue):
+    path = os.path.join(args.out_dir, '{}-{:d}-{:d}.pdf'.format(issue.journal.url_path, issue.vol.num, issue.num))
+    os.makedirs(args.out_dir, exist_ok=True)
+    work_dir = None if args.work_dir is None else os.path.join(args.work_dir, os.path.basename(path)[:-4])
+    failed = issue.pdf(path, workers=args.workers, rate=args.rate, work_dir=work_dir)
+    _write(out, _issue_record(issue, file=path, failed=_failed(failed)))
+
+
+def cmd_compile(args, out, issues: typing.List[api.Issue]):
+    from apsjournals import pdf  # imports fpdf and PyPDF2
+    title = args.title if args.title else None
+    failed = pdf.compile_issues(issues, args.out, title=title, workers=args.workers, rate=args.rate, work_dir=args.work_dir)
+    _write(out, {'file': args.out, 'issues': len(issues), 'failed': _failed(failed)})
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='apsjournals', description='A pythonic interface for APS publications')
+    parser.add_argument('--cache', default=None, help='directory of a persistent cache of APS pages')
+    parser.add_argument('--store', default=None, help='directory of a persistent store of article pdfs')
+    parser.add_argument('--backend', default=None, choices=[b.value for b in scrapers.Backend], help='the page parsing backend')
+    parser.add_argument('--username', default=None, help='the APS username, required to download pdfs unless a session is '
+                                                         'stored. The password is read from ${} or prompted for'.format(PASSWORD_ENV))
+    parser.add_argument('--session', default=None, help='a file persisting the login, so that later runs reuse it')
+    parser.add_argument('--workers', type=int, default=4, help='the maximum number of concurrent pdf downloads')
+    parser.add_argument('--rate', type=float, default=1.0, help='the average number of pdf downloads started per second')
+    parser.add_argument('--profile', action='store_true', help='print a per-phase profile to stderr on exit')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    p = commands.add_parser('volumes', help='list the volumes of a journal')
+    p.add_argument('journal', help='the journal url path, e.g. prl')
+    p.set_defaults(func=cmd_volumes)
+
+    p = commands.add_parser('issues', help='list the issues of a volume')
+    p.add_argument('journal', help='the journal url path, e.g. prl')
+    p.add_argument('volume', type=int)
+    p.set_defaults(func=cmd_issues)
+
+    target_help = 'journal/volume/issue or journal/volume, read from stdin if none (or -) are given'
+    p = commands.add_parser('contents', help='write the articles of issues as JSON lines')
+    p.add_argument('targets', nargs='*', help=target_help)
+    p.set_defaults(func=cmd_contents)
+
+    p = commands.add_parser('download', help='download every issue into its own pdf')
+    p.add_argument('targets', nargs='*', help=target_help)
+    p.add_argument('--out-dir', default='.', help='the output directory, one journal-volume-issue.pdf per issue')
+    p.add_argument('--work-dir', default=None, help='keep downloaded articles here, so that running again resumes')
+    p.set_defaults(func=cmd_download, login=True)
+
+    p = commands.add_parser('compile', help='compile all issues into a single pdf')
+    p.add_argument('targets', nargs='*', help=target_help)
+    p.add_argument('--out', required=True, help='the output pdf')
+    p.add_argument('--title', nargs='*', default=None, help='the lines of a title page')
+    p.add_argument('--work-dir', default=None, help='keep downloaded articles here, so that running again resumes')
+    p.set_defaults(func=cmd_compile, login=True, batch=True)
+    return parser
+
+
+def _login(args):
+    if auth.is_authenticated():
+        return
+    if args.username is None:
+        if auth.restore():
+            return  # the stored session of an earlier run, renewed by runs given credentials
+        raise auth.AuthenticationError('Downloading pdfs requires --username, or a --session stored by an earlier run')
+    auth.authenticate(args.username, os.environ.get(PASSWORD_ENV))  # prompts for the password if a login is needed
+
+
+def main(argv: typing.List[str]=None, stdin: typing.TextIO=None, stdout: typing.TextIO=None) -> int:
+    """Run the command line interface
+
+    Args:
+        argv:
+            List[str], default None, the arguments. If None, sys.argv[1:]
+        stdin, stdout:
+            file-like, default None, the text streams. If None, sys.stdin and sys.stdout
+
+    Returns:
+        int, the exit status: 0 on success, 1 if any target failed
+    """
+    args = build_parser().parse_args(argv)
+    stdin = sys.stdin if stdin is None else stdin
+    out = sys.stdout if stdout is None else stdout
+    if args.cache is not None:
+        cache.set_default_cache(cache.DirectoryCache(args.cache))
+    if args.store is not None:
+        store.set_default_store(store.PdfStore(args.store))
+    if args.backend is not None:
+        scrapers.set_default_backend(args.backend)
+    if args.session is not None:
+        sessionstore.set_default_session_store(sessionstore.SessionStore(args.session))
+
+    status = 0
+    with metrics.profile() if args.profile else contextlib.ExitStack():
+        try:
+            if not hasattr(args, 'targets'):  # listings
+                args.func(args, out)
+                return status
+            if getattr(args, 'login', False):
+                _login(args)
+            issues = []
+            for target in read_targets(args.targets, stdin):
+                try:
+                    resolved = parse_target(target)
+                    if getattr(args, 'batch', False):
+                        issues.extend(resolved)  # all processed together below
+                        continue
+                    for issue in resolved:
+                        args.func(args, out, issue)
+                except Exception as e:
+                    print('apsjournals: {}: {}'.format(target, e), file=sys.stderr)
+                    status = 1
+            if getattr(args, 'batch', False):
+                if not issues:
+                    raise TargetError('No issues to compile')
+                args.func(args, out, issues)
+        except ValueError as e:  # including unknown targets and authentication errors
+            print('apsjournals: {}'.format(e), file=sys.stderr)
+            return 1
+    return status
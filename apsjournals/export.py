@@ -0,0 +1,176 @@
+"""Columnar export of article metadata
+
+Walking Issue.contents() builds the full object tree for every issue, which is slow and
+memory heavy for whole journals. The functions below stream the scraped issue info
+straight into columnar batches (one batch per issue) and write each batch to its own
+file, so that memory is bounded by the size of one issue and an interrupted export can
+be resumed: issues whose file already exists are skipped.
+
+Formats:
+    parquet - requires the optional pyarrow package
+    csv - always available, used by default when pyarrow is not installed
+"""
+
+
+import collections
+import csv
+import os
+import tempfile
+import typing
+from apsjournals import util
+from apsjournals.web import scrapers
+
+
+COLUMNS = ('journal', 'volume', 'issue', 'section', 'title', 'authors', 'url', 'pdf_url', 'teaser')
+SECTION_SEPARATOR = ' / '
+AUTHOR_SEPARATOR = '; '
+
+ArticleRecord = collections.namedtuple('ArticleRecord', COLUMNS)
+
+
+def iter_issue_records(journal: str, volume: int, issue: int) -> typing.Iterator[ArticleRecord]:
+    """Scrape an issue and yield one flat record per article, without building api objects
+
+    Args:
+        journal:
+            str, the url path of the journal, e.g. "prl"
+        volume:
+            int, the volume number
+        issue:
+            int, the issue number
+
+    Returns:
+        Generator of ArticleRecord, the section being the path of enclosing section names
+    """
+    s = scrapers.IssueScraper()
+    source = s.get(journal=journal, volume=volume, issue=issue)
+    divider = None
+
+    def record(info, section):
+        return ArticleRecord(journal=journal, volume=volume, issue=issue, section=section, title=info.name,
+                             authors=AUTHOR_SEPARATOR.join(util.split_author_names(info.author)),
+                             url=info.url, pdf_url=info.pdf_url, teaser=info.teaser)
+
+    for info in s.iter_extract(source):
+        if isinstance(info, scrapers.DividerInfo):
+            divider = info.name
+        elif isinstance(info, scrapers.SectionInfo):
+            section = info.name if divider is None else divider + SECTION_SEPARATOR + info.name
+            for a in info.articles:
+                yield record(a, section)
+        elif isinstance(info, scrapers.ArticleInfo):
+            yield record(info, divider)
+        else:
+            raise ValueError('Unable to export contents of type {}'.format(type(info)))
+
+
+def to_columns(records: typing.Iterable[ArticleRecord]) -> typing.Dict[str, list]:
+    """Collect records into a columnar batch
+
+    Returns:
+        OrderedDict mapping each of COLUMNS to a list of values
+    """
+    columns = collections.OrderedDict((c, []) for c in COLUMNS)
+    appends = [columns[c].append for c in COLUMNS]
+    for r in records:
+        for append, value in zip(appends, r):
+            append(value)
+    return columns
+
+
+def write_csv(columns: typing.Dict[str, list], fid):
+    """Write a columnar batch as csv, with a header row"""
+    writer = csv.writer(fid)
+    writer.writerow(list(columns))
+    writer.writerows(zip(*columns.values()))
+
+
+def write_parquet(columns: typing.Dict[str, list], fid):
+    """Write a columnar batch as parquet, requires pyarrow"""
+    import pyarrow
+    import pyarrow.parquet
+    types = {'volume': pyarrow.int32(), 'issue': pyarrow.int32()}
+    schema = pyarrow.schema([(c, types.get(c, pyarrow.string())) for c in columns])
+    pyarrow.parquet.write_table(pyarrow.Table.from_pydict(columns, schema=schema), fid)
+
+
+# format name -> (file extension, file open options, writer)
+FORMATS = {
+    'csv': ('.csv', {'mode': 'w', 'newline': '', 'encoding': 'utf-8'}, write_csv),
+    'parquet': ('.parquet', {'mode': 'wb'}, write_parquet),
+}
+
+
+def default_format() -> str:
+    """Parquet if pyarrow is installed, otherwise csv"""
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return 'csv'
+    return 'parquet'
+
+
+def issue_path(out_dir: str, journal: str, volume: int, issue: int, format: str) -> str:
+    """The path of the file holding the export of a single issue"""
+    return os.path.join(out_dir, '{}-{:d}-{:d}{}'.format(journal, volume, issue, FORMATS[format][0]))
+
+
+def export_issue(journal: str, volume: int, issue: int, out_dir: str, format: str=None, overwrite: bool=False) -> str:
+    """Export the article metadata of one issue to its own file. The file is written to a
+    temporary name and renamed once complete, so an existing file is always a full export.
+
+    Args:
+        journal:
+            str, the url path of the journal, e.g. "prl"
+        volume:
+            int, the volume number
+        issue:
+            int, the issue number
+        out_dir:
+            str, the output directory, created if missing
+        format:
+            str, default None, one of FORMATS. If None, see default_format
+        overwrite:
+            bool, default False, if False an issue that was already exported is skipped
+
+    Returns:
+        str, the path of the exported file
+    """
+    format = default_format() if format is None else format
+    if format not in FORMATS:
+        raise ValueError('Unknown export format {}, valid formats are: {}'.format(format, sorted(FORMATS)))
+    path = issue_path(out_dir, journal, volume, issue, format)
+    if os.path.exists(path) and not overwrite:
+        return path
+    os.makedirs(out_dir, exist_ok=True)
+    _, options, writer = FORMATS[format]
+    columns = to_columns(iter_issue_records(journal, volume, issue))
+    fd, tmp = tempfile.mkstemp(dir=out_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, **options) as fid:
+            writer(columns, fid)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return path
+
+
+def export_issues(targets: typing.Iterable[typing.Tuple[str, int, int]], out_dir: str, format: str=None, overwrite: bool=False) -> typing.List[str]:
+    """Export the article metadata of many issues, one file per issue
+
+    Args:
+        targets:
+            Iterable of (journal url path, volume, issue) tuples
+        out_dir:
+            str, the output directory
+        format:
+            str, default None, one of FORMATS. If None, see default_format
+        overwrite:
+            bool, default False, if False issues that were already exported are skipped
+
+    Returns:
+        List[str], the paths of the exported files
+    """
+    format = default_format() if format is None else format
+    return [export_issue(j, v, i, out_dir, format=format, overwrite=overwrite) for j, v, i in targets]
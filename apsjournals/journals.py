@@ -16,3 +16,5 @@ PRApplied = api.Journal('Physical Review Applied', 'prapplied')
 PRFluids = api.Journal('Physical Review Fluids', 'prfluids')
 PRMaterials = api.Journal('Physical Review Materials', 'prmaterials')
 PRPER = api.Journal('Physical Review Physics Education Research', 'prper')
+
+JOURNALS = (PRL, PRM, PRA, PRB, PRC, PRD, PRE, PRX, PRAB, PRApplied, PRFluids, PRMaterials, PRPER)
@@ -0,0 +1,224 @@
+"""Instrumentation of the network, parsing and pdf hot paths
+
+The library records timing spans (e.g. "web.get", "scrape.extract", "pdf.download") and counters
+(e.g. "web.bytes", "cache.hit") at the points where time goes, and emits them as Events to the
+listeners added with add_listener. With no listener added, which is the default, recording is a
+single truth test, so instrumentation costs nothing measurable. A Registry is a listener that
+aggregates the events, and profile wraps one in a context manager printing a per-phase report.
+
+Spans nest: "pdf.build" includes the downloads, and "api.parse_contents" includes the
+"scrape.extract" of the issue page it parses. Spans recorded in worker threads (downloads) are
+summed across threads, so their total may exceed the wall time.
+
+Example:
+    >>> with metrics.profile():
+    ...     issue.pdf('path/to/file.pdf')
+    phase                      calls    total s    mean ms     max ms
+    pdf.build                      1     61.325   61325.10   61325.10
+    pdf.download                  59     12.002     203.42     911.20
+    ...
+"""
+
+
+import collections
+import contextlib
+import sys
+import threading
+import time
+import typing
+
+
+Event = collections.namedtuple('Event', 'kind name value tags')  # kind is "span" (seconds) or "count"
+
+# The listeners receiving every event. Do NOT change this value manually, use add_listener
+# and remove_listener instead
+_LISTENERS = ()
+
+
+def add_listener(listener: typing.Callable[[Event], None]):
+    """Add a callable receiving every recorded event, possibly from several threads
+
+    Args:
+        listener:
+            Callable[[Event], None], e.g. a Registry, or a function forwarding to a metrics system
+    """
+    global _LISTENERS
+    _LISTENERS = _LISTENERS + (listener,)
+
+
+def remove_listener(listener: typing.Callable[[Event], None]):
+    """Remove a listener added with add_listener"""
+    global _LISTENERS
+    _LISTENERS = tuple(l for l in _LISTENERS if l is not listener)
+
+
+def enabled() -> bool:
+    """Whether any listener is receiving events"""
+    return bool(_LISTENERS)
+
+
+def _emit(event: Event):
+    for listener in _LISTENERS:
+        listener(event)
+
+
+def count(name: str, value: int=1, **tags):
+    """Record a counter increment, e.g. a request or a number of bytes
+
+    Args:
+        name:
+            str, the counter name
+        value:
+            int, default 1, the increment
+        tags:
+            dict, details passed on to the listeners, e.g. the url
+    """
+    if _LISTENERS:
+        _emit(Event('count', name, value, tags))
+
+
+class _Span:
+    __slots__ = ('name', 'tags', 'start')
+
+    def __init__(self, name: str, tags: dict):
+        self.name = name
+        self.tags = tags
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _emit(Event('span', self.name, time.perf_counter() - self.start, self.tags))
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, **tags):
+    """A context manager recording the time spent in its block
+
+    Args:
+        name:
+            str, the span (phase) name
+        tags:
+            dict, details passed on to the listeners, e.g. the url
+
+    Returns:
+        context manager
+    """
+    return _Span(name, tags) if _LISTENERS else _NULL_SPAN
+
+
+def timed_iter(name: str, iterable: typing.Iterable, **tags) -> typing.Iterable:
+    """Record the time spent producing the items of a lazy iterable as a single span, excluding
+    the time the consumer spends between items. Used for extraction feeding tree building.
+
+    Args:
+        name:
+            str, the span name
+        iterable:
+            Iterable, the iterable to time
+
+    Returns:
+        Iterable, the iterable itself if no listener is added
+    """
+    if not _LISTENERS:
+        return iterable
+    return _timed_iter(name, iter(iterable), tags)
+
+
+def _timed_iter(name: str, it: typing.Iterator, tags: dict):
+    elapsed = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        _emit(Event('span', name, elapsed, tags))
+
+
+SpanStats = collections.namedtuple('SpanStats', 'calls total max')
+
+
+class Registry:
+    def __init__(self):
+        """A listener aggregating span statistics and counter totals by name"""
+        self._spans = {}
+        self._counters = collections.Counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, event: Event):
+        with self._lock:
+            if event.kind == 'count':
+                self._counters[event.name] += event.value
+            else:
+                calls, total, longest = self._spans.get(event.name, (0, 0.0, 0.0))
+                self._spans[event.name] = SpanStats(calls + 1, total + event.value, max(longest, event.value))
+
+    @property
+    def spans(self) -> typing.Dict[str, SpanStats]:
+        with self._lock:
+            return dict(self._spans)
+
+    @property
+    def counters(self) -> typing.Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+    def cache_hit_ratio(self) -> typing.Optional[float]:
+        """The fraction of cached page lookups served without downloading the page, or None
+        if no cached lookup was made"""
+        counters = self.counters
+        hits, misses = counters.get('cache.hit', 0), counters.get('cache.miss', 0)
+        return None if hits + misses == 0 else hits / (hits + misses)
+
+    def report(self) -> str:
+        """Format the spans, slowest phase first, followed by the counters"""
+        lines = ['{:<24} {:>7} {:>10} {:>10} {:>10}'.format('phase', 'calls', 'total s', 'mean ms', 'max ms')]
+        for name, s in sorted(self.spans.items(), key=lambda i: -i[1].total):
+            lines.append('{:<24} {:>7d} {:>10.3f} {:>10.2f} {:>10.2f}'.format(name, s.calls, s.total, 1e3 * s.total / s.calls, 1e3 * s.max))
+        counters = self.counters
+        if counters:
+            lines.append('')
+            lines.extend('{:<24} {:>7d}'.format(name, value) for name, value in sorted(counters.items()))
+        ratio = self.cache_hit_ratio()
+        if ratio is not None:
+            lines.append('{:<24} {:>7.1%}'.format('cache hit ratio', ratio))
+        return '\n'.join(lines)
+
+
+@contextlib.contextmanager
+def profile(out: typing.TextIO=None):
+    """Record the events of a block in a Registry, and print its report on exit
+
+    Args:
+        out:
+            file-like, default None, the text stream to print to. If None, sys.stderr
+
+    Returns:
+        context manager, yielding the Registry
+    """
+    registry = Registry()
+    add_listener(registry)
+    try:
+        yield registry
+    finally:
+        remove_listener(registry)
+        print(registry.report(), file=sys.stderr if out is None else out)
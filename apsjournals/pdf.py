@@ -3,19 +3,30 @@
 
 
 import collections
+import concurrent.futures
+import contextlib
 import fpdf
+import hashlib
+import io
+import json
 import os
-import pathlib
 import PyPDF2 as pypdf
+import re
+import shutil
 import tempfile
-import time
+import threading
 import typing
+import warnings
 import apsjournals
+from apsjournals import metrics
+from apsjournals import pdfwriter
+from apsjournals.web import store, throttle
 
 
-ArticleMeta = collections.namedtuple('ArticleMeta', 'article file pages')
+ArticleMeta = collections.namedtuple('ArticleMeta', 'article file pages sha256 error')
 LinkMeta = collections.namedtuple('LinkMeta', 'source_page target_page x y w h')
-BookmarkMeta = collections.namedtuple('BookmarkMeta', 'name page parent')
+TocRow = collections.namedtuple('TocRow', 'x dy w h text style size align')
+TocBlock = collections.namedtuple('TocBlock', 'page y h rows pages')
 
 
 def clean_path(path: str):
@@ -23,31 +34,283 @@ def clean_path(path: str):
     return path.replace(',', '')
 
 
-def get_issue_meta(issue, dir: str, throttle: int=2) -> typing.List[ArticleMeta]:
+_STARTXREF = re.compile(rb'startxref\s+(\d+)')
+_TRAILER_ROOT = re.compile(rb'/Root\s+(\d+)\s+\d+\s+R')
+_TRAILER_PREV = re.compile(rb'/Prev\s+(\d+)')
+_PAGES = re.compile(rb'/Pages\s+(\d+)\s+\d+\s+R')
+# a direct count only, the number must end at a delimiter so that an indirect "/Count 47 0 R"
+# can not match by backtracking to "4" (indirect counts are left to the full parse)
+_COUNT = re.compile(rb'/Count\s+(\d+)(?=\s*[/>\]])')
+_PROBE_CHUNK = 4096
+_PROBE_LIMIT = 16 * 1024 * 1024  # give up on larger reads and parse fully instead
+
+
+def _read_until(fid: typing.BinaryIO, offset: int, marker: bytes) -> typing.Optional[bytes]:
+    """Read from an offset up to (excluding) a marker, in growing chunks, or None if not found"""
+    fid.seek(offset)
+    data = b''
+    while len(data) < _PROBE_LIMIT:
+        chunk = fid.read(max(_PROBE_CHUNK, len(data)))
+        if not chunk:
+            return None
+        data += chunk
+        end = data.find(marker)
+        if end >= 0:
+            return data[:end]
+    return None
+
+
+def _probe_xref(fid: typing.BinaryIO, offset: int, entries: dict) -> typing.Optional[int]:
+    """Parse a classic cross-reference section and those preceding it (incremental updates),
+    collecting the offsets of objects in use. Newer sections take precedence.
+
+    Returns:
+        int or None, the object number of the catalog, or None if not a classic section
+    """
+    root, seen = None, set()
+    while offset is not None and offset not in seen:
+        seen.add(offset)
+        section = _read_until(fid, offset, b'startxref')
+        if section is None or not section.lstrip().startswith(b'xref'):
+            return None  # e.g. a cross-reference stream
+        table, _, trailer = section.lstrip()[4:].partition(b'trailer')
+        tokens = table.split()
+        i = 0
+        while i + 1 < len(tokens):
+            start, count = int(tokens[i]), int(tokens[i + 1])
+            for n in range(count):
+                off, _, flag = tokens[i + 2 + 3 * n:i + 5 + 3 * n]
+                if flag == b'n':
+                    entries.setdefault(start + n, int(off))
+            i += 2 + 3 * count
+        match = _TRAILER_ROOT.search(trailer)
+        if root is None and match is not None:
+            root = int(match.group(1))
+        match = _TRAILER_PREV.search(trailer)
+        offset = None if match is None else int(match.group(1))
+    return root
+
+
+def _probe_object(fid: typing.BinaryIO, entries: dict, num: int) -> typing.Optional[bytes]:
+    """Read the body of an object from its offset, or None if it is not where the table says"""
+    if num not in entries:
+        return None  # e.g. in an object stream
+    data = _read_until(fid, entries[num], b'endobj')
+    if data is None or not re.match(rb'\s*%d\s+\d+\s+obj' % num, data):
+        return None
+    return data
+
+
+def probe_page_count(source: typing.Union[str, typing.BinaryIO]) -> typing.Optional[int]:
+    """Count the pages of a PDF from its page tree root alone, reading only the trailer, the
+    cross-reference table, the catalog and the root of the page tree, rather than parsing
+    the document. Files whose structure cannot be probed this way (e.g. cross-reference
+    streams or damaged tables) are reported as such rather than guessed at.
+
+    Args:
+        source:
+            str or file-like, the path of the PDF or a seekable binary file object
+
+    Returns:
+        int or None, the number of pages, or None if the file could not be probed
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as fid:
+            return probe_page_count(fid)
+    try:
+        size = source.seek(0, io.SEEK_END)
+        source.seek(max(0, size - 1024))
+        match = None
+        for match in _STARTXREF.finditer(source.read()):
+            pass  # the last one
+        if match is None:
+            return None
+        entries = {}
+        root = _probe_xref(source, int(match.group(1)), entries)
+        catalog = None if root is None else _probe_object(source, entries, root)
+        match = None if catalog is None else _PAGES.search(catalog)
+        pages = None if match is None else _probe_object(source, entries, int(match.group(1)))
+        match = None if pages is None else _COUNT.search(pages)
+        return None if match is None else int(match.group(1))
+    except (OSError, ValueError):
+        return None
+
+
+def count_pages(source: typing.Union[str, typing.BinaryIO]) -> int:
+    """Count the pages of a PDF, probing the page tree root (see probe_page_count) and
+    parsing the whole document only if that fails
+
+    Args:
+        source:
+            str or file-like, the path of the PDF or a binary file object positioned
+            at its start
+
+    Returns:
+        int, the number of pages
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as fid:
+            return count_pages(fid)
+    start = source.tell()
+    pages = probe_page_count(source)
+    if pages is not None:
+        return pages
+    source.seek(start)
+    return pypdf.PdfFileReader(source).getNumPages()
+
+
+def sha256_file(path: str, chunk_size: int=64 * 1024) -> str:
+    """Compute the sha256 hex digest of a file, reading it in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fid:
+        for chunk in iter(lambda: fid.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BuildCheckpoint:
+    FILE_NAME = 'build.json'
+
+    def __init__(self, dir: str):
+        """A record of the articles downloaded (and those that failed) while building an issue
+        pdf in a work directory, saved after every article so that an interrupted or partly
+        failed build can be resumed without downloading the articles again.
+
+        Args:
+            dir:
+                str, the work directory holding the article files and the checkpoint
+        """
+        self.dir = dir
+        self.path = os.path.join(dir, self.FILE_NAME)
+        self._articles = {}  # file name -> {url, pages, sha256}
+        self._failures = {}  # file name -> {url, name, error}
+        self._lock = threading.Lock()
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as fid:
+                data = json.load(fid)
+            self._articles, self._failures = data['articles'], data['failures']
+
+    def __repr__(self):
+        return 'BuildCheckpoint({!r})'.format(self.dir)
+
+    @property
+    def failures(self) -> typing.List[dict]:
+        """The articles that failed to download in the last attempt and need retrying, as
+        dicts with the file, url, name and error of the article"""
+        return [dict(file=f, **v) for f, v in sorted(self._failures.items())]
+
+    def get(self, article, path: str) -> typing.Optional[ArticleMeta]:
+        """Get the meta data of an article downloaded in an earlier attempt, if its file is
+        still present and its content matches the recorded hash
+
+        Args:
+            article:
+                Article, the article
+            path:
+                str, the path of the article file
+
+        Returns:
+            ArticleMeta or None, if the article needs downloading
+        """
+        entry = self._articles.get(os.path.basename(path))
+        if entry is None or entry['url'] != article.pdf_url or not os.path.exists(path) or sha256_file(path) != entry['sha256']:
+            return None
+        return ArticleMeta(article, path, entry['pages'], entry['sha256'], None)
+
+    def record(self, meta: ArticleMeta, path: str):
+        """Record the outcome of downloading an article, and save the checkpoint"""
+        name = os.path.basename(path)
+        with self._lock:
+            if meta.error is None:
+                self._articles[name] = {'url': meta.article.pdf_url, 'pages': meta.pages, 'sha256': meta.sha256}
+                self._failures.pop(name, None)
+            else:
+                self._articles.pop(name, None)
+                self._failures[name] = {'url': meta.article.pdf_url, 'name': meta.article.name, 'error': repr(meta.error)}
+            self._save()
+
+    def _save(self):
+        fd, tmp = tempfile.mkstemp(dir=self.dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as fid:
+            json.dump({'articles': self._articles, 'failures': self._failures}, fid, indent=2)
+        os.replace(tmp, self.path)
+
+
+def _numbered_contents(issue):
+    """Traverse the issue contents along with the position of each article in issue.articles,
+    which tells articles apart even when they share a name or appear in several sections
+
+    Returns:
+        Generator[Tuple[int, int, Union[Section, Article]]], the level, the position (None for
+        a section) and the member
+    """
+    pos = 0
+    for level, member in issue.contents(include_level=True):
+        if member.__class__.__name__ == 'Section':  # figure out dependency issue here
+            yield level, None, member
+        else:
+            yield level, pos, member
+            pos += 1
+
+
+def get_issue_meta(issue, dir: str, workers: int=4, rate: float=1.0, burst: int=1, checkpoint: BuildCheckpoint=None) -> typing.List[ArticleMeta]:
     """Download Issue contents and return meta data about where the articles
-    have been download. 
+    have been download. Articles are downloaded concurrently, with the start of each
+    download governed by a token bucket rate limiter. A failed download does not abort
+    the others, instead the error is recorded in the returned meta data. If a default
+    PdfStore is set, stored articles are taken from it without downloading. If a checkpoint
+    is given, articles it records as downloaded and verified are not downloaded again.
 
     Args:
         issue: 
             Issue, the issue whose articles to download
         dir:
             str, the directory name
-        throttle:
-            int, the number of seconds between downloads, used to 
+        workers:
+            int, default 4, the maximum number of concurrent downloads
+        rate:
+            float, default 1.0, the average number of downloads started per second
+        burst:
+            int, default 1, the number of downloads that may start at once
+        checkpoint:
+            BuildCheckpoint, default None, the record of earlier attempts, updated as
+            articles are downloaded
 
     Returns:
-
+        List[ArticleMeta], in the order of the issue articles. The meta of a failed
+        download has file None, 0 pages, sha256 None and the raised exception as error
     """
     if not os.path.exists(dir):
         os.mkdir(dir)
-    meta = []
-    for article in issue.articles:
-        time.sleep(throttle)
-        path = os.path.join(dir, clean_path(article.name)) + '.pdf'
-        article.pdf(path)
-        with open(path, 'rb') as fid:
-            meta.append(ArticleMeta(article, path, pypdf.PdfFileReader(fid).getNumPages()))
-    return meta
+    bucket = throttle.TokenBucket(rate=rate, capacity=burst)
+    pdf_store = store.get_default_store()
+
+    def download(n, article):
+        # prefix with the position so articles of the same name never share a file
+        path = os.path.join(dir, '{:03d} {}.pdf'.format(n, clean_path(article.name)))
+        meta = None if checkpoint is None else checkpoint.get(article, path)
+        if meta is not None:
+            return meta
+        # a single lookup, as each one hashes the stored pdf
+        entry = None if pdf_store is None else pdf_store.get(article.pdf_url)
+        if entry is None:
+            with metrics.span('pdf.throttle'):
+                bucket.acquire()  # stored articles are not downloaded, so not rate limited
+        try:
+            with metrics.span('pdf.download', url=article.pdf_url):
+                info = article.pdf(path) if entry is None else pdf_store.fetch(article.pdf_url, path, entry=entry)
+            with metrics.span('pdf.count_pages'):
+                meta = ArticleMeta(article, path, count_pages(path), info.sha256, None)
+        except Exception as e:
+            meta = ArticleMeta(article, None, 0, None, e)
+            metrics.count('pdf.failures', url=article.pdf_url)
+        if checkpoint is not None:
+            checkpoint.record(meta, path)
+        return meta
+
+    articles = issue.articles
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(download, range(len(articles)), articles))
 
 
 class ApsPDF(fpdf.FPDF):
@@ -56,47 +319,26 @@ class ApsPDF(fpdf.FPDF):
         super().__init__(orientation=orientation, unit=unit, format=format)
         self.alias_nb_pages()
         self.set_font('Arial', '', size=10)
-        self._meta_x = 0
-        self._meta_y = 0
         self._meta_links = []
-        self._meta_bookmarks = []
         self._meta_issue = issue
         self._meta_out_file = out_file 
-        self._sync_page_no()
-        out_path = pathlib.Path(self._meta_out_file)
-        self._meta_pre_path = (out_path.parent / ('pre_' + out_path.name)).as_posix()
 
     ####################### META DATA CURATION #######################
 
     def _meta_link(self, s, t, x, y, w, h):
-        self.links.append(LinkMeta(s, t, x, y, w, h))
+        self._meta_links.append(LinkMeta(s, t, x, y, w, h))
 
-    def _meta_bookmark(self, name, page, parent=None):
-        b = BookmarkMeta(name, page, parent)
-        self._meta_bookmarks.append(b)
-        return b
+    def link_rect(self, link: LinkMeta) -> typing.Tuple[float, float, float, float]:
+        """The rectangle of a recorded link in pdf user space, i.e. points from the bottom left
+        corner of the page, as opposed to the document units from the top left corner
 
-    def _sync_page_no(self):
-        self._meta_page = self.page_no()
+        Returns:
+            Tuple[float, float, float, float], the lower left and upper right corners
+        """
+        return (link.x * self.k, (self.h - link.y - link.h) * self.k, (link.x + link.w) * self.k, (self.h - link.y) * self.k)
 
     ####################### OVERRIDDEN METHODS #######################
 
-    def add_page(self, orientation=''):
-        self._meta_x, self._meta_y = 0, 0
-        super().add_page(orientation=orientation)
-        self._sync_page_no()
-
-    def cell(self, w, h=0, txt='', border=0, ln=0, align='', fill=0, link='', meta_link: str=None):
-        if meta_link is not None:
-            self._meta_links.append(LinkMeta(meta_link.source_page, meta_link.target_page, self._meta_x, self._meta_y, w, h))
-        super().cell(w, h, txt, border, ln, align, fill, link)
-        page = self.page_no()
-        if page > self._meta_page: # crossed over into new page
-            self._meta_x, self._meta_y = w, h # reset
-            self._sync_page_no()
-        self._meta_x += w
-        self._meta_y += h
-
     def footer(self):
         self.set_y(-15)
         self.set_font('Arial', 'I', 8)
@@ -104,122 +346,243 @@ class ApsPDF(fpdf.FPDF):
 
     #######################  ADDITIONAL  PAGES  #######################
 
-    def add_page_cover(self):
-        """Add cover page"""
+    def add_page_title(self, lines: typing.List[str]):
+        """Add a title page, one centered line per item"""
         self.add_page()
         self.cell(0, 50, '', ln=1)  # padding
         self.set_font_size(20)
-        self.cell(0, 10, self._meta_issue.vol.journal.name, align='C', ln=1)
-        self.cell(0, 10, "Volume {:d} Issue {:d}".format(self._meta_issue.vol.num, self._meta_issue.num), align='C', ln=1)
-        # self.cell(0, 170, '', ln=1)  # padding
+        for line in lines:
+            self.cell(0, 10, line, align='C', ln=1)
 
-    def add_page_contents(self, meta_cache):
-        """Add Table of Contents"""
-        self.add_page()
+    def add_page_cover(self):
+        """Add cover page"""
+        self.add_page_title([self._meta_issue.vol.journal.name, "Volume {:d} Issue {:d}".format(self._meta_issue.vol.num, self._meta_issue.num)])
+
+    def _wrap(self, text: str, width: float, style: str, size: int) -> typing.List[str]:
+        """Split text into lines no wider than width in the given font, breaking between words"""
+        self.set_font('Arial', style=style, size=size)
+        lines, line = [], ''
+        for word in text.split():
+            candidate = word if not line else line + ' ' + word
+            if line and self.get_string_width(candidate) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+        return lines
+
+    def _layout_contents(self, meta_cache) -> typing.Tuple[typing.List[TocBlock], int]:
+        """Measure and paginate the Table of Contents without rendering it. Every section
+        heading and article entry is a block kept whole on a page, and a heading is moved
+        to the next page along with the entry following it rather than left at the bottom.
+
+        Args:
+            meta_cache:
+                Dict[int, ArticleMeta], the meta data of the downloaded articles by position
+
+        Returns:
+            Tuple[List[TocBlock], int], the placed blocks and the number of pages they take
+        """
         max_authors = 10
-        line_items = list(self._meta_issue.contents(True))
-        contents_pages = len(line_items) * 10 // 208 + 1 + 1
-        page = contents_pages + 1
-        for level, member in line_items:
-            if member.__class__.__name__ == 'Section':  # figure out dependency issue here
-                self.set_font('Arial', style='', size=16 - 2 * level)
-                self.cell(0, 10, txt=member.name, ln=1)
-            else:  # Article
-                meta = meta_cache[member.name]
-                indent = 10 * ' '
-
-                # Create link
-                link = LinkMeta(self.page_no() - 1, page, None, None, None, None)
-
-                # add article title
-                self.set_font('Arial', style='I', size=10)
-                self.cell(50, 7, txt=indent + member.name, ln=0, meta_link=link)
-
-                # add page number at end of title line
-                self.set_font('Arial', style='', size=10)
-                self.cell(0, 7, txt=str(page + contents_pages), ln=1, align='R')
-
-                # add author line
-                self.set_font('Arial', style='', size=8)
-                author_text = 2 * indent + ', '.join(a.last_name for a in member.authors[:max_authors]) + (' et. al.' if len(member.authors) > max_authors else '')
-                self.cell(10, 2, txt=author_text, ln=1, meta_link=link)  # author name
-                self.cell(10, 4, txt='', ln=1)  # padding below author name
-                page = page + meta.pages
-
-    ####################### META INFO BUILDERS #######################
-
-    def add_bookmarks(self):
-        """Add bookmarks to document"""
-        with open(self._meta_out_file, 'wb') as out_fid:
-            with open(self._meta_pre_path, 'rb') as pre_fid:
-                reader = pypdf.PdfFileReader(pre_fid)
-                writer = pypdf.PdfFileWriter()
-                page_bookmarks = {b.page: [] for b in self._meta_bookmarks} # TODO refactor for defaultdict
-                for b in self._meta_bookmarks:
-                    page_bookmarks[b.page].append(b)
-                bookmark_cache = {}
-                page_links = {l.target_page: l for l in self._meta_links}
-                for n in range(reader.getNumPages()):
-                    writer.addPage(reader.getPage(pageNumber=n))
-                    if n == 1:
-                        writer.addBookmark('Cover', 0)
-                    elif n == 2:
-                        writer.addBookmark('Contents', 1)
-                    elif n in page_bookmarks:
-                        for bookmark in page_bookmarks[n]:
-                            bookmark_handle = writer.addBookmark(bookmark.name, bookmark.page, parent=bookmark_cache.get(bookmark.parent, None)) 
-                            bookmark_cache[bookmark] = bookmark_handle
-                    # if n in page_links: # TODO resolve the mismatched placement of the links
-                    #     link = page_links[n]
-                    #     print('Adding Link: ({:d}, {:d}, {:d}, {:d}) {:d} -> {:d}'.format(link.h, link.w, link.x, link.y, link.source_page, link.target_page))
-                    #     writer.addLink(link.source_page, link.target_page, rect=(link.x, link.y, link.w, link.h))
-                writer.write(out_fid)
-
-    def cleanup(self):
-        """Remove the temp file"""
-        os.remove(self._meta_pre_path)
+        left, width = self.l_margin, self.w - self.l_margin - self.r_margin
+        indent, number_width = 10, 15
+        blocks = []
+        for level, pos, member in _numbered_contents(self._meta_issue):
+            if pos is None:  # Section
+                size = 16 - 2 * level
+                lines = self._wrap(member.name, width, '', size)
+                rows = [TocRow(left, n * 10, width, 10, line, '', size, '') for n, line in enumerate(lines)]
+                blocks.append(TocBlock(0, 0, 10 * len(lines), rows, None))
+            elif pos in meta_cache:  # Article, skipping failed downloads
+                titles = self._wrap(member.name, width - indent - number_width, 'I', 10)
+                rows = [TocRow(left + indent, n * 7, width - indent - number_width, 7, line, 'I', 10, '') for n, line in enumerate(titles)]
+                rows.append(TocRow(left + width - number_width, 0, number_width, 7, None, '', 10, 'R'))  # page number
+                author_text = ', '.join(a.last_name for a in member.authors[:max_authors]) + (' et. al.' if len(member.authors) > max_authors else '')
+                authors = self._wrap(author_text, width - 2 * indent, '', 8)
+                rows.extend(TocRow(left + 2 * indent, 7 * len(titles) + n * 4, width - 2 * indent, 4, line, '', 8, '') for n, line in enumerate(authors))
+                blocks.append(TocBlock(0, 0, 7 * len(titles) + 4 * len(authors) + 2, rows, meta_cache[pos].pages))
+
+        # paginate
+        top, bottom = self.t_margin, self.page_break_trigger
+        page, y = 0, top
+        for n, block in enumerate(blocks):
+            need = block.h
+            if block.pages is None and n + 1 < len(blocks):
+                need += blocks[n + 1].h  # keep a heading with the entry following it
+            if y + need > bottom and y > top:
+                page, y = page + 1, top
+            blocks[n] = block._replace(page=page, y=y)
+            y += block.h
+        return blocks, page + 1
+
+    def add_page_contents(self, meta_cache, offset: int=0):
+        """Add Table of Contents. The contents are laid out before rendering, so the page
+        numbers account for the exact number of contents pages, and each article entry
+        links to the first page of the article.
+
+        Args:
+            meta_cache:
+                Dict[int, ArticleMeta], the meta data of the downloaded articles by position
+            offset:
+                int, default 0, the number of pages preceding the issue in the document
+        """
+        blocks, contents_pages = self._layout_contents(meta_cache)
+        first = self.page_no()
+        target = offset + first + contents_pages  # index of the first article page in the document
+        for n in range(contents_pages):
+            self.add_page()
+            for block in (b for b in blocks if b.page == n):
+                for row in block.rows:
+                    self.set_xy(row.x, block.y + row.dy)
+                    self.set_font('Arial', style=row.style, size=row.size)
+                    self.cell(row.w, row.h, txt=str(target + 1) if row.text is None else row.text, align=row.align)
+                if block.pages is not None:
+                    self._meta_link(first + n, target, self.l_margin, block.y, self.w - self.l_margin - self.r_margin, block.h)
+                    target += block.pages
+
+    def render(self) -> io.BytesIO:
+        """Render the pages added so far to an in-memory pdf"""
+        return io.BytesIO(self.output(dest='S').encode('latin-1'))
 
     ####################### PRIMARY INTERFACE BUILD #######################
 
-    def build(self):
-        """Build the pdf"""
-        with tempfile.TemporaryDirectory('.aps-tmp') as tmp:
-            # Build issue 
-            metas = get_issue_meta(self._meta_issue, str(tmp))
-            meta_cache = {m.article.name: m for m in metas}
-
-            # output cover pages
-            self.add_page_cover()
-            self.add_page_contents(meta_cache)
-            self.output(os.path.join(str(tmp), 'cover.pdf'))
-
-            # Get overall writer
-            writer = pypdf.PdfFileWriter()
-
-            # Write out fully assembled file
-            with open(self._meta_pre_path, 'wb') as out_fid:
-                # writer.write(fid)
-
-                # Establish cover pages
-                with open(os.path.join(str(tmp), 'cover.pdf'), 'rb') as fid:
-                    cover_reader = pypdf.PdfFileReader(fid)
-                    page = cover_reader.getNumPages()
-                    writer.appendPagesFromReader(cover_reader, after_page_append=0)
-                    writer.write(out_fid)
-    
-                # Walk through individual article pdfs and add each to the overall PDF
-                parents = {1: None}
-                for level, item in self._meta_issue.contents(include_level=True):
-                    if item.__class__.__name__ == 'Section':
-                        parents[level + 1] = self._meta_bookmark(item.name, page, parent=parents.get(level, None))
-                    else:  # Article
-                        meta = meta_cache[item.name]
-                        with open(meta.file, 'rb') as fid:
-                            reader = pypdf.PdfFileReader(fid)
-                            writer.appendPagesFromReader(reader, after_page_append=page)
-                            writer.write(out_fid)
-                            self._meta_bookmark(meta.article.name, page, parent=parents[level])
-                        page += meta.pages
-                # writer.write(out_fid)    
-            self.add_bookmarks()
-        self.cleanup()
+    def build(self, workers: int=4, rate: float=1.0, work_dir: str=None) -> typing.List[ArticleMeta]:
+        """Build the pdf. The cover pages and every article are streamed into the output
+        file one after the other, along with the outline, so memory use does not grow with
+        the number of pages. Articles whose download failed are left out of the document.
+
+        Args:
+            workers:
+                int, default 4, the maximum number of concurrent downloads
+            rate:
+                float, default 1.0, the average number of downloads started per second
+            work_dir:
+                str, default None, the directory to download the articles to. If given, the
+                directory is kept along with a BuildCheckpoint, so that building again resumes:
+                only articles that are missing, failed or fail verification are downloaded.
+                If None, a temporary directory is used
+
+        Returns:
+            List[ArticleMeta], the meta data of the articles that failed to download
+        """
+        return _compile([(self._meta_issue, self)], self._meta_out_file, workers=workers, rate=rate, work_dir=work_dir)
+
+
+def compile_issues(issues, out_file: str, title: typing.List[str]=None, workers: int=4, rate: float=1.0,
+                   work_dir: str=None) -> typing.List[ArticleMeta]:
+    """Compile several issues (e.g. a volume) into a single pdf with one outline entry per issue.
+    Each issue has its own cover and table of contents, and is downloaded and streamed into the
+    output in turn, so neither memory use nor (without a work_dir) disk use grows with the number
+    of issues.
+
+    Args:
+        issues:
+            Iterable[Issue], the issues, in the order they appear in the document
+        out_file:
+            str, the path of the output pdf
+        title:
+            List[str], default None, the lines of a title page preceding the issues. If None,
+            the document has no title page
+        workers:
+            int, default 4, the maximum number of concurrent downloads
+        rate:
+            float, default 1.0, the average number of downloads started per second
+        work_dir:
+            str, default None, the directory to keep the downloaded articles in, one checkpointed
+            subdirectory per issue (see ApsPDF.build). If None, temporary directories are used
+
+    Returns:
+        List[ArticleMeta], the meta data of the articles that failed to download
+    """
+    return _compile(((i, ApsPDF(i, out_file)) for i in issues), out_file, title=title, nested=True,
+                    workers=workers, rate=rate, work_dir=work_dir)
+
+
+def _compile(docs, out_file: str, title: typing.List[str]=None, nested: bool=False, workers: int=4, rate: float=1.0,
+             work_dir: str=None) -> typing.List[ArticleMeta]:
+    """Stream issues into a pdf, writing to a temporary file renamed into place once complete
+
+    Args:
+        docs:
+            Iterable[Tuple[Issue, ApsPDF]], the issues with the document rendering their cover pages
+        nested:
+            bool, default False, if True the outline of each issue is nested under an entry for the issue
+    """
+    failed = []
+    fd, tmp_out = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(out_file)), suffix='.part')
+    try:
+        with metrics.span('pdf.build'), os.fdopen(fd, 'wb') as fid, contextlib.ExitStack() as dirs:
+            keep = work_dir is not None
+            if not keep:
+                work_dir = dirs.enter_context(tempfile.TemporaryDirectory('.aps-tmp'))
+            else:
+                os.makedirs(work_dir, exist_ok=True)
+            writer = pdfwriter.StreamingPdfWriter(fid, producer='apsjournals {}'.format(apsjournals.__version__))
+            if title is not None:
+                doc = ApsPDF(None, out_file)
+                doc.add_page_title(title)
+                writer.add_bookmark(' '.join(title), writer.append(doc.render()))
+            for issue, doc in docs:
+                if nested:  # one subdirectory per issue, removed once written unless kept
+                    issue_dir = os.path.join(work_dir, '{}-{:d}-{:d}'.format(issue.journal.url_path, issue.vol.num, issue.num))
+                    os.makedirs(issue_dir, exist_ok=True)
+                else:
+                    issue_dir = work_dir
+                failed.extend(_write_issue(writer, issue, doc, issue_dir, checkpoint=BuildCheckpoint(issue_dir) if keep else None,
+                                           nested=nested, workers=workers, rate=rate))
+                if nested and not keep:
+                    shutil.rmtree(issue_dir)  # only one issue is held on disk at a time
+            writer.close()
+        os.replace(tmp_out, out_file)
+    except BaseException:
+        if os.path.exists(tmp_out):
+            os.remove(tmp_out)
+        raise
+    return failed
+
+
+def _write_issue(writer: pdfwriter.StreamingPdfWriter, issue, doc: ApsPDF, issue_dir: str, checkpoint: BuildCheckpoint,
+                 nested: bool, workers: int, rate: float) -> typing.List[ArticleMeta]:
+    """Download the articles of an issue and stream its cover pages and articles into a writer
+
+    Returns:
+        List[ArticleMeta], the meta data of the articles that failed to download
+    """
+    with metrics.span('pdf.get_issue_meta'):
+        metas = get_issue_meta(issue, issue_dir, workers=workers, rate=rate, checkpoint=checkpoint)
+    failed = [m for m in metas if m.error is not None]
+    meta_cache = {pos: m for pos, m in enumerate(metas) if m.error is None}
+    if failed:
+        warnings.warn('Failed to download {:d} articles of {!r}, they are left out of the pdf{}: {}'.format(
+            len(failed), issue, '' if checkpoint is None else ' (build again to retry them)',
+            ', '.join(m.article.name for m in failed)))
+
+    # render cover pages in memory
+    first = writer.num_pages
+    with metrics.span('pdf.render'):
+        doc.add_page_cover()
+        doc.add_page_contents(meta_cache, offset=first)
+        cover = doc.render()
+    for link in doc._meta_links:
+        writer.add_link(first + link.source_page, doc.link_rect(link), link.target_page)
+    writer.append(cover)
+    parent = None
+    if nested:
+        date = '' if issue.date is None else ' ({d.day:d} {d:%B %Y})'.format(d=issue.date)
+        parent = writer.add_bookmark('Issue {:d}{}'.format(issue.num, date), first)
+    writer.add_bookmark('Cover', first, parent=parent)
+    writer.add_bookmark('Contents', first + 1, parent=parent)
+
+    # Walk through individual article pdfs and stream each into the overall PDF
+    parents = {1: parent}
+    for level, pos, item in _numbered_contents(issue):
+        if pos is None:  # Section
+            parents[level + 1] = writer.add_bookmark(item.name, writer.num_pages, parent=parents.get(level, parent))
+        elif pos in meta_cache:  # Article, skipping failed downloads
+            meta = meta_cache[pos]
+            with metrics.span('pdf.write'):
+                page = writer.append(meta.file)
+            writer.add_bookmark(meta.article.name, page, parent=parents[level])
+            metrics.count('pdf.pages', meta.pages)
+    return failed
@@ -0,0 +1,290 @@
+"""Incremental PDF writer for large compilations
+
+PyPDF2's PdfFileWriter keeps every page appended to it, along with the reader it came from,
+until the whole document is written, so the memory used by a compilation grows with its page
+count. StreamingPdfWriter writes each appended page to the output straight away instead, along
+with the objects it references (contents, fonts, images, annotations...), renumbered for the
+output document. Only the byte offset of every object, the page ids and the outline are kept
+until the document is closed, when the page tree, outline, link destinations, cross-reference
+table and trailer are written.
+
+The writer relies on PyPDF2 1.x internals (PdfFileReader, StreamObject._data, writeToStream),
+which PyPDF2 2 renamed and 3 removed, hence the pin to pypdf2>=1.26,<2.
+
+Example:
+    >>> with open('out.pdf', 'wb') as fid, StreamingPdfWriter(fid) as writer:
+    ...     first = writer.append('article.pdf')
+    ...     writer.add_bookmark('Article', first)
+"""
+
+
+import collections
+import io
+import os
+import typing
+import PyPDF2 as pypdf
+from PyPDF2 import generic
+
+if int(pypdf.__version__.split('.')[0]) >= 2:
+    raise ImportError('apsjournals requires pypdf2>=1.26,<2, found {}'.format(pypdf.__version__))
+
+
+Bookmark = collections.namedtuple('Bookmark', 'title page parent')
+Link = collections.namedtuple('Link', 'rect target')
+
+HEADER = b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n'
+
+
+def _ref(num: int) -> generic.IndirectObject:
+    return generic.IndirectObject(num, 0, None)
+
+
+class StreamingPdfWriter:
+    def __init__(self, fid: typing.BinaryIO, producer: str=None):
+        """Write a PDF incrementally to a binary file object
+
+        Args:
+            fid:
+                file-like, the binary output, written sequentially (it need not be seekable)
+            producer:
+                str, default None, the producer recorded in the document info
+        """
+        self._fid = fid
+        self._pos = 0
+        self._offsets = {}  # object number -> byte offset
+        self._next_num = 1
+        self._catalog = self._reserve()
+        self._pages = self._reserve()
+        self._page_nums = []
+        self._bookmarks = []
+        self._links = collections.defaultdict(list)  # page index -> [Link], for pages not yet written
+        self._dests = set()  # page indices targeted by links
+        self._producer = producer
+        self._closed = False
+        self._write(HEADER)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+    @property
+    def num_pages(self) -> int:
+        return len(self._page_nums)
+
+    def _write(self, data: bytes):
+        self._fid.write(data)
+        self._pos += len(data)
+
+    def _reserve(self) -> int:
+        num, self._next_num = self._next_num, self._next_num + 1
+        return num
+
+    def _write_object(self, num: int, obj):
+        buf = io.BytesIO()
+        buf.write('{:d} 0 obj\n'.format(num).encode('ascii'))
+        obj.writeToStream(buf, None)
+        buf.write(b'\nendobj\n')
+        self._offsets[num] = self._pos
+        self._write(buf.getvalue())
+
+    def _copy(self, obj, nums: dict, queue: list):
+        """Copy an object of the source document, renumbering its references. Referenced
+        objects not seen before are given a number and queued to be written."""
+        if isinstance(obj, generic.IndirectObject):
+            key = (obj.idnum, obj.generation)
+            if key not in nums:
+                nums[key] = self._reserve()
+                queue.append(obj)
+            return _ref(nums[key])
+        elif isinstance(obj, generic.StreamObject):
+            copy = obj.__class__()
+            copy._data = obj._data  # still encoded, written as is
+            copy.update((k, self._copy(v, nums, queue)) for k, v in dict.items(obj))
+            return copy
+        elif isinstance(obj, generic.DictionaryObject):
+            return generic.DictionaryObject((k, self._copy(v, nums, queue)) for k, v in dict.items(obj))
+        elif isinstance(obj, generic.ArrayObject):
+            return generic.ArrayObject(self._copy(v, nums, queue) for v in obj)
+        return obj
+
+    def _drain(self, nums: dict, queue: list):
+        """Write the queued objects, and those they reference in turn"""
+        while queue:
+            ref = queue.pop()
+            obj = ref.getObject()
+            if isinstance(obj, generic.DictionaryObject) and obj.get('/Type') in ('/Pages', '/Catalog'):
+                obj = generic.NullObject()  # the structure of the source document is not copied
+            else:
+                obj = self._copy(obj, nums, queue)
+            self._write_object(nums[(ref.idnum, ref.generation)], obj)
+
+    def append(self, source: typing.Union[str, typing.BinaryIO]) -> int:
+        """Append all pages of a PDF, writing them to the output straight away
+
+        Args:
+            source:
+                str or file-like, the path of the PDF or a binary file object positioned at its start
+
+        Returns:
+            int, the index of the first appended page in the output document
+        """
+        if self._closed:
+            raise ValueError('Unable to append to a closed writer')
+        first = self.num_pages
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as fid:
+                self._append_reader(pypdf.PdfFileReader(fid, strict=False))
+        else:
+            self._append_reader(pypdf.PdfFileReader(source, strict=False))
+        return first
+
+    def _append_reader(self, reader: pypdf.PdfFileReader):
+        if reader.isEncrypted:
+            reader.decrypt('')
+        pages = [reader.getPage(n) for n in range(reader.getNumPages())]  # inherited attributes are resolved
+        nums, queue = {}, []
+        for page in pages:  # number the pages first, so that references between them are kept
+            nums[(page.indirectRef.idnum, page.indirectRef.generation)] = self._reserve()
+        for page in pages:
+            copy = generic.DictionaryObject((k, self._copy(v, nums, queue)) for k, v in dict.items(page) if k != '/Parent')
+            copy[generic.NameObject('/Parent')] = _ref(self._pages)
+            links = self._links.pop(self.num_pages, [])
+            if links:
+                annots = self._copy(page['/Annots'], nums, queue) if '/Annots' in page else []
+                copy[generic.NameObject('/Annots')] = generic.ArrayObject(list(annots) + [self._link_annotation(l) for l in links])
+            num = nums[(page.indirectRef.idnum, page.indirectRef.generation)]
+            self._write_object(num, copy)
+            self._page_nums.append(num)
+            self._drain(nums, queue)
+
+    def add_link(self, page: int, rect: typing.Tuple[float, float, float, float], target: int):
+        """Add a link from an area of a page to another page. Pages are written as they are
+        appended, so the link must be added before its page is.
+
+        Args:
+            page:
+                int, the index of the page holding the link, not appended yet
+            rect:
+                Tuple[float, float, float, float], the lower left and upper right corners of the
+                area, in pdf user space (points from the bottom left corner of the page)
+            target:
+                int, the index of the target page, which may not be appended yet
+
+        Raises:
+            ValueError: if the page is already written
+        """
+        if page < self.num_pages:
+            raise ValueError('Unable to add a link to page {:d}, it is already written'.format(page))
+        self._links[page].append(Link(rect, target))
+        self._dests.add(target)
+
+    @staticmethod
+    def _dest_name(page: int) -> generic.NameObject:
+        return generic.NameObject('/page{:d}'.format(page))
+
+    def _link_annotation(self, link: Link) -> generic.DictionaryObject:
+        """A link annotation to a named destination, as the target page may not be numbered yet"""
+        return generic.DictionaryObject({
+            generic.NameObject('/Type'): generic.NameObject('/Annot'),
+            generic.NameObject('/Subtype'): generic.NameObject('/Link'),
+            generic.NameObject('/Rect'): generic.ArrayObject(generic.FloatObject(round(v, 3)) for v in link.rect),
+            generic.NameObject('/Border'): generic.ArrayObject(generic.NumberObject(0) for _ in range(3)),
+            generic.NameObject('/Dest'): self._dest_name(link.target),
+        })
+
+    def add_bookmark(self, title: str, page: int, parent: int=None) -> int:
+        """Add an outline item pointing to a page
+
+        Args:
+            title:
+                str, the title of the item
+            page:
+                int, the index of the page in the output document. A page past the end (e.g. a
+                section with no pages) points to the last page
+            parent:
+                int, default None, the handle of the parent item. If None, a top level item
+
+        Returns:
+            int, the handle of the item, to be used as the parent of other items
+        """
+        self._bookmarks.append(Bookmark(title, page, parent))
+        return len(self._bookmarks) - 1
+
+    def _write_outline(self) -> int:
+        root = self._reserve()
+        nums = [self._reserve() for _ in self._bookmarks]
+        children = collections.defaultdict(list)
+        for n, b in enumerate(self._bookmarks):
+            children[b.parent].append(n)
+
+        def count(parent):
+            return sum(1 + count(c) for c in children[parent])
+
+        for n, b in enumerate(self._bookmarks):
+            siblings = children[b.parent]
+            i = siblings.index(n)
+            item = generic.DictionaryObject({
+                generic.NameObject('/Title'): generic.createStringObject(b.title),
+                generic.NameObject('/Parent'): _ref(root if b.parent is None else nums[b.parent]),
+                generic.NameObject('/Dest'): generic.ArrayObject([_ref(self._page_nums[min(b.page, self.num_pages - 1)]), generic.NameObject('/Fit')]),
+            })
+            if i > 0:
+                item[generic.NameObject('/Prev')] = _ref(nums[siblings[i - 1]])
+            if i < len(siblings) - 1:
+                item[generic.NameObject('/Next')] = _ref(nums[siblings[i + 1]])
+            if children[n]:
+                item[generic.NameObject('/First')] = _ref(nums[children[n][0]])
+                item[generic.NameObject('/Last')] = _ref(nums[children[n][-1]])
+                item[generic.NameObject('/Count')] = generic.NumberObject(count(n))
+            self._write_object(nums[n], item)
+        self._write_object(root, generic.DictionaryObject({
+            generic.NameObject('/Type'): generic.NameObject('/Outlines'),
+            generic.NameObject('/First'): _ref(nums[children[None][0]]),
+            generic.NameObject('/Last'): _ref(nums[children[None][-1]]),
+            generic.NameObject('/Count'): generic.NumberObject(count(None)),
+        }))
+        return root
+
+    def close(self):
+        """Write the page tree, outline, cross-reference table and trailer. The output file
+        object is not closed."""
+        if self._closed:
+            return
+        self._closed = True
+        self._write_object(self._pages, generic.DictionaryObject({
+            generic.NameObject('/Type'): generic.NameObject('/Pages'),
+            generic.NameObject('/Kids'): generic.ArrayObject(_ref(n) for n in self._page_nums),
+            generic.NameObject('/Count'): generic.NumberObject(self.num_pages),
+        }))
+        catalog = generic.DictionaryObject({
+            generic.NameObject('/Type'): generic.NameObject('/Catalog'),
+            generic.NameObject('/Pages'): _ref(self._pages),
+        })
+        if self._bookmarks and self._page_nums:
+            catalog[generic.NameObject('/Outlines')] = _ref(self._write_outline())
+            catalog[generic.NameObject('/PageMode')] = generic.NameObject('/UseOutlines')
+        if self._dests and self._page_nums:
+            catalog[generic.NameObject('/Dests')] = generic.DictionaryObject(
+                (self._dest_name(p), generic.ArrayObject([_ref(self._page_nums[min(p, self.num_pages - 1)]), generic.NameObject('/Fit')]))
+                for p in sorted(self._dests))
+        self._write_object(self._catalog, catalog)
+        trailer = generic.DictionaryObject({
+            generic.NameObject('/Size'): generic.NumberObject(self._next_num),
+            generic.NameObject('/Root'): _ref(self._catalog),
+        })
+        if self._producer is not None:
+            info = self._reserve()
+            self._write_object(info, generic.DictionaryObject({generic.NameObject('/Producer'): generic.createStringObject(self._producer)}))
+            trailer[generic.NameObject('/Info')] = _ref(info)
+            trailer[generic.NameObject('/Size')] = generic.NumberObject(self._next_num)
+
+        xref = self._pos
+        lines = ['xref', '0 {:d}'.format(self._next_num), '0000000000 65535 f ']
+        lines.extend('{:010d} 00000 n '.format(self._offsets[n]) for n in range(1, self._next_num))
+        self._write(('\n'.join(lines) + '\ntrailer\n').encode('ascii'))
+        buf = io.BytesIO()
+        trailer.writeToStream(buf, None)
+        self._write(buf.getvalue() + '\nstartxref\n{:d}\n%%EOF\n'.format(xref).encode('ascii'))
@@ -0,0 +1,169 @@
+"""Offline search over the articles of loaded issues
+
+Finding articles by author or keyword by scanning Issue.articles means holding (or re-fetching)
+the object tree of every issue. SearchIndex instead keeps a flat record per article together
+with inverted indexes from title/teaser words and author name words to the articles, persisted
+to a json file. Issues are added as they are loaded, and queries never touch the network.
+
+Example:
+    >>> index = search.SearchIndex('path/to/index.json')
+    >>> index.update(issues)  # issues already loaded, e.g. by bulk.load_issues
+    >>> index.save()
+    >>> index.search(author='Fairhurst', journal='prl', volumes=(118, 121))
+    [Document(journal='prl', volume=121, issue=6, title='Magnetic Levitation Stabilized by Streaming Fluid Flows', ...)]
+"""
+
+
+import collections
+import json
+import os
+import re
+import tempfile
+import typing
+import unicodedata
+from apsjournals import api
+
+
+Document = collections.namedtuple('Document', 'journal volume issue title authors teaser url pdf_url')
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text: str) -> typing.List[str]:
+    """Split text into lower case ascii words, e.g. "Schrödinger's cat" -> ['schrodinger', 's', 'cat']
+
+    Args:
+        text:
+            str or None, the text
+
+    Returns:
+        List[str], the words
+    """
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return _WORD.findall(text.lower())
+
+
+def author_name(author: api.Author) -> str:
+    """The display name of an author, first name first"""
+    return author.first_name if author.first_name == author.last_name else author.first_name + ' ' + author.last_name
+
+
+class SearchIndex:
+    def __init__(self, path: str=None):
+        """An inverted index over the articles of loaded issues
+
+        Args:
+            path:
+                str, default None, the json file the index is stored in. If given and the
+                file exists, the index is loaded from it
+        """
+        self.path = path
+        self._documents = []
+        self._issues = set()  # (journal, volume, issue) already indexed
+        self._words = collections.defaultdict(set)  # title and teaser word -> document ids
+        self._authors = collections.defaultdict(set)  # author name word -> document ids
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def __repr__(self):
+        return 'SearchIndex({!r}, {:d} documents)'.format(self.path, len(self._documents))
+
+    def __len__(self):
+        return len(self._documents)
+
+    def __contains__(self, issue: api.Issue):
+        return (issue.journal.url_path, issue.vol.num, issue.num) in self._issues
+
+    def _add(self, doc: Document):
+        n = len(self._documents)
+        self._documents.append(doc)
+        for w in tokenize(doc.title) + tokenize(doc.teaser):
+            self._words[w].add(n)
+        for w in tokenize(' '.join(doc.authors)):
+            self._authors[w].add(n)
+
+    def add_issue(self, issue: api.Issue) -> int:
+        """Index the articles of an issue, unless it is already indexed. The issue contents
+        are loaded if they are not cached. Articles listed more than once are indexed once.
+
+        Args:
+            issue:
+                Issue, the issue to index
+
+        Returns:
+            int, the number of articles added
+        """
+        if issue in self:
+            return 0
+        key = (issue.journal.url_path, issue.vol.num, issue.num)
+        # highlighted articles are listed twice in an issue, index each article once
+        articles = collections.OrderedDict()
+        for a in issue.articles:
+            articles.setdefault(a.url, a)
+        for a in articles.values():
+            self._add(Document(journal=key[0], volume=key[1], issue=key[2], title=a.name, authors=[author_name(x) for x in a.authors],
+                               teaser=a.teaser, url=a.url, pdf_url=a.pdf_url))
+        self._issues.add(key)
+        return len(articles)
+
+    def update(self, issues: typing.Iterable[api.Issue]) -> int:
+        """Index the issues whose contents are loaded, skipping the others so that no
+        request is ever made
+
+        Args:
+            issues:
+                Iterable[Issue], the issues to index
+
+        Returns:
+            int, the number of articles added
+        """
+        return sum(self.add_issue(i) for i in issues if i._loaded)
+
+    def search(self, text: str=None, author: str=None, journal: typing.Union[str, api.Journal]=None,
+               volumes: typing.Tuple[int, int]=None) -> typing.List[Document]:
+        """Find articles matching all of the given criteria
+
+        Args:
+            text:
+                str, default None, words that must all appear in the title or teaser
+            author:
+                str, default None, words that must all appear in the author names, e.g. a surname
+            journal:
+                str or Journal, default None, the journal or its url path, e.g. "prd"
+            volumes:
+                Tuple[int, int], default None, the first and last volume (inclusive)
+
+        Returns:
+            List[Document], in the order they were indexed
+        """
+        postings = [self._words.get(w, set()) for w in tokenize(text)] + [self._authors.get(w, set()) for w in tokenize(author)]
+        if postings:
+            ids = set.intersection(*sorted(postings, key=len))
+        else:
+            ids = range(len(self._documents))
+        if isinstance(journal, api.Journal):
+            journal = journal.url_path
+        docs = (self._documents[n] for n in sorted(ids))
+        return [d for d in docs if (journal is None or d.journal == journal) and (volumes is None or volumes[0] <= d.volume <= volumes[1])]
+
+    def load(self):
+        """Load the index from its file, rebuilding the inverted indexes"""
+        with open(self.path, 'r') as fid:
+            data = json.load(fid)
+        self._documents, self._issues = [], set(tuple(i) for i in data['issues'])
+        self._words.clear()
+        self._authors.clear()
+        for doc in data['documents']:
+            self._add(Document(*doc))
+
+    def save(self):
+        """Store the index to its file, atomically so an interrupted save never corrupts it"""
+        if self.path is None:
+            raise ValueError('Unable to save a search index without a path')
+        data = {'issues': sorted(self._issues), 'documents': self._documents}
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix='.tmp')
+        with os.fdopen(fd, 'w') as fid:
+            json.dump(data, fid)
+        os.replace(tmp, self.path)
@@ -0,0 +1,145 @@
+"""Incremental crawling of journals
+
+Rebuilding the volume and issue index of a journal from scratch is wasteful when polling for
+new issues. The functions below keep a crawl state holding the last seen volume and issue of
+every journal (the watermark), and on each run fetch only the index page of the current volume,
+returning the issues published after the watermark. Polling all journals therefore costs one
+request per journal, plus one when a journal has started a new volume since the last run.
+
+Example:
+    >>> from apsjournals import sync
+    >>> new = sync.sync('path/to/state.json')
+    >>> new[apsjournals.PRL]
+    [Issue('PRL', 121, 7), Issue('PRL', 121, 8)]
+"""
+
+
+import collections
+import json
+import os
+import tempfile
+import typing
+from apsjournals import api
+from apsjournals.journals import JOURNALS
+
+
+Watermark = collections.namedtuple('Watermark', 'volume issue')
+
+
+class CrawlState:
+    def __init__(self, path: str=None):
+        """The last seen (volume, issue) of every journal, keyed by the journal url path
+
+        Args:
+            path:
+                str, default None, the json file the state is stored in. If given and the
+                file exists, the state is loaded from it
+        """
+        self.path = path
+        self._marks = {}
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def __repr__(self):
+        return 'CrawlState({!r})'.format(self.path)
+
+    def __contains__(self, journal: api.Journal):
+        return journal.url_path in self._marks
+
+    def get(self, journal: api.Journal) -> typing.Optional[Watermark]:
+        """Get the watermark of a journal
+
+        Returns:
+            Watermark, or None if the journal was never crawled
+        """
+        return self._marks.get(journal.url_path)
+
+    def mark(self, issue: api.Issue):
+        """Advance the watermark of the issue's journal to the issue, unless it is older
+        than the current watermark
+
+        Args:
+            issue:
+                Issue, the issue seen
+        """
+        key, mark = issue.vol.journal.url_path, Watermark(issue.vol.num, issue.num)
+        if key not in self._marks or mark > self._marks[key]:
+            self._marks[key] = mark
+
+    def load(self):
+        """Load the state from its file"""
+        with open(self.path, 'r') as fid:
+            data = json.load(fid)
+        self._marks = {k: Watermark(*v) for k, v in data.items()}
+
+    def save(self):
+        """Store the state to its file, atomically so an interrupted save never corrupts it"""
+        if self.path is None:
+            raise ValueError('Unable to save a crawl state without a path')
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix='.tmp')
+        with os.fdopen(fd, 'w') as fid:
+            json.dump({k: list(v) for k, v in sorted(self._marks.items())}, fid, indent=2)
+        os.replace(tmp, self.path)
+
+
+def new_issues(journal: api.Journal, state: CrawlState) -> typing.List[api.Issue]:
+    """Find the issues of a journal published after its watermark, without updating the state
+
+    Only the index page of the current volume (the newest volume with issues) is fetched, along
+    with the index page of every earlier volume at or after the watermark (normally none), so
+    that issues published in the last volume before a new one started are not missed. If the
+    journal was never crawled, every issue of the current volume is new.
+
+    Args:
+        journal:
+            Journal, the journal to crawl
+        state:
+            CrawlState, the crawl state
+
+    Returns:
+        List[Issue], the new issues, oldest first
+    """
+    index = journal._load_index()
+    if index.issues:
+        # the index expands the newest volume with issues, volumes listed above it are not yet populated
+        current = max(index.issues)
+    else:
+        current = journal.volumes[0]
+        journal._load_index(volume=current)
+    mark = state.get(journal)
+    if mark is None:
+        volumes = [current]
+    else:
+        volumes = sorted(v for v in journal.volumes if mark.volume <= v <= current)
+        for v in volumes[:-1]:
+            journal._load_index(volume=v)  # refresh, a cached issue list may predate the watermark
+    issues = []
+    for v in volumes:
+        volume = journal.volume(v)
+        issues.extend(volume.issue(n) for n in volume.issues if mark is None or (v, n) > mark)
+    return issues
+
+
+def sync(state: typing.Union[str, CrawlState], journals: typing.Iterable[api.Journal]=None) -> typing.Dict[api.Journal, typing.List[api.Issue]]:
+    """Find the new issues of several journals and advance their watermarks. The state is
+    saved after each journal, so that an interrupted sync keeps the progress made.
+
+    Args:
+        state:
+            str or CrawlState, the crawl state or the path of its json file
+        journals:
+            Iterable[Journal], default None, the journals to crawl. If None, all APS journals
+
+    Returns:
+        OrderedDict mapping each journal to its new issues, oldest first
+    """
+    if not isinstance(state, CrawlState):
+        state = CrawlState(state)
+    found = collections.OrderedDict()
+    for journal in (JOURNALS if journals is None else journals):
+        found[journal] = new_issues(journal, state)
+        for issue in found[journal]:
+            state.mark(issue)
+        if state.path is not None:
+            state.save()
+    return found
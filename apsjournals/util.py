@@ -3,6 +3,8 @@
 
 
 import datetime
+import re
+import typing
 
 
 def month_name_to_num(m: str):
@@ -38,3 +40,33 @@ def parse_start_end(tr: str):
         end = datetime.date(year, datetime.date.today().month, 1)
         start = datetime.date(year, month_name_to_num(start), 1)
     return start, end
+
+
+def parse_issue_date(label: str) -> typing.Optional[datetime.date]:
+    """Parse the publication date from the label of an issue
+
+    Args:
+        label:
+            str, the issue label as scraped, e.g. " 6 July 2018 (010401 — 019901)"
+
+    Returns:
+        datetime.date or None, if the label has no date
+    """
+    match = re.search(r'(\d{1,2}) ([A-Za-z]+) (\d{4})', label or '')
+    if match is None:
+        return None
+    day, month, year = match.groups()
+    return datetime.date(int(year), month_name_to_num(month), int(day))
+
+
+def split_author_names(author: str) -> typing.List[str]:
+    """Split the author line of an article into individual names
+
+    Args:
+        author:
+            str, the author line as scraped, e.g. "A. Smith, B. Jones, and C. Brown"
+
+    Returns:
+        List[str], the names, stripped of non-ascii characters
+    """
+    return [n.strip() for n in author.replace('and', '').encode('ascii', 'ignore').decode('ascii').split(',')]
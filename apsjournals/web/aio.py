@@ -0,0 +1,114 @@
+"""Asyncio transport for requests to the APS website
+
+The api objects load their data lazily through blocking calls (page requests, parsing and pdf
+downloads). The async counterparts of those calls (Journal.avolumes, Issue.acontents, Article.apdf,
+etc.) run the same blocking work on a shared transport instead: a bounded thread pool driven from
+the event loop, so that awaiting them never stalls the loop. The work still goes through the shared
+pooled session and the response cache, and the size of the pool is the global cap on the number
+of requests in flight across all coroutines.
+
+Example:
+    >>> aio.set_default_transport(aio.AsyncTransport(limit=16))
+    >>> contents = loop.run_until_complete(api.gather_contents(issues))
+"""
+
+
+import concurrent.futures
+import functools
+import threading
+import typing
+from apsjournals.web import session
+
+
+# The default number of concurrent blocking calls, matching the connection pool of the shared session
+DEFAULT_LIMIT = session.DEFAULT_CONFIG['pool_maxsize']
+
+# The default transport used by all async api calls. Do NOT change this value manually,
+# use set_default_transport and get_default_transport instead
+_DEFAULT_TRANSPORT = None
+_LOCK = threading.Lock()
+
+
+class AsyncTransport:
+    def __init__(self, limit: int=DEFAULT_LIMIT):
+        """A bounded pool running blocking calls on behalf of coroutines. The transport is
+        not bound to an event loop, so it may be shared by several loops and threads.
+
+        Args:
+            limit:
+                int, default DEFAULT_LIMIT, the maximum number of calls running at once,
+                further calls wait for a free slot
+        """
+        if limit < 1:
+            raise ValueError('Transport limit must be at least 1, got {}'.format(limit))
+        self.limit = limit
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'AsyncTransport(limit={:d})'.format(self.limit)
+
+    @property
+    def executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.limit)
+        return self._executor
+
+    async def run(self, func: typing.Callable, *args, **kwargs):
+        """Run a blocking call on the transport and await its result
+
+        Args:
+            func:
+                callable, the blocking call
+            *args, **kwargs:
+                the arguments of the call
+
+        Returns:
+            the result of the call
+        """
+        import asyncio  # already imported by whoever runs the event loop
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def close(self):
+        """Shut down the pool, waiting for running calls to finish. The transport may be used
+        again afterwards, in which case a new pool is started"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+def set_default_transport(transport: AsyncTransport):
+    """Set the transport used by the async api calls, closing the previous one
+
+    Args:
+        transport:
+            AsyncTransport, the transport to use
+    """
+    global _DEFAULT_TRANSPORT
+    with _LOCK:
+        old, _DEFAULT_TRANSPORT = _DEFAULT_TRANSPORT, transport
+    if old is not None and old is not transport:
+        old.close()
+
+
+def get_default_transport() -> AsyncTransport:
+    """Get the default transport, creating it on first use
+
+    Returns:
+        AsyncTransport
+    """
+    global _DEFAULT_TRANSPORT
+    if _DEFAULT_TRANSPORT is None:
+        with _LOCK:
+            if _DEFAULT_TRANSPORT is None:
+                _DEFAULT_TRANSPORT = AsyncTransport()
+    return _DEFAULT_TRANSPORT
+
+
+async def run(func: typing.Callable, *args, **kwargs):
+    """Run a blocking call on the default transport and await its result"""
+    return await get_default_transport().run(func, *args, **kwargs)
@@ -1,10 +1,20 @@
 """Authentication utilities
+
+The session cookies of a login are attached to the shared session (apsjournals.web.session),
+and optionally persisted in a SessionStore (apsjournals.web.sessionstore) so that other
+processes reuse them. When a download finds the session expired, renew logs in again, once,
+with the credentials given to authenticate.
 """
 
 
+import contextlib
+import getpass
+import threading
+from urllib.parse import urlparse
+from apsjournals import metrics
+from apsjournals.web import session
+from apsjournals.web import sessionstore
 from apsjournals.web.constants import EndPoint
-import requests
-import scrapy
 
 
 # Note that the authenticity token xpath constant below is dependent on the aps website
@@ -20,6 +30,11 @@ _RACK_SESSION_COOKIE_NAME = 'rack.session'
 _AUTH_TOKEN = None
 _RACK_SESSION = None
 
+# The credentials given to authenticate, kept in memory only so that an expired session can
+# be renewed, and the lock serializing logins. Do NOT change them manually
+_CREDENTIALS = None
+_LOCK = threading.RLock()
+
 # The headers below are created on 2019-01-20 and are tested against
 # current versions of chrome and the aps website
 _LOGIN_HEADERS = {
@@ -43,53 +58,173 @@ class AuthenticationError(ValueError):
     pass
 
 
+def is_authenticated() -> bool:
+    """Whether the session has been authenticated"""
+    return _AUTH_TOKEN is not None and _RACK_SESSION is not None
+
+
+def require_authentication():
+    """Raise an AuthenticationError if the session has not been authenticated"""
+    if not is_authenticated():
+        raise AuthenticationError('Must authenticate before requesting data. See apsjournals.authenticate.')
+
+
+def token():
+    """The auth token of the current session, or None if not authenticated"""
+    return _AUTH_TOKEN
+
+
 def cookies():
     """Helper function for computing the auth cookies"""
-    if _AUTH_TOKEN is None or _RACK_SESSION is None:
-        raise AuthenticationError('Must authenticate before requesting data. See apsjournals.authenticate.')
+    require_authentication()
     return {
         _AUTH_TOKEN_COOKIE_NAME: _AUTH_TOKEN,
         _RACK_SESSION_COOKIE_NAME: _RACK_SESSION,
     }
 
 
-def authenticate(username: str=None, password: str=None):
-    """Authentication for APS website
+def is_expired(response) -> bool:
+    """Whether the response to an authenticated request shows that the session is not (or no
+    longer) authorized: an unauthorized status, or a redirect to the login page
 
     Args:
-        username: 
-            str, the APS username
-        password: 
-            str, the APS password
+        response:
+            requests.Response, the response, redirects followed or not
 
     Returns:
-        None, but sets the value of module level constants 
-        _AUTH_TOKEN, _RACK_SESSION
+        bool
     """
-    if username is None:
-        username = input('Username: ')
-    if password is None:
-        password = input('Password: ')
+    if response.status_code in (401, 403):
+        return True
+    urls = [response.url] + [r.headers.get('Location', '') for r in response.history] + [response.headers.get('Location', '')]
+    return any(urlparse(url or '').path.rstrip('/') == '/login' for url in urls)
+
+
+def _store(store):
+    return sessionstore.get_default_session_store() if store is None else store
 
-    # declare the globals to set the state of the session
+
+def _locked(store):
+    return store.lock() if store is not None else contextlib.ExitStack()
+
+
+def _set_cookies(cookies_: dict):
+    """Set the session cookies, replacing those of any previous session"""
     global _AUTH_TOKEN, _RACK_SESSION
+    _AUTH_TOKEN = cookies_[_AUTH_TOKEN_COOKIE_NAME]
+    _RACK_SESSION = cookies_[_RACK_SESSION_COOKIE_NAME]
+    jar = session.get_session().cookies
+    for c in [c for c in jar if c.name in cookies_]:
+        jar.clear(c.domain, c.path, c.name)
+    jar.update(cookies())
 
+
+def _login(username: str, password: str, store):
+    """Log in, attaching the session cookies to the shared session and saving them in the store"""
     # Get initial login page so we can extract the authenticity token and the rack session
-    pre_login_response = requests.get(EndPoint.Login.format())
+    sess = session.get_session()
+    pre_login_response = sess.get(EndPoint.Login.format())
+    import scrapy
     sel = scrapy.Selector(text=pre_login_response.content)
     authenticity_token = sel.xpath(_AUTHENTICITY_TOKEN_XPATH)
-    _RACK_SESSION = pre_login_response.cookies[_RACK_SESSION_COOKIE_NAME]
+    rack_session = pre_login_response.cookies[_RACK_SESSION_COOKIE_NAME]
 
     # submit login form with credentials
-    response = requests.post(EndPoint.Login.format(), allow_redirects=False, headers=_LOGIN_HEADERS,
-                             cookies={_RACK_SESSION_COOKIE_NAME: _RACK_SESSION},
-                             data={
-                                 '_method': 'put',
-                                 'authenticity_token': authenticity_token,
-                                 'username': username,
-                                 'password': password,
-                             })
+    response = sess.post(EndPoint.Login.format(), allow_redirects=False, headers=_LOGIN_HEADERS,
+                         cookies={_RACK_SESSION_COOKIE_NAME: rack_session},
+                         data={
+                             '_method': 'put',
+                             'authenticity_token': authenticity_token,
+                             'username': username,
+                             'password': password,
+                         })
 
     if not response.status_code == 302:
         raise AuthenticationError('Authentication form failed with error: {}'.format(response.reason))
-    _AUTH_TOKEN = response.cookies[_AUTH_TOKEN_COOKIE_NAME]
+    metrics.count('auth.login')
+    _set_cookies({_AUTH_TOKEN_COOKIE_NAME: response.cookies[_AUTH_TOKEN_COOKIE_NAME], _RACK_SESSION_COOKIE_NAME: rack_session})
+    if store is not None:
+        store.save(username, cookies())
+
+
+def authenticate(username: str=None, password: str=None, store: sessionstore.SessionStore=None):
+    """Authentication for APS website
+
+    Args:
+        username: 
+            str, the APS username. If None, prompted for
+        password: 
+            str, the APS password. If None, prompted for when a login is needed
+        store:
+            SessionStore, default None, the store persisting the session. If None, the default
+            session store, if set. A session stored for the same username is reused without
+            logging in
+
+    Returns:
+        None, but sets the value of module level constants 
+        _AUTH_TOKEN, _RACK_SESSION and attaches them to the shared session
+    """
+    global _CREDENTIALS
+    if username is None:
+        username = input('Username: ')
+    store = _store(store)
+    with _LOCK, _locked(store):
+        record = store.load() if store is not None else None
+        if record is not None and record.username == username:
+            _set_cookies(record.cookies)
+        else:
+            if password is None:
+                password = getpass.getpass('Password: ')
+            _login(username, password, store)
+        _CREDENTIALS = (username, password)
+
+
+def restore(store: sessionstore.SessionStore=None) -> bool:
+    """Reuse the session stored by another process, without credentials. If it expires, it
+    can only be renewed by a process that was given credentials.
+
+    Args:
+        store:
+            SessionStore, default None, the store. If None, the default session store
+
+    Returns:
+        bool, whether a stored session was found
+    """
+    store = _store(store)
+    record = store.load() if store is not None else None
+    if record is None:
+        return False
+    with _LOCK:
+        _set_cookies(record.cookies)
+    return True
+
+
+def renew(stale_token: str=None):
+    """Renew an expired session by logging in again. Threads and processes finding the same
+    session expired at once log in only once: if the session has moved on from the stale token
+    (renewed by another thread, or by another process sharing the session store), the renewed
+    session is used instead.
+
+    Args:
+        stale_token:
+            str, default None, the auth token found to be expired. If None, always log in
+
+    Raises:
+        AuthenticationError: if there are no credentials to log in with
+    """
+    global _CREDENTIALS
+    store = _store(None)
+    with _LOCK, _locked(store):
+        if stale_token is not None and _AUTH_TOKEN not in (None, stale_token):
+            return
+        record = store.load() if store is not None else None
+        if record is not None and record.cookies.get(_AUTH_TOKEN_COOKIE_NAME) not in (None, stale_token):
+            _set_cookies(record.cookies)
+            return
+        if _CREDENTIALS is None:
+            raise AuthenticationError('The session has expired. See apsjournals.authenticate.')
+        username, password = _CREDENTIALS
+        if password is None:
+            password = getpass.getpass('Password: ')
+        _login(username, password, store)
+        _CREDENTIALS = (username, password)
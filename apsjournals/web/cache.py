@@ -0,0 +1,221 @@
+"""Persistent storage for APS responses
+
+The scrapers re-request the same pages in every fresh process, even though most
+of them (back issues in particular) never change. The caches defined here store
+response bodies along with their validators (ETag / Last-Modified) keyed by the
+formatted endpoint URL, so that a page can either be served directly from disk or
+revalidated with a conditional GET. Each entry records whether it was stored (or last
+revalidated) while its page was known never to change, as only such entries are served
+without revalidation.
+
+Classes defined with brief descriptions:
+    Cache - the base class defining the storage interface
+    DirectoryCache - a cache storing one file per URL in a directory
+    SQLiteCache - a cache storing all responses in a single SQLite database
+"""
+
+
+import collections
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+
+CacheEntry = collections.namedtuple('CacheEntry', 'url body etag last_modified stored immutable')
+
+# The default cache used by all scrapers that are not given an explicit cache. Do NOT
+# change this value manually, use set_default_cache instead
+_DEFAULT_CACHE = None
+
+
+def set_default_cache(cache):
+    """Set the cache used by scrapers that were not given an explicit cache
+
+    Args:
+        cache:
+            Cache or None, the cache to use. If None, caching is disabled
+    """
+    global _DEFAULT_CACHE
+    _DEFAULT_CACHE = cache
+
+
+def get_default_cache():
+    """Get the default cache, if one has been set
+
+    Returns:
+        Cache or None
+    """
+    return _DEFAULT_CACHE
+
+
+class Cache:
+    """Base class for response caches"""
+
+    def get(self, url: str) -> CacheEntry:
+        """Get the entry stored for a url
+
+        Args:
+            url:
+                str, the formatted endpoint url
+
+        Returns:
+            CacheEntry or None, if no entry is stored
+        """
+        raise NotImplementedError
+
+    def set(self, url: str, body: bytes, etag: str=None, last_modified: str=None, immutable: bool=False) -> CacheEntry:
+        """Store the body and validators for a url, replacing any existing entry
+
+        Args:
+            url:
+                str, the formatted endpoint url
+            body:
+                bytes, the response body
+            etag:
+                str, default None, the ETag header of the response
+            last_modified:
+                str, default None, the Last-Modified header of the response
+            immutable:
+                bool, default False, whether the page was known never to change when the
+                response was received
+
+        Returns:
+            CacheEntry, the stored entry
+        """
+        raise NotImplementedError
+
+    def delete(self, url: str):
+        """Remove the entry for a url, if any"""
+        raise NotImplementedError
+
+    def clear(self):
+        """Remove all entries"""
+        raise NotImplementedError
+
+    def __contains__(self, url):
+        return self.get(url) is not None
+
+
+class DirectoryCache(Cache):
+    def __init__(self, path: str):
+        """A cache storing each response as a pair of files in a directory. The file names
+        are the hash of the url, so the directory may be shared between processes.
+
+        Args:
+            path:
+                str, the directory in which to store the responses, created if missing
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def __repr__(self):
+        return 'DirectoryCache({!r})'.format(self.path)
+
+    def _key(self, url: str):
+        return os.path.join(self.path, hashlib.sha1(url.encode('utf-8')).hexdigest())
+
+    def _write(self, path: str, data: bytes):
+        """Write atomically, so concurrent readers never see a partial file"""
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as fid:
+            fid.write(data)
+        os.replace(tmp, path)
+
+    def get(self, url: str):
+        key = self._key(url)
+        try:
+            with open(key + '.json', 'r') as fid:
+                meta = json.load(fid)
+            with open(key + '.body', 'rb') as fid:
+                body = fid.read()
+        except (OSError, ValueError):
+            return None
+        if meta.get('url') != url:  # hash collision or foreign file
+            return None
+        return CacheEntry(url=url, body=body, etag=meta.get('etag'), last_modified=meta.get('last_modified'), stored=meta.get('stored'),
+                          immutable=meta.get('immutable', False))
+
+    def set(self, url: str, body: bytes, etag: str=None, last_modified: str=None, immutable: bool=False):
+        entry = CacheEntry(url=url, body=body, etag=etag, last_modified=last_modified, stored=time.time(), immutable=immutable)
+        key = self._key(url)
+        self._write(key + '.body', body)
+        self._write(key + '.json', json.dumps({'url': url, 'etag': etag, 'last_modified': last_modified, 'stored': entry.stored,
+                                               'immutable': immutable}).encode('utf-8'))
+        return entry
+
+    def delete(self, url: str):
+        key = self._key(url)
+        for ext in ('.json', '.body'):
+            if os.path.exists(key + ext):
+                os.remove(key + ext)
+
+    def clear(self):
+        for name in os.listdir(self.path):
+            if name.endswith(('.json', '.body')):
+                os.remove(os.path.join(self.path, name))
+
+
+class SQLiteCache(Cache):
+    def __init__(self, path: str):
+        """A cache storing all responses in a single SQLite database. A new connection
+        is opened per operation so the cache may be shared between threads.
+
+        Args:
+            path:
+                str, the path of the database file, created if missing
+        """
+        self.path = path
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('CREATE TABLE IF NOT EXISTS responses '
+                             '(url TEXT PRIMARY KEY, body BLOB, etag TEXT, last_modified TEXT, stored REAL, immutable INTEGER NOT NULL DEFAULT 0)')
+                if 'immutable' not in [row[1] for row in conn.execute('PRAGMA table_info(responses)')]:  # an older database
+                    conn.execute('ALTER TABLE responses ADD COLUMN immutable INTEGER NOT NULL DEFAULT 0')
+        finally:
+            conn.close()
+
+    def __repr__(self):
+        return 'SQLiteCache({!r})'.format(self.path)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, url: str):
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT url, body, etag, last_modified, stored, immutable FROM responses WHERE url = ?', (url,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return CacheEntry(row[0], bytes(row[1]), row[2], row[3], row[4], bool(row[5]))
+
+    def set(self, url: str, body: bytes, etag: str=None, last_modified: str=None, immutable: bool=False):
+        entry = CacheEntry(url=url, body=body, etag=etag, last_modified=last_modified, stored=time.time(), immutable=immutable)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)', (url, sqlite3.Binary(body), etag, last_modified, entry.stored, int(immutable)))
+        finally:
+            conn.close()
+        return entry
+
+    def delete(self, url: str):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('DELETE FROM responses WHERE url = ?', (url,))
+        finally:
+            conn.close()
+
+    def clear(self):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('DELETE FROM responses')
+        finally:
+            conn.close()
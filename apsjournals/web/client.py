@@ -0,0 +1,46 @@
+"""The pooled requests Session used for all requests to the APS website
+
+Kept apart from apsjournals.web.session so that requests (and urllib3) are imported when the
+first session is created, rather than when apsjournals is imported.
+"""
+
+
+import functools
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from apsjournals.web import scheduler
+
+
+class ApsSession(requests.Session):
+    def __init__(self, pool_connections: int, pool_maxsize: int, pool_block: bool, max_retries: int, backoff_factor: float, timeout: float):
+        """A requests Session with a bounded connection pool, retries and a default timeout.
+        Every request is started by the shared scheduler (see apsjournals.web.scheduler), which
+        paces them and retries refused responses, while the connection pool retries failed
+        connections.
+
+        Args:
+            pool_connections:
+                int, the number of per-host connection pools to cache
+            pool_maxsize:
+                int, the maximum number of connections kept per host
+            pool_block:
+                bool, if True block when all connections to a host are in use
+            max_retries:
+                int, the number of retries for failed connections
+            backoff_factor:
+                float, the exponential backoff factor between retries, in seconds
+            timeout:
+                float, the default request timeout in seconds
+        """
+        super().__init__()
+        self.timeout = timeout
+        # refused responses (429/5xx, Retry-After) are left to the scheduler, which sees all requests
+        retries = Retry(total=max_retries, backoff_factor=backoff_factor, status=0, respect_retry_after_header=False, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block, max_retries=retries)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return scheduler.get_scheduler().send(method, url, functools.partial(super().request, method, url, **kwargs))
@@ -0,0 +1,254 @@
+"""Adaptive scheduling of all requests to the APS website
+
+Every request of the shared session (page scrapes, pdf downloads and logins) is started by the
+scheduler, which paces them with a token bucket shared by all threads. Refused responses
+(429 and 5xx) of idempotent requests are retried with exponential backoff and jitter, and a
+Retry-After header pauses every request, not only the refused one, for as long as the server
+asks. The rate adapts to the server: it grows additively while responses are quick, and is
+cut multiplicatively on refusals, failed connections or responses slower than the target
+latency, so that the scheduler settles near the fastest rate the server tolerates.
+
+The per-call limits (e.g. the rate of Issue.pdf) still apply, on top of the scheduler.
+
+Example:
+    >>> scheduler.configure(rate=8, max_rate=32)
+    >>> scheduler.get_scheduler().rate
+    8.0
+"""
+
+
+import datetime
+import random
+import threading
+import time
+import typing
+from apsjournals import metrics
+from apsjournals.web import throttle
+
+
+# Statuses retried by the scheduler, and those asking to slow down in particular
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+THROTTLE_STATUSES = (429, 503)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+DEFAULT_CONFIG = {
+    'rate': 4.0,  # requests started per second, initially
+    'burst': 4,  # requests that may start at once
+    'min_rate': 0.2,
+    'max_rate': 20.0,
+    'increase': 0.1,  # requests per second added after each quick response
+    'decrease': 0.5,  # factor applied to the rate on refusals, errors and slow responses
+    'target_latency': 5.0,  # seconds to the response headers, slower responses cut the rate
+    'max_retries': 3,
+    'backoff_factor': 0.5,  # seconds, doubled with every retry
+    'max_backoff': 60.0,  # seconds, the longest pause, including those asked by Retry-After
+}
+
+# The scheduler and its configuration are process-level globals. Do NOT change them
+# manually, use configure and get_scheduler instead
+_CONFIG = dict(DEFAULT_CONFIG)
+_SCHEDULER = None
+_LOCK = threading.Lock()
+
+
+def parse_retry_after(value: str) -> typing.Optional[float]:
+    """Parse a Retry-After header, either a number of seconds or an http date
+
+    Args:
+        value:
+            str or None, the header value
+
+    Returns:
+        float or None, the number of seconds to wait (at least 0), or None if the header is
+        missing or invalid
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    import email.utils  # only needed for dates, and costly to import
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (date - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+class Scheduler:
+    def __init__(self, rate: float, burst: int, min_rate: float, max_rate: float, increase: float, decrease: float,
+                 target_latency: float, max_retries: int, backoff_factor: float, max_backoff: float):
+        """A thread-safe adaptive rate limiter, retrying refused requests. See DEFAULT_CONFIG
+        for the defaults.
+
+        Args:
+            rate:
+                float, the initial number of requests started per second
+            burst:
+                int, the number of requests that may start at once
+            min_rate, max_rate:
+                float, the bounds of the adapted rate
+            increase:
+                float, the rate added after each response quicker than the target latency
+            decrease:
+                float, the factor (between 0 and 1) applied to the rate on refusals, failed
+                connections and slow responses, at most once per request interval (1 / rate)
+            target_latency:
+                float, the number of seconds to the response headers above which the server is
+                considered overloaded
+            max_retries:
+                int, the number of retries of refused idempotent requests
+            backoff_factor:
+                float, the backoff before the first retry in seconds, doubled for each retry
+                and jittered
+            max_backoff:
+                float, the longest backoff in seconds. Retry-After pauses longer than this are
+                cut to it, and the refused response is returned without retrying
+        """
+        if not 0 < min_rate <= rate <= max_rate:
+            raise ValueError('Scheduler rates must satisfy 0 < min_rate <= rate <= max_rate, got {}, {}, {}'.format(min_rate, rate, max_rate))
+        if not 0 < decrease < 1:
+            raise ValueError('Scheduler decrease must be between 0 and 1, got {}'.format(decrease))
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.target_latency = target_latency
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self._bucket = throttle.TokenBucket(rate=rate, capacity=burst)
+        self._lock = threading.Lock()
+        self._resume = 0.0  # the monotonic time before which no request starts
+        self._decreased = 0.0  # the monotonic time of the last rate cut
+
+    def __repr__(self):
+        return 'Scheduler(rate={:.3g})'.format(self.rate)
+
+    @property
+    def rate(self) -> float:
+        """The current number of requests started per second"""
+        return self._bucket.rate
+
+    def backoff(self, attempt: int) -> float:
+        """The jittered pause before a retry: between half and all of the exponential backoff
+
+        Args:
+            attempt:
+                int, the number of the failed attempt, starting at 0
+
+        Returns:
+            float, seconds
+        """
+        backoff = min(self.max_backoff, self.backoff_factor * 2 ** attempt)
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+    def pause(self, seconds: float):
+        """Start no request for a number of seconds (at most max_backoff), e.g. as asked by a
+        Retry-After header"""
+        with self._lock:
+            self._resume = max(self._resume, time.monotonic() + min(seconds, self.max_backoff))
+
+    def wait(self) -> float:
+        """Block until a request may start
+
+        Returns:
+            float, the number of seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                pause = self._resume - time.monotonic()
+            if pause <= 0:
+                break
+            time.sleep(pause)
+            waited += pause
+        return waited + self._bucket.acquire()
+
+    def _adapt(self, ok: bool):
+        """Increase the rate additively on success, cut it multiplicatively otherwise"""
+        with self._lock:
+            now = time.monotonic()
+            if ok:
+                rate = min(self.max_rate, self._bucket.rate + self.increase)
+            elif now - self._decreased >= 1 / self._bucket.rate:  # one cut for a burst of failures
+                self._decreased = now
+                rate = max(self.min_rate, self._bucket.rate * self.decrease)
+            else:
+                return
+            self._bucket.set_rate(rate)
+
+    def send(self, method: str, url: str, send: typing.Callable[[], typing.Any]):
+        """Start a request once the rate allows, retrying refused idempotent requests
+
+        Args:
+            method:
+                str, the http method
+            url:
+                str, the url, for the metrics
+            send:
+                Callable[[], requests.Response], making the request
+
+        Returns:
+            requests.Response, the first response that is not refused, or the last one
+        """
+        retry = method.upper() in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            with metrics.span('web.schedule'):
+                self.wait()
+            start = time.monotonic()
+            try:
+                response = send()
+            except Exception:
+                self._adapt(ok=False)
+                raise
+            latency = time.monotonic() - start
+            if response.status_code not in RETRY_STATUSES:
+                self._adapt(ok=latency <= self.target_latency)
+                return response
+            self._adapt(ok=False)
+            metrics.count('web.refused', url=url, status=response.status_code)
+            retry_after = parse_retry_after(response.headers.get('Retry-After')) if response.status_code in THROTTLE_STATUSES else None
+            if retry_after is not None:
+                self.pause(retry_after)
+            if not retry or attempt >= self.max_retries or (retry_after is not None and retry_after > self.max_backoff):
+                return response
+            response.close()
+            metrics.count('web.retries', url=url)
+            time.sleep(self.backoff(attempt))
+            attempt += 1
+
+
+def configure(**kwargs):
+    """Configure the shared scheduler, replacing it with a new one
+
+    Args:
+        kwargs:
+            dict, any of the keys of DEFAULT_CONFIG
+    """
+    global _SCHEDULER
+    unknown = set(kwargs) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError('Unknown scheduler options {}, valid options are: {}'.format(sorted(unknown), sorted(DEFAULT_CONFIG)))
+    with _LOCK:
+        config = dict(_CONFIG, **kwargs)
+        _SCHEDULER = Scheduler(**config)  # validates the options before they are kept
+        _CONFIG.update(config)
+
+
+def get_scheduler() -> Scheduler:
+    """Get the shared scheduler, creating it on first use
+
+    Returns:
+        Scheduler
+    """
+    global _SCHEDULER
+    if _SCHEDULER is None:
+        with _LOCK:
+            if _SCHEDULER is None:
+                _SCHEDULER = Scheduler(**_CONFIG)
+    return _SCHEDULER
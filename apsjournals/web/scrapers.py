@@ -1,13 +1,23 @@
 """Website wrappers for APS site
+
+The parsing backends (scrapy, or lxml through apsjournals.web.xpath) are imported on first
+use rather than with this module, so importing apsjournals stays cheap for users that only
+read cached or exported data.
 """
 
 
 import collections
-import requests
-import scrapy
+import enum
+import hashlib
+import os
+import tempfile
 import typing
+from apsjournals import metrics
 from apsjournals import util
 from apsjournals.web import auth
+from apsjournals.web import cache as webcache
+from apsjournals.web import scheduler
+from apsjournals.web import session
 from apsjournals.web.constants import EndPoint, URL
 
 
@@ -17,6 +27,10 @@ IssueInfo = collections.namedtuple('IssueInfo', 'url num label')
 DividerInfo = collections.namedtuple('DividerInfo', 'name')
 ArticleInfo = collections.namedtuple('ArticleInfo', 'name author teaser url pdf_url')
 SectionInfo = collections.namedtuple('SectionInfo', 'name articles')
+JournalIndexInfo = collections.namedtuple('JournalIndexInfo', 'volumes issues')
+DownloadInfo = collections.namedtuple('DownloadInfo', 'url file size sha256')
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
 
 
 DOWNLOAD_HEADERS = {
@@ -31,13 +45,59 @@ DOWNLOAD_HEADERS = {
 }
 
 
+class Backend(str, enum.Enum):
+    """Parsing backends available to the scrapers"""
+    Scrapy = 'scrapy'  # scrapy Selector with CSS queries
+    Lxml = 'lxml'  # lxml with precompiled XPath expressions, see apsjournals.web.xpath
+
+
+# The backend used by scrapers that are not given an explicit backend. Do NOT change
+# this value manually, use set_default_backend instead
+_DEFAULT_BACKEND = Backend.Scrapy
+
+
+def set_default_backend(backend: Backend):
+    """Set the parsing backend used by scrapers that were not given an explicit backend
+
+    Args:
+        backend:
+            Backend or str, the backend to use
+    """
+    global _DEFAULT_BACKEND
+    _DEFAULT_BACKEND = Backend(backend)
+
+
 class ScrapingError(ValueError):
     """Specific error class for scraping problems"""
     pass
 
 
+def get_aps_response(url: str, headers: dict=None, **kwargs):
+    """Wrapper around the shared session GET for APS specific requests, returning the full response
+
+    Args:
+        url:
+            str, the URL string
+        headers:
+            dict, default None, additional request headers
+        kwargs:
+            dict of get request parmeters
+
+    Returns:
+        requests.Response
+    """
+    with metrics.span('web.get', url=url):
+        response = session.get_session().get(url=url, params=kwargs, headers=headers)
+    if response.status_code in scheduler.RETRY_STATUSES:  # still refused once the scheduler gave up retrying
+        raise ScrapingError('GET {} failed with error: {} {}'.format(url, response.status_code, response.reason))
+    if metrics.enabled():
+        metrics.count('web.requests', url=url)
+        metrics.count('web.bytes', len(response.content), url=url)
+    return response
+
+
 def get_aps(url: str, **kwargs):
-    """Wrapper around requests.get for APS specific GET requests
+    """Wrapper around the shared session GET for APS specific requests
 
     Args:
         url:
@@ -48,20 +108,69 @@ def get_aps(url: str, **kwargs):
     Returns:
         str or bytes, the content of the get request
     """
-    response = requests.get(url=url, params=kwargs)
-    # TODO add error handling and authentication
+    return get_aps_response(url, **kwargs).content
+
+
+def get_aps_cached(url: str, cache: webcache.Cache, immutable: bool=False):
+    """GET request backed by a persistent cache. Immutable pages are served from the
+    cache without touching the network, other pages are revalidated with a conditional
+    GET using the stored ETag / Last-Modified validators. A copy of an immutable page
+    stored before it became immutable (e.g. while an issue was current) is revalidated
+    once, and served from the cache from then on.
+
+    Args:
+        url:
+            str, the URL string
+        cache:
+            Cache, the cache in which responses are stored
+        immutable:
+            bool, default False, if True a cached body stored while the page was immutable
+            is returned without revalidation
+
+    Returns:
+        bytes, the content of the get request
+    """
+    entry = cache.get(url)
+    if entry is not None and immutable and entry.immutable:
+        metrics.count('cache.hit', url=url)
+        return entry.body
+    headers = {}
+    if entry is not None:
+        if entry.etag is not None:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified is not None:
+            headers['If-Modified-Since'] = entry.last_modified
+    response = get_aps_response(url, headers=headers)
+    if response.status_code == 304 and entry is not None:
+        if immutable and not entry.immutable:
+            cache.set(url, entry.body, etag=entry.etag, last_modified=entry.last_modified, immutable=True)
+        metrics.count('cache.hit', url=url)
+        metrics.count('cache.revalidated', url=url)
+        return entry.body
+    metrics.count('cache.miss', url=url)
+    if response.status_code == 200:
+        cache.set(url, response.content, etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified'),
+                  immutable=immutable)
     return response.content
 
 
 class Scraper:
-    def __init__(self, endpoint: EndPoint):
+    def __init__(self, endpoint: EndPoint, cache: webcache.Cache=None, backend: Backend=None):
         """Base class for Scrapers
         
         Args:
             endpoint: 
                 Url, the formattable URL string
+            cache:
+                Cache, default None, the response cache to use. If None, the
+                default cache is used (see apsjournals.web.cache.set_default_cache)
+            backend:
+                Backend or str, default None, the parsing backend. If None, the
+                default backend is used (see set_default_backend)
         """
         self.endpoint = endpoint
+        self.cache = cache
+        self.backend = _DEFAULT_BACKEND if backend is None else Backend(backend)
 
     def extract(self, source: str, **kwargs):
         """Base method for extracting info from raw source string
@@ -76,49 +185,136 @@ class Scraper:
         """
         raise NotImplementedError
 
+    def immutable(self, **kwargs) -> bool:
+        """Whether the page for the given parameters never changes once published, in
+        which case a cached copy is served without revalidation (see get_aps_cached)"""
+        return False
+
     def get(self, **kwargs):
         """Get request wrapper"""
-        return get_aps(url=self.endpoint.format(**kwargs))
+        url = self.endpoint.format(**kwargs)
+        cache = self.cache if self.cache is not None else webcache.get_default_cache()
+        if cache is None:
+            return get_aps(url=url)
+        return get_aps_cached(url, cache=cache, immutable=self.immutable(**kwargs))
 
     def load(self, **kwargs):
         """Load the info from raw source"""
         source = self.get(**kwargs)
-        return self.extract(source, **kwargs)
+        with metrics.span('scrape.extract', scraper=type(self).__name__):
+            return self.extract(source, **kwargs)
+
+
+def _extract_volume_list(vols) -> typing.List[VolumeInfo]:
+    """Extract the volume info from the volume blocks of a journal index page"""
+    info = [(v.css('a::attr(href)').extract()[0], v.css('small::text').extract()[0]) for v in vols]
+    info = [(v[0].split('#v')[0], int(v[0].split('#v')[1]), v[1]) for v in info]
+    return [VolumeInfo(*(v[:2] + util.parse_start_end(v[2]))) for v in info]
+
+
+def _extract_issue_list(vol) -> typing.List[IssueInfo]:
+    """Extract the issue info from a single volume block of a journal index page"""
+    issues = vol.css('div[class=volume-issue-list]').css('li')
+    return [IssueInfo(i.css('a::attr(href)').extract_first(), 
+                      int(i.css('a::text').extract_first().split(' ')[-1]),
+                      i.css('li::text').extract_first()) for i in issues]
+
+
+def _volume_num(vol) -> int:
+    """Get the number of a volume block from its header id, e.g. v121"""
+    return int(vol.css('h4::attr(id)').extract_first()[1:])
+
+
+def _extract_volume_list_lxml(vols) -> typing.List[VolumeInfo]:
+    """Extract the volume info from the volume blocks of a journal index page (lxml backend)"""
+    from apsjournals.web import xpath
+    info = [(xpath.VOLUME_HREF(v)[0], xpath.VOLUME_RANGE(v)[0]) for v in vols]
+    info = [(v[0].split('#v')[0], int(v[0].split('#v')[1]), v[1]) for v in info]
+    return [VolumeInfo(*(v[:2] + util.parse_start_end(v[2]))) for v in info]
+
+
+def _extract_issue_list_lxml(vol) -> typing.List[IssueInfo]:
+    """Extract the issue info from a single volume block of a journal index page (lxml backend)"""
+    from apsjournals.web import xpath
+    return [IssueInfo(xpath.first(xpath.ISSUE_HREF, i),
+                      int(xpath.first(xpath.ISSUE_TEXT, i).split(' ')[-1]),
+                      xpath.first(xpath.ISSUE_LABEL, i)) for i in xpath.ISSUES(vol)]
+
+
+def _volume_num_lxml(vol) -> int:
+    """Get the number of a volume block from its header id, e.g. v121 (lxml backend)"""
+    from apsjournals.web import xpath
+    return int(xpath.first(xpath.VOLUME_ID, vol)[1:])
 
 
 class VolumeIndexScraper(Scraper):
     """Specific scraper for building an index of available volumes"""
-    def __init__(self):
-        super().__init__(endpoint=EndPoint.Volume)
+    def __init__(self, cache: webcache.Cache=None, backend: Backend=None):
+        super().__init__(endpoint=EndPoint.Volume, cache=cache, backend=backend)
 
     def extract(self, source, **kwargs) -> typing.List[VolumeInfo]:
+        if self.backend == Backend.Lxml:
+            from apsjournals.web import xpath
+            return _extract_volume_list_lxml(xpath.VOLUMES(xpath.parse(source)))
+        import scrapy
         s = scrapy.Selector(text=source)
-        vols = s.css('div[class=volume-issue-list]')
-        info = [(v.css('a::attr(href)').extract()[0], v.css('small::text').extract()[0]) for v in vols]
-        info = [(v[0].split('#v')[0], int(v[0].split('#v')[1]), v[1]) for v in info]
-        return [VolumeInfo(*(v[:2] + util.parse_start_end(v[2]))) for v in info]
+        return _extract_volume_list(s.css('div[class=volume-issue-list]'))
 
 
 class IssueIndexScraper(Scraper):
     """Specific scraper for building an index of available issues"""
-    def __init__(self):
-        super().__init__(endpoint=EndPoint.Issue)
+    def __init__(self, cache: webcache.Cache=None, backend: Backend=None):
+        super().__init__(endpoint=EndPoint.Issue, cache=cache, backend=backend)
 
     def extract(self, source, **kwargs) -> typing.List[IssueInfo]:
         volume = kwargs['volume']
+        if self.backend == Backend.Lxml:
+            from apsjournals.web import xpath
+            vols = xpath.VOLUMES(xpath.parse(source))
+            _vol = [v for v in vols if _volume_num_lxml(v) == volume][0]
+            return _extract_issue_list_lxml(_vol)
+        import scrapy
         s = scrapy.Selector(text=source)
         vols = s.css('div[class=volume-issue-list]')
-        _vol = [v for v in vols if int(v.css('h4::attr(id)').extract_first()[1:]) == volume][0]
-        issues = _vol.css('div[class=volume-issue-list]').css('li')
-        return [IssueInfo(i.css('a::attr(href)').extract_first(), 
-                          int(i.css('a::text').extract_first().split(' ')[-1]),
-                          i.css('li::text').extract_first()) for i in issues]
+        _vol = [v for v in vols if _volume_num(v) == volume][0]
+        return _extract_issue_list(_vol)
+
+
+class JournalIndexScraper(Scraper):
+    """Specific scraper for building the index of available volumes together with the
+    issues of every volume listed on the same page. The APS index page lists all volumes,
+    but only expands the issues of the requested volume (or the current volume if none
+    is requested), so a single fetch yields both the volume index and one issue index."""
+    def __init__(self, cache: webcache.Cache=None, backend: Backend=None):
+        super().__init__(endpoint=EndPoint.Volume, cache=cache, backend=backend)
+
+    def extract(self, source, **kwargs) -> JournalIndexInfo:
+        if self.backend == Backend.Lxml:
+            from apsjournals.web import xpath
+            vols = xpath.VOLUMES(xpath.parse(source))
+            extract_volumes, extract_issues, volume_num = _extract_volume_list_lxml, _extract_issue_list_lxml, _volume_num_lxml
+        else:
+            import scrapy
+            vols = scrapy.Selector(text=source).css('div[class=volume-issue-list]')
+            extract_volumes, extract_issues, volume_num = _extract_volume_list, _extract_issue_list, _volume_num
+        issues = collections.OrderedDict()
+        for v in vols:
+            info = extract_issues(v)
+            if info:
+                issues[volume_num(v)] = info
+        return JournalIndexInfo(volumes=extract_volumes(vols), issues=issues)
 
 
 class IssueScraper(Scraper):
     """Specific scraper for extracting articles from an issue"""
-    def __init__(self):
-        super().__init__(endpoint=EndPoint.Issue)
+    def __init__(self, cache: webcache.Cache=None, backend: Backend=None):
+        super().__init__(endpoint=EndPoint.Issue, cache=cache, backend=backend)
+
+    def immutable(self, closed: bool=False, **kwargs):
+        # the article listing of a closed back issue does not change, but APS keeps adding
+        # articles to the current issue, so only issues the caller knows to be closed skip
+        # revalidation (see apsjournals.api.Issue.closed)
+        return closed
 
     def _extract_issue_item(self, x):
         tag = x.root.tag
@@ -141,29 +337,128 @@ class IssueScraper(Scraper):
             return SectionInfo(name=name, articles=articles)
         else:
             raise ValueError('unknown tag {}'.format(tag))
+
+    def _extract_issue_item_lxml(self, x):
+        from apsjournals.web import xpath
+        tag = x.tag
+        if tag == 'h2':  # Section title
+            return DividerInfo(name=xpath.first(xpath.DIVIDER_NAME, x))
+        elif tag == 'div':  # Article
+            name, url = xpath.first(xpath.TITLE_TEXT, x), xpath.first(xpath.TITLE_HREF, x)
+            author = xpath.first(xpath.AUTHORS, x)
+            teaser = xpath.first(xpath.TEASER, x)
+            pdf_url = xpath.first(xpath.PDF_HREF, x)
+            if not url.startswith(URL.Root):
+                url = URL.Root + url
+            if not pdf_url.startswith(URL.Root):
+                pdf_url = URL.Root + pdf_url
+            return ArticleInfo(name=name, author=author, teaser=teaser, url=url, pdf_url=pdf_url)
+        elif tag == 'section':
+            name = xpath.first(xpath.SECTION_NAME, x)
+            articles = [self._extract_issue_item_lxml(a) for a in xpath.SECTION_ARTICLES(x)]
+            return SectionInfo(name=name, articles=articles)
+        else:
+            raise ValueError('unknown tag {}'.format(tag))
     
-    def extract(self, source: str, **kwargs) -> typing.List[typing.Union[DividerInfo, ArticleInfo, SectionInfo]]:
+    def iter_extract(self, source: str, **kwargs) -> typing.Iterator[typing.Union[DividerInfo, ArticleInfo, SectionInfo]]:
+        """Extract the issue items lazily, in page order
+
+        Args:
+            source:
+                str, the html string to be parsed
+
+        Returns:
+            Generator of DividerInfo, ArticleInfo and SectionInfo
+        """
+        if self.backend == Backend.Lxml:
+            from apsjournals.web import xpath
+            results = xpath.RESULTS(xpath.parse(source))
+            if len(results) == 0:
+                return
+            for i in xpath.ITEMS(results[0]):
+                yield self._extract_issue_item_lxml(i)
+            return
+        import scrapy
         sel = scrapy.Selector(text=source)
         results = sel.css('div[class="search-results"]')
         if len(results) == 0:
-            return []
+            return
         results = results[0]
         items = results.xpath('(h2|div|section)')
-        parsed = [self._extract_issue_item(i) for i in items]
-        return parsed
+        for i in items:
+            yield self._extract_issue_item(i)
+
+    def extract(self, source: str, **kwargs) -> typing.List[typing.Union[DividerInfo, ArticleInfo, SectionInfo]]:
+        return list(self.iter_extract(source, **kwargs))
+
+
+def _write_chunks(response, fid, chunk_size: int):
+    """Write the body of a streamed response to a file, returning its size and sha256 digest"""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        fid.write(chunk)
+        digest.update(chunk)
+        size += len(chunk)
+    return size, digest.hexdigest()
 
 
-def download_pdf(pdf_url: str, out_file: str):
-    """Download the PDF file and store in a specific location
+def _get_pdf(pdf_url: str):
+    """Request a PDF, renewing the session and retrying once if it has expired"""
+    for attempt in range(2):
+        stale_token = auth.token()
+        response = session.get_session().get(pdf_url, headers=DOWNLOAD_HEADERS, stream=True)
+        # an html page served in place of the pdf is the login wall, error pages (404, 5xx) are
+        # left to the status check of download_pdf
+        html = response.status_code == 200 and response.headers.get('Content-Type', '').startswith('text/html')
+        if not (auth.is_expired(response) or html):
+            return response
+        response.close()
+        if attempt == 0:
+            metrics.count('auth.expired', url=pdf_url)
+            auth.renew(stale_token)
+    raise auth.AuthenticationError('PDF download is not authorized, even after logging in again: {}'.format(pdf_url))
+
+
+def download_pdf(pdf_url: str, out_file: typing.Union[str, typing.BinaryIO], chunk_size: int=DOWNLOAD_CHUNK_SIZE) -> DownloadInfo:
+    """Download the PDF file and store in a specific location. The response is streamed
+    in chunks, so the PDF is never held in memory as a whole. When writing to a path, the
+    chunks go to a temporary file in the same directory that is renamed into place once
+    complete, so a failed download never leaves a partial file behind. If the session has
+    expired (the PDF request is refused or redirected to the login page), it is renewed once,
+    see apsjournals.web.auth.renew.
 
     Args:
         pdf_url: 
             str, the url of the PDF
         out_file: 
-            str, the filepath of the output PDF file
+            str or file-like, the filepath of the output PDF file, or a binary file
+            object (e.g. io.BytesIO) to write the PDF into
+        chunk_size:
+            int, default DOWNLOAD_CHUNK_SIZE, the number of bytes read at a time
+
+    Returns:
+        DownloadInfo, the size and sha256 digest of the downloaded PDF
     """
-    response = requests.get(pdf_url, headers=DOWNLOAD_HEADERS, cookies=auth.cookies())
-    if not response.status_code == 200:
-        raise ScrapingError('PDF download failed with error: {}'.format(response.reason))
-    with open(out_file, 'wb') as fid:
-        fid.write(response.content)
+    auth.require_authentication()
+    with metrics.span('web.download', url=pdf_url):
+        response = _get_pdf(pdf_url)
+        try:
+            if not response.status_code == 200:
+                raise ScrapingError('PDF download failed with error: {}'.format(response.reason))
+            if not isinstance(out_file, (str, os.PathLike)):
+                size, sha256 = _write_chunks(response, out_file, chunk_size)
+            else:
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(out_file)), suffix='.part')
+                try:
+                    with os.fdopen(fd, 'wb') as fid:
+                        size, sha256 = _write_chunks(response, fid, chunk_size)
+                    os.replace(tmp_path, out_file)
+                except BaseException:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+        finally:
+            response.close()
+    metrics.count('web.download_bytes', size, url=pdf_url)
+    return DownloadInfo(url=pdf_url, file=out_file, size=size, sha256=sha256)
@@ -0,0 +1,63 @@
+"""Shared HTTP session for all requests to the APS website
+
+All scrapers, downloads and the authentication flow share a single pooled session, so
+connections to journals.aps.org are kept alive between requests instead of paying a new
+TCP and TLS handshake each time. Authentication cookies are stored on the session once.
+The session class (apsjournals.web.client.ApsSession) is imported when the session is first
+created, so importing this module does not import requests.
+"""
+
+
+import threading
+
+
+DEFAULT_CONFIG = {
+    'pool_connections': 4,  # number of distinct hosts to keep pools for
+    'pool_maxsize': 8,  # number of connections kept alive per host
+    'pool_block': True,  # if True, never open more than pool_maxsize connections per host
+    'max_retries': 3,
+    'backoff_factor': 0.5,
+    'timeout': 30,  # seconds, applied to every request that does not specify one
+}
+
+# The session and its configuration are process-level globals. Do NOT change them
+# manually, use configure and get_session instead
+_CONFIG = dict(DEFAULT_CONFIG)
+_SESSION = None
+_LOCK = threading.Lock()
+
+
+def configure(**kwargs):
+    """Configure the shared session. Any cookies (e.g. authentication) held by
+    the current session are carried over to the new one.
+
+    Args:
+        kwargs:
+            dict, any of the keys of DEFAULT_CONFIG
+    """
+    global _SESSION
+    unknown = set(kwargs) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError('Unknown session options {}, valid options are: {}'.format(sorted(unknown), sorted(DEFAULT_CONFIG)))
+    from apsjournals.web.client import ApsSession
+    with _LOCK:
+        _CONFIG.update(kwargs)
+        old, _SESSION = _SESSION, ApsSession(**_CONFIG)
+        if old is not None:
+            _SESSION.cookies.update(old.cookies)
+            old.close()
+
+
+def get_session():
+    """Get the shared session, creating it on first use
+
+    Returns:
+        ApsSession, see apsjournals.web.client
+    """
+    global _SESSION
+    if _SESSION is None:
+        from apsjournals.web.client import ApsSession
+        with _LOCK:
+            if _SESSION is None:
+                _SESSION = ApsSession(**_CONFIG)
+    return _SESSION
@@ -0,0 +1,136 @@
+"""Persistent storage for authenticated sessions
+
+Without a store, every process (each script run, each command line invocation, each worker)
+logs in to the APS website again before its first download. A SessionStore keeps the session
+cookies of the last login in a file readable by the owner only, so that other processes reuse
+them instead. When the session expires, the first thread or process to notice renews it while
+holding the store lock, and the others pick up the renewed cookies from the store rather than
+logging in again themselves. Passwords are never stored.
+
+Layout:
+    <path> - json, the username, the session cookies and the time they were saved
+    <path>.lock - empty, locked while the session is being renewed
+"""
+
+
+import collections
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+import typing
+
+try:
+    import fcntl
+except ImportError:  # e.g. Windows, where the lock only serializes the threads of a process
+    fcntl = None
+
+
+SessionRecord = collections.namedtuple('SessionRecord', 'username cookies saved')
+
+# The default store used by apsjournals.authenticate. Do NOT change this value manually,
+# use set_default_session_store instead
+_DEFAULT_SESSION_STORE = None
+
+
+def set_default_session_store(store):
+    """Set the store in which authenticated sessions are persisted
+
+    Args:
+        store:
+            SessionStore or None, the store to use. If None, sessions are not persisted
+    """
+    global _DEFAULT_SESSION_STORE
+    _DEFAULT_SESSION_STORE = store
+
+
+def get_default_session_store():
+    """Get the default session store, if one has been set
+
+    Returns:
+        SessionStore or None
+    """
+    return _DEFAULT_SESSION_STORE
+
+
+class SessionStore:
+    def __init__(self, path: str):
+        """A file holding the cookies of an authenticated session, shared between the threads
+        and processes using the same path
+
+        Args:
+            path:
+                str, the session file. Its directory is created if missing, readable by the
+                owner only
+        """
+        self.path = os.path.abspath(path)
+        self._lock = threading.RLock()
+        os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+
+    def __repr__(self):
+        return 'SessionStore({!r})'.format(self.path)
+
+    def load(self) -> typing.Optional[SessionRecord]:
+        """Get the stored session
+
+        Returns:
+            SessionRecord or None, if no session is stored (or the file is unreadable)
+        """
+        try:
+            with open(self.path, 'r') as fid:
+                data = json.load(fid)
+            return SessionRecord(username=data['username'], cookies=dict(data['cookies']), saved=data['saved'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def save(self, username: str, cookies: typing.Dict[str, str]) -> SessionRecord:
+        """Store a session, replacing any stored session. The file is written to a temporary
+        file in the same directory that is renamed into place, so a reader never sees a
+        partial session.
+
+        Args:
+            username:
+                str, the APS username the session belongs to
+            cookies:
+                dict, the session cookies by name
+
+        Returns:
+            SessionRecord, the stored session
+        """
+        record = SessionRecord(username=username, cookies=dict(cookies), saved=time.time())
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+        try:
+            os.chmod(tmp, 0o600)  # mkstemp already does, whatever the umask, but be explicit
+            with os.fdopen(fd, 'w') as fid:
+                json.dump(record._asdict(), fid)
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return record
+
+    def clear(self):
+        """Remove the stored session, if any"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    @contextlib.contextmanager
+    def lock(self):
+        """A context manager holding the store lock, exclusive between the threads of this
+        process and (where file locks are supported) between processes"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            fd = os.open(self.path + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
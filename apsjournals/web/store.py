@@ -0,0 +1,228 @@
+"""Persistent content-addressed storage for article PDFs
+
+Article.pdf and issue compilations download every article PDF again on each call, so rebuilding
+a compilation (e.g. after a layout change) repeats all downloads. A PdfStore keeps downloaded PDFs
+in a directory, named by the sha256 of their content, along with a small reference file per
+article url pointing to the content. Stored PDFs are hard linked (or copied, if linking is not
+possible) to where they are requested instead of being downloaded. The least recently used PDFs
+are evicted once the store exceeds its size cap. A linked PDF shares its content with the store,
+so every PDF is checked against its sha256 when it is looked up, and one modified in place
+(through any of its links) is dropped and downloaded again rather than handed out.
+
+Layout:
+    <path>/objects/<sha256>.pdf - the PDF contents, the mtime being the time of last use
+    <path>/refs/<sha1 of url>.json - the url, sha256 and size of an article PDF
+"""
+
+
+import collections
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import typing
+from apsjournals.web import scrapers
+
+
+StoreEntry = collections.namedtuple('StoreEntry', 'url path size sha256')
+
+# The default store used by Article.pdf, and therefore issue compilations. Do NOT change
+# this value manually, use set_default_store instead
+_DEFAULT_STORE = None
+
+
+def set_default_store(store):
+    """Set the store used by Article.pdf
+
+    Args:
+        store:
+            PdfStore or None, the store to use. If None, PDFs are always downloaded
+    """
+    global _DEFAULT_STORE
+    _DEFAULT_STORE = store
+
+
+def get_default_store():
+    """Get the default store, if one has been set
+
+    Returns:
+        PdfStore or None
+    """
+    return _DEFAULT_STORE
+
+
+def _sha256(path: str, chunk_size: int=64 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fid:
+        for chunk in iter(lambda: fid.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PdfStore:
+    def __init__(self, path: str, max_bytes: int=None, link: bool=True):
+        """A directory of article PDFs addressed by content. The file names are hashes, so the
+        directory may be shared between processes.
+
+        Args:
+            path:
+                str, the directory in which to store the PDFs, created if missing
+            max_bytes:
+                int, default None, the size cap of the store. If None, the store is not capped
+            link:
+                bool, default True, if True stored PDFs are hard linked to their destination
+                (falling back to a copy across file systems), otherwise they are copied. Linked
+                files share their content with the store, so they should not be modified in
+                place: a modified PDF fails its sha256 check and is downloaded again
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.link = link
+        self._objects = os.path.join(path, 'objects')
+        self._refs = os.path.join(path, 'refs')
+        os.makedirs(self._objects, exist_ok=True)
+        os.makedirs(self._refs, exist_ok=True)
+
+    def __repr__(self):
+        return 'PdfStore({!r})'.format(self.path)
+
+    def __contains__(self, url: str):
+        return self.get(url) is not None
+
+    def _ref(self, url: str) -> str:
+        return os.path.join(self._refs, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
+
+    def _object(self, sha256: str) -> str:
+        return os.path.join(self._objects, sha256 + '.pdf')
+
+    def get(self, url: str) -> typing.Optional[StoreEntry]:
+        """Get the stored PDF of an article, marking it as recently used
+
+        Args:
+            url:
+                str, the PDF url of the article
+
+        Returns:
+            StoreEntry or None, if the PDF is not stored (or was evicted, or its content no
+            longer matches its sha256)
+        """
+        try:
+            with open(self._ref(url), 'r') as fid:
+                ref = json.load(fid)
+            path = self._object(ref['sha256'])
+            if os.path.getsize(path) != ref['size']:
+                return None
+            if _sha256(path) != ref['sha256']:
+                os.remove(path)  # modified in place through a link, the next fetch downloads it again
+                return None
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return StoreEntry(url=url, path=path, size=ref['size'], sha256=ref['sha256'])
+
+    def add(self, url: str, info: scrapers.DownloadInfo) -> StoreEntry:
+        """Move a downloaded PDF into the store, then evict PDFs beyond the size cap
+
+        Args:
+            url:
+                str, the PDF url of the article
+            info:
+                DownloadInfo, the result of downloading the PDF to a path. The file is moved,
+                so it must be on the same file system as the store
+
+        Returns:
+            StoreEntry, the stored entry
+        """
+        path = self._object(info.sha256)
+        os.replace(info.file, path)  # identical content may already be stored, either copy will do
+        fd, tmp = tempfile.mkstemp(dir=self._refs, suffix='.tmp')
+        with os.fdopen(fd, 'w') as fid:
+            json.dump({'url': url, 'sha256': info.sha256, 'size': info.size}, fid)
+        os.replace(tmp, self._ref(url))
+        self.evict(keep=path)
+        return StoreEntry(url=url, path=path, size=info.size, sha256=info.sha256)
+
+    def fetch(self, url: str, out_file: typing.Union[str, typing.BinaryIO], entry: StoreEntry=None) -> scrapers.DownloadInfo:
+        """Provide the PDF of an article at a path or in a file object, downloading and
+        storing it only if it is not stored yet
+
+        Args:
+            url:
+                str, the PDF url of the article
+            out_file:
+                str or file-like, the path of the output PDF file, or a binary file object
+            entry:
+                StoreEntry, default None, the entry of the url if the caller has just looked it
+                up with get, so that the stored PDF is not hashed again
+
+        Returns:
+            DownloadInfo, the size and sha256 digest of the PDF
+        """
+        if entry is None:
+            entry = self.get(url)
+        if entry is None:
+            fd, tmp = tempfile.mkstemp(dir=self._objects, suffix='.part')
+            os.close(fd)
+            try:
+                entry = self.add(url, scrapers.download_pdf(url, out_file=tmp))
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        if not isinstance(out_file, (str, os.PathLike)):
+            with open(entry.path, 'rb') as fid:
+                shutil.copyfileobj(fid, out_file)
+        else:
+            self._place(entry.path, out_file)
+        return scrapers.DownloadInfo(url=url, file=out_file, size=entry.size, sha256=entry.sha256)
+
+    def _place(self, src: str, dst: str):
+        """Link or copy a stored PDF to its destination, replacing any existing file"""
+        if os.path.exists(dst):
+            os.remove(dst)
+        if self.link:
+            try:
+                os.link(src, dst)
+                return
+            except OSError:
+                pass  # e.g. a different file system, fall back to a copy
+        shutil.copyfile(src, dst)
+
+    def size(self) -> int:
+        """The total size of the stored PDFs, in bytes"""
+        return sum(e.stat().st_size for e in os.scandir(self._objects) if e.name.endswith('.pdf'))
+
+    def evict(self, keep: str=None) -> int:
+        """Remove the least recently used PDFs until the store fits its size cap. References
+        to removed PDFs are left in place and treated as missing.
+
+        Args:
+            keep:
+                str, default None, the path of a PDF never to remove (e.g. the one just added)
+
+        Returns:
+            int, the number of bytes removed
+        """
+        if self.max_bytes is None:
+            return 0
+        entries = sorted((e for e in os.scandir(self._objects) if e.name.endswith('.pdf')), key=lambda e: e.stat().st_mtime)
+        excess = sum(e.stat().st_size for e in entries) - self.max_bytes
+        removed = 0
+        for e in entries:
+            if removed >= excess:
+                break
+            if e.path == keep:
+                continue
+            try:
+                size = e.stat().st_size
+                os.remove(e.path)
+                removed += size
+            except OSError:
+                pass  # removed concurrently
+        return removed
+
+    def clear(self):
+        """Remove all stored PDFs and references"""
+        for d in (self._objects, self._refs):
+            for e in os.scandir(d):
+                os.remove(e.path)
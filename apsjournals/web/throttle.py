@@ -0,0 +1,85 @@
+"""Rate limiting utilities for requests to the APS website
+"""
+
+
+import threading
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float=1):
+        """A thread-safe token bucket. Tokens are replenished continuously at a fixed rate
+        up to the capacity of the bucket, and each request consumes one token, so that
+        the long-run request rate is bounded by `rate` while short bursts of up to
+        `capacity` requests are allowed.
+
+        Args:
+            rate:
+                float, the number of tokens added per second
+            capacity:
+                float, default 1, the maximum number of tokens held by the bucket
+        """
+        if rate <= 0:
+            raise ValueError('Token bucket rate must be positive, got {}'.format(rate))
+        if capacity < 1:
+            raise ValueError('Token bucket capacity must be at least 1, got {}'.format(capacity))
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'TokenBucket(rate={!r}, capacity={!r})'.format(self.rate, self.capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def set_rate(self, rate: float):
+        """Change the rate at which tokens are added, from now on
+
+        Args:
+            rate:
+                float, the number of tokens added per second
+        """
+        if rate <= 0:
+            raise ValueError('Token bucket rate must be positive, got {}'.format(rate))
+        with self._lock:
+            self._refill()  # tokens accrued so far count at the old rate
+            self.rate = rate
+
+    def try_acquire(self, tokens: float=1) -> bool:
+        """Consume tokens if they are available, without blocking
+
+        Returns:
+            bool, True if the tokens were consumed
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float=1) -> float:
+        """Block until tokens are available, then consume them
+
+        Args:
+            tokens:
+                float, default 1, the number of tokens to consume
+
+        Returns:
+            float, the number of seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
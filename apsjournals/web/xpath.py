@@ -0,0 +1,65 @@
+"""Precompiled XPath expressions for the lxml scraping backend
+
+The scrapy backend compiles CSS selectors to XPath on every call, for every article.
+The expressions below are compiled a single time at import and evaluated directly on a
+document parsed once with lxml. They are the translations of the CSS selectors used by
+the scrapy backend, so both backends produce identical info tuples.
+"""
+
+
+import typing
+from lxml import etree, html
+
+
+def _xpath(expr: str) -> etree.XPath:
+    # smart strings keep a reference to their parent element, and thus to the whole tree
+    return etree.XPath(expr, smart_strings=False)
+
+
+# Journal index page
+VOLUMES = _xpath("descendant-or-self::div[@class='volume-issue-list']")
+VOLUME_HREF = _xpath('descendant-or-self::a/@href')
+VOLUME_RANGE = _xpath('descendant-or-self::small/text()')
+VOLUME_ID = _xpath('descendant-or-self::h4/@id')
+ISSUES = _xpath('descendant-or-self::li')
+ISSUE_HREF = _xpath('descendant-or-self::a/@href')
+ISSUE_TEXT = _xpath('descendant-or-self::a/text()')
+ISSUE_LABEL = _xpath('descendant-or-self::li/text()')
+
+# Issue page
+RESULTS = _xpath("descendant-or-self::div[@class='search-results']")
+ITEMS = _xpath('(h2|div|section)')
+DIVIDER_NAME = _xpath('descendant-or-self::text()')
+TITLE_TEXT = _xpath("descendant-or-self::*[@class='title']/descendant-or-self::a/text()")
+TITLE_HREF = _xpath("descendant-or-self::*[@class='title']/descendant-or-self::a/@href")
+AUTHORS = _xpath("descendant-or-self::h6[@class='authors']/text()")
+TEASER = _xpath("descendant-or-self::*[@class='teaser']/descendant-or-self::p/text()")
+PDF_HREF = _xpath("descendant-or-self::a[@class='tiny button left-button']/@href")
+SECTION_NAME = _xpath('descendant-or-self::h4/text()')
+SECTION_ARTICLES = _xpath("descendant-or-self::div[@class='article panel article-result']")
+
+
+def first(xp: etree.XPath, element):
+    """Evaluate an expression and return the first result, or None if there is none"""
+    result = xp(element)
+    return result[0] if result else None
+
+
+def parse(source: typing.Union[str, bytes]):
+    """Parse an html page, with the same parser options as the scrapy backend
+
+    Args:
+        source:
+            str or bytes, the html source, bytes are decoded as utf-8
+
+    Returns:
+        lxml.etree.Element, the root of the document
+    """
+    if isinstance(source, bytes):
+        source = source.decode('utf-8', errors='replace')
+    body = source.strip().replace('\x00', '').encode('utf8') or b'<html/>'
+    parser = html.HTMLParser(recover=True, encoding='utf8', huge_tree=True)
+    root = etree.fromstring(body, parser=parser)
+    if root is None:
+        root = etree.fromstring(b'<html/>', parser=parser)
+    return root
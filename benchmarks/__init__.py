@@ -0,0 +1,8 @@
+"""Offline benchmarks for apsjournals
+
+The benchmarks run against the static fixtures in tests/static (and synthetic pages built
+from them), so they never touch the network. Run them from the repository root, e.g.
+
+    python -m benchmarks.bench_scrapers --output before.json
+    python -m benchmarks.bench_scrapers --compare before.json
+"""
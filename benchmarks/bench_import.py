@@ -0,0 +1,71 @@
+"""Benchmark the cost of importing apsjournals
+
+Each measurement imports the package in a fresh interpreter, reporting the best wall time of
+several runs and the memory allocated by the import, and lists the heavy dependencies it pulled
+in. None should be: they are imported on first use.
+
+Usage:
+    python -m benchmarks.bench_import [--modules apsjournals apsjournals.pdf] [--compare results.json]
+"""
+
+
+import argparse
+import json
+import subprocess
+import sys
+import typing
+from benchmarks import common
+
+
+# Dependencies that must not be imported by "import apsjournals"
+HEAVY_MODULES = ('scrapy', 'requests', 'urllib3', 'lxml', 'fpdf', 'PyPDF2', 'asyncio')
+
+_PROBE = '''
+import json, sys, time, tracemalloc
+tracemalloc.start()
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+peak = tracemalloc.get_traced_memory()[1]
+print(json.dumps({{'seconds': seconds, 'peak_bytes': peak, 'modules': sorted(sys.modules)}}))
+'''
+
+
+def probe(module: str) -> dict:
+    """Import a module in a fresh interpreter
+
+    Returns:
+        dict, with the import time in seconds, the peak traced memory in bytes and the
+        names of all modules loaded afterwards
+    """
+    out = subprocess.check_output([sys.executable, '-c', _PROBE.format(module=module)], cwd=common.STATIC_DIR.parent.parent.as_posix())
+    return json.loads(out.decode('utf-8').splitlines()[-1])
+
+
+def heavy_modules(modules: typing.Iterable[str]) -> typing.List[str]:
+    """The heavy dependencies among loaded module names"""
+    return sorted({m.split('.')[0] for m in modules} & set(HEAVY_MODULES))
+
+
+def run(modules: typing.List[str], repeat: int=5) -> typing.List[common.Measurement]:
+    measurements = []
+    for module in modules:
+        results = [probe(module) for _ in range(repeat)]
+        best = min(r['seconds'] for r in results)
+        measurements.append(common.Measurement(name='import {}'.format(module), seconds=best, items=1, throughput=1 / best,
+                                               peak_bytes=results[0]['peak_bytes'], retained_bytes=0, blocks=0))
+        print('import {}: heavy dependencies loaded: {}'.format(module, ', '.join(heavy_modules(results[0]['modules'])) or 'none'))
+    return measurements
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--modules', nargs='*', default=['apsjournals'], help='the modules to import')
+    common.add_arguments(parser)
+    args = parser.parse_args(argv)
+    measurements = run(args.modules, repeat=args.repeat)
+    common.finish(args, measurements, suite='import')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Benchmark the memory footprint of the api object model
+
+Builds the Section / Article / Author tree of the static PRL issue and of synthetic issues
+scaled up to thousands of articles, and reports the bytes retained per article.
+
+Usage:
+    python -m benchmarks.bench_memory [--sizes 1000 10000] [--compare results.json]
+"""
+
+
+import argparse
+from apsjournals import api
+from apsjournals.web import scrapers
+from benchmarks import common
+from benchmarks.bench_scrapers import ISSUE_PAGE, count_articles, synthetic_issue_page
+
+
+def run(sizes, repeat: int=5):
+    journal = api.Journal('Physical Review Letters', 'prl', short_name='PRL')
+    issue = api.Issue(vol=api.Volume(journal=journal, num=121, start=None, end=None), num=6)
+    with open(ISSUE_PAGE.as_posix()) as fid:
+        pages = [('fixture', fid.read())] + [('synthetic-{:d}'.format(n), synthetic_issue_page(n)) for n in sizes]
+
+    measurements = []
+    for label, page in pages:
+        info = scrapers.IssueScraper(backend=scrapers.Backend.Lxml).extract(page)
+        measurements.append(common.measure('object model({})'.format(label),
+                                           lambda: api.parse_contents_from_info(info, issue=issue),
+                                           items=count_articles(info), repeat=repeat))
+    return measurements
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='*', default=[1000, 10000], help='article counts of the synthetic issues')
+    common.add_arguments(parser)
+    args = parser.parse_args(argv)
+    measurements = run(args.sizes, repeat=args.repeat)
+    common.finish(args, measurements, suite='memory')
+    print('\nRetained bytes per article')
+    for m in measurements:
+        print('{:<48s} {:>10.1f}'.format(m.name, m.retained_bytes / m.items))
+
+
+if __name__ == '__main__':
+    main()
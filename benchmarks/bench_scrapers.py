@@ -0,0 +1,102 @@
+"""Benchmark the parsing cost of the scrapers and the contents builder
+
+Times VolumeIndexScraper, IssueIndexScraper, JournalIndexScraper and IssueScraper extraction
+for every parsing backend, and api.parse_contents_from_info, on the static PRL fixtures and
+on synthetic issue pages scaled up to thousands of articles.
+
+Usage:
+    python -m benchmarks.bench_scrapers [--sizes 1000 5000] [--compare results.json]
+"""
+
+
+import argparse
+import copy
+import math
+from lxml import etree, html
+from apsjournals import api
+from apsjournals.web import scrapers, xpath
+from benchmarks import common
+
+
+VOLUME_PAGE = common.STATIC_DIR / 'prl' / '121.htm'
+ISSUE_PAGE = common.STATIC_DIR / 'prl' / '121-6.htm'
+
+
+def count_articles(info) -> int:
+    """Count the articles in scraped issue info"""
+    n = 0
+    for i in info:
+        if isinstance(i, scrapers.SectionInfo):
+            n += len(i.articles)
+        elif isinstance(i, scrapers.ArticleInfo):
+            n += 1
+    return n
+
+
+def synthetic_issue_page(articles: int) -> str:
+    """Build an issue page with at least the given number of articles, by repeating the
+    dividers, articles and sections of the static issue page
+
+    Args:
+        articles:
+            int, the minimum number of articles on the page
+
+    Returns:
+        str, the html source
+    """
+    with open(ISSUE_PAGE.as_posix()) as fid:
+        root = xpath.parse(fid.read())
+    results = xpath.RESULTS(root)[0]
+    items = xpath.ITEMS(results)
+    per_page = count_articles(scrapers.IssueScraper(backend=scrapers.Backend.Lxml).extract(etree.tostring(root, encoding='unicode')))
+    for _ in range(math.ceil(articles / per_page) - 1):
+        for item in items:
+            results.append(copy.deepcopy(item))
+    return html.tostring(root, encoding='unicode')
+
+
+def run(sizes, repeat: int=5):
+    with open(VOLUME_PAGE.as_posix()) as fid:
+        volume_page = fid.read()
+    with open(ISSUE_PAGE.as_posix()) as fid:
+        issue_page = fid.read()
+    pages = [('fixture', issue_page)] + [('synthetic-{:d}'.format(n), synthetic_issue_page(n)) for n in sizes]
+
+    measurements = []
+    for backend in scrapers.Backend:
+        s = scrapers.VolumeIndexScraper(backend=backend)
+        n = len(s.extract(volume_page))
+        measurements.append(common.measure('VolumeIndexScraper.extract[{}]'.format(backend.value),
+                                           lambda: s.extract(volume_page), items=n, repeat=repeat))
+        s = scrapers.IssueIndexScraper(backend=backend)
+        n = len(s.extract(volume_page, volume=121))
+        measurements.append(common.measure('IssueIndexScraper.extract[{}]'.format(backend.value),
+                                           lambda: s.extract(volume_page, volume=121), items=n, repeat=repeat))
+        s = scrapers.JournalIndexScraper(backend=backend)
+        n = len(s.extract(volume_page).volumes)
+        measurements.append(common.measure('JournalIndexScraper.extract[{}]'.format(backend.value),
+                                           lambda: s.extract(volume_page), items=n, repeat=repeat))
+        for label, page in pages:
+            s = scrapers.IssueScraper(backend=backend)
+            n = count_articles(s.extract(page))
+            measurements.append(common.measure('IssueScraper.extract[{}]({})'.format(backend.value, label),
+                                               lambda: s.extract(page), items=n, repeat=repeat))
+
+    for label, page in pages:
+        info = scrapers.IssueScraper(backend=scrapers.Backend.Lxml).extract(page)
+        measurements.append(common.measure('parse_contents_from_info({})'.format(label),
+                                           lambda: api.parse_contents_from_info(info, issue=None),
+                                           items=count_articles(info), repeat=repeat))
+    return measurements
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='*', default=[1000, 5000], help='article counts of the synthetic issue pages')
+    common.add_arguments(parser)
+    args = parser.parse_args(argv)
+    common.finish(args, run(args.sizes, repeat=args.repeat), suite='scrapers')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Shared measurement, storage and comparison utilities for the benchmarks
+"""
+
+
+import collections
+import gc
+import json
+import os
+import pathlib
+import platform
+import time
+import tracemalloc
+import typing
+import apsjournals
+
+
+STATIC_DIR = pathlib.Path(__file__).parent.parent / 'tests' / 'static'
+RESULTS_DIR = pathlib.Path(__file__).parent / 'results'
+
+Measurement = collections.namedtuple('Measurement', 'name seconds items throughput peak_bytes retained_bytes blocks')
+
+
+def measure(name: str, func: typing.Callable, items: int=1, repeat: int=5) -> Measurement:
+    """Time a function and measure its memory use
+
+    The timing is the best of `repeat` runs without tracing. The memory figures come from
+    one extra run under tracemalloc: the peak traced memory during the call, and the bytes
+    and number of memory blocks allocated by the call that were still alive when it returned
+    (i.e. the footprint of the returned value).
+
+    Args:
+        name:
+            str, the name of the measurement
+        func:
+            callable, the function to measure, called without arguments
+        items:
+            int, default 1, the number of items (pages, articles...) processed per call
+        repeat:
+            int, default 5, the number of timed runs
+
+    Returns:
+        Measurement
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        result = func()
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    diff = after.compare_to(before, 'lineno')
+    retained = sum(max(s.size_diff, 0) for s in diff)
+    blocks = sum(max(s.count_diff, 0) for s in diff)
+    del result
+    return Measurement(name=name, seconds=best, items=items, throughput=items / best, peak_bytes=peak, retained_bytes=retained, blocks=blocks)
+
+
+def report(measurements: typing.List[Measurement]):
+    """Print a table of measurements"""
+    print('{:<48s} {:>10s} {:>14s} {:>12s} {:>14s} {:>10s}'.format('benchmark', 'ms', 'items/s', 'peak KiB', 'retained KiB', 'blocks'))
+    for m in measurements:
+        print('{:<48s} {:>10.2f} {:>14.1f} {:>12.1f} {:>14.1f} {:>10d}'.format(m.name, 1e3 * m.seconds, m.throughput, m.peak_bytes / 1024,
+                                                                           m.retained_bytes / 1024, m.blocks))
+
+
+def save(measurements: typing.List[Measurement], path: str=None, suite: str='benchmarks') -> str:
+    """Store measurements as json so later versions can be compared against them
+
+    Args:
+        measurements:
+            List[Measurement]
+        path:
+            str, default None, the output path. If None, results/<suite>-<version>.json
+        suite:
+            str, the name of the benchmark suite
+
+    Returns:
+        str, the path of the stored results
+    """
+    if path is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        path = (RESULTS_DIR / '{}-{}.json'.format(suite, apsjournals.__version__)).as_posix()
+    data = {
+        'suite': suite,
+        'version': apsjournals.__version__,
+        'python': platform.python_version(),
+        'time': time.time(),
+        'results': [m._asdict() for m in measurements],
+    }
+    with open(path, 'w') as fid:
+        json.dump(data, fid, indent=2)
+    return path
+
+
+def load(path: str) -> typing.List[Measurement]:
+    """Load measurements stored by save"""
+    with open(path, 'r') as fid:
+        data = json.load(fid)
+    return [Measurement(**{f: m.get(f, 0) for f in Measurement._fields}) for m in data['results']]
+
+
+def compare(baseline: typing.List[Measurement], current: typing.List[Measurement]):
+    """Print the ratio of current to baseline figures, for benchmarks present in both"""
+    base = {m.name: m for m in baseline}
+    print('{:<48s} {:>10s} {:>12s} {:>12s} {:>10s}'.format('benchmark', 'time', 'peak mem', 'retained', 'blocks'))
+    for m in current:
+        if m.name not in base:
+            continue
+        b = base[m.name]
+        print('{:<48s} {:>9.2f}x {:>11.2f}x {:>11.2f}x {:>9.2f}x'.format(m.name, m.seconds / b.seconds, m.peak_bytes / max(b.peak_bytes, 1),
+                                                                   m.retained_bytes / max(b.retained_bytes, 1), m.blocks / max(b.blocks, 1)))
+
+
+def add_arguments(parser):
+    """Add the common command line options to an argument parser"""
+    parser.add_argument('--repeat', type=int, default=5, help='number of timed runs per benchmark')
+    parser.add_argument('--output', default=None, help='where to store the results, default benchmarks/results/<suite>-<version>.json')
+    parser.add_argument('--compare', default=None, help='stored results to compare against')
+    parser.add_argument('--no-save', action='store_true', help='do not store the results')
+
+
+def finish(args, measurements: typing.List[Measurement], suite: str):
+    """Report, store and compare measurements according to the common command line options"""
+    report(measurements)
+    if not args.no_save:
+        print('\nResults stored in {}'.format(os.path.relpath(save(measurements, args.output, suite=suite))))
+    if args.compare is not None:
+        print('\nCompared with {}'.format(args.compare))
+        compare(load(args.compare), measurements)
@@ -19,5 +19,7 @@ setuptools.setup(name='apsjournals',
                  author='James W. Kennington',
                  author_email='jameswkennington@gmail.com',
                  license='MIT',
-                 packages=setuptools.find_packages(),
+                 packages=setuptools.find_packages(exclude=('benchmarks', 'benchmarks.*')),
+                 install_requires=['fpdf', 'inflection', 'lxml', 'pypdf2>=1.26,<2', 'requests', 'scrapy'],
+                 entry_points={'console_scripts': ['apsjournals=apsjournals.cli:main']},
                  zip_safe=False)
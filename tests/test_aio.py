@@ -0,0 +1,106 @@
+import asyncio
+import functools
+import io
+import mock
+import threading
+import time
+import unittest
+from apsjournals import api
+from apsjournals.web import aio
+from apsjournals.web.constants import EndPoint
+from tests.test_scrapers import get_aps_static
+
+
+class TransportTests(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def test_run(self):
+        t = aio.AsyncTransport(limit=2)
+        self.assertEqual(self.loop.run_until_complete(t.run(int, '11', base=2)), 3)
+        t.close()
+
+    def test_limit(self):
+        t = aio.AsyncTransport(limit=3)
+        active, peak, lock = [0], [0], threading.Lock()
+
+        def work():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+        self.loop.run_until_complete(asyncio.gather(*(t.run(work) for _ in range(12))))
+        t.close()
+        self.assertEqual(peak[0], 3)
+
+    def test_invalid_limit(self):
+        with self.assertRaises(ValueError):
+            aio.AsyncTransport(limit=0)
+
+    def test_default_transport(self):
+        t = aio.AsyncTransport(limit=2)
+        with mock.patch('apsjournals.web.aio._DEFAULT_TRANSPORT', None):
+            aio.set_default_transport(t)
+            self.assertIs(aio.get_default_transport(), t)
+        t.close()
+
+
+class AsyncApiTests(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.j = api.Journal('PRL', 'prl')
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def run_async(self, coro, ep: EndPoint):
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=ep)) as get:
+            return self.loop.run_until_complete(coro), get.call_count
+
+    def test_volumes_and_issues(self):
+        volumes, calls = self.run_async(self.j.avolumes(), EndPoint.Volume)
+        self.assertEqual(len(volumes), 122)
+        issues, _ = self.run_async(self.j.volume(121).aissues(), EndPoint.Volume)
+        self.assertEqual(tuple(issues), tuple(range(1, 27)))
+        self.assertEqual(calls, 1)
+
+    def test_issue(self):
+        issue, calls = self.run_async(self.j.aissue(121, 6), EndPoint.Volume)
+        self.assertEqual(str(issue), "Issue('PRL', 121, 6)")
+        self.assertEqual(calls, 1)
+
+    def test_contents(self):
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)):
+            issue = self.j.issue(121, 6)
+        contents, calls = self.run_async(issue.acontents(), EndPoint.Issue)
+        self.assertEqual(contents, list(issue.contents()))
+        articles, _ = self.run_async(issue.aarticles(), EndPoint.Issue)
+        self.assertEqual(calls, 1)
+        self.assertEqual(articles[0].name, 'Magnetic Levitation Stabilized by Streaming Fluid Flows')
+
+    def test_gather_contents(self):
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)):
+            issues = [self.j.issue(121, 6), api.Journal('PRL', 'prl').issue(121, 6)]
+        contents, calls = self.run_async(api.gather_contents(issues), EndPoint.Issue)
+        self.assertEqual(calls, 2)
+        self.assertEqual([len(c) for c in contents], [len(list(i.contents())) for i in issues])
+
+    def test_article_pdf(self):
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)):
+            issue = self.j.issue(121, 6)
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Issue)):
+            article = issue.articles[0]
+        out = io.BytesIO()
+        with mock.patch('apsjournals.web.scrapers.download_pdf', return_value='info') as download:
+            self.assertEqual(self.loop.run_until_complete(article.apdf(out)), 'info')
+        download.assert_called_once_with(article.pdf_url, out_file=out)
@@ -1,7 +1,10 @@
+import collections
+import datetime
 import functools
 import mock
 import unittest
-from apsjournals import api
+from apsjournals import api, util
+from apsjournals.web import scrapers
 from apsjournals.web.constants import EndPoint
 from tests.test_scrapers import get_aps_static
 
@@ -24,6 +27,15 @@ class JournalTests(unittest.TestCase):
         self.assertIsInstance(v, api.Volume)
         self.assertEqual(str(v), "Volume('PRL', 121)")
 
+    def test_issues_between(self):
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)):
+            self.j.volume(121)
+            latest = self.j.volume(122)  # listed but not expanded in the static index
+            latest._issues = collections.OrderedDict([(1, api.Issue(latest, 1, datetime.date(2019, 1, 4)))])
+            issues = self.j.issues_between(datetime.date(2018, 7, 10), datetime.date(2018, 7, 31))
+        self.assertEqual([(i.vol.num, i.num) for i in issues], [(121, 2), (121, 3), (121, 4)])
+        self.assertEqual(issues[0].date, datetime.date(2018, 7, 13))
+
 
 class VolumeTests(unittest.TestCase):
     def setUp(self):
@@ -36,6 +48,14 @@ class VolumeTests(unittest.TestCase):
             issues = self.v.issues
         self.assertEqual(tuple(issues), tuple(range(1, 27)))
 
+    def test_single_index_fetch(self):
+        j = api.Journal('PRL', 'prl', 'PRL Desc')
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)) as get:
+            issues = j.volume(121).issues
+            self.assertEqual(len(j.volumes), 122)
+        self.assertEqual(tuple(issues), tuple(range(1, 27)))
+        self.assertEqual(get.call_count, 1)
+
     def test_issue(self):
         with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)):
             i = self.v.issue(6)
@@ -56,6 +76,14 @@ class IssueTests(unittest.TestCase):
         with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Issue)):
             contents = list(self.i.contents())[:2]
         self.assertEqual(repr(contents), "[Section(HIGHLIGHTED ARTICLES, 6 members), Article('Magnetic Levitation Stabilized by Streaming Fluid Flows')]")
+
+    def test_empty_issue_loaded_once(self):
+        self.assertFalse(self.i._loaded)
+        with mock.patch('apsjournals.web.scrapers.get_aps', return_value='<html></html>') as get:
+            self.assertEqual(self.i.articles, [])
+            self.assertEqual(list(self.i.contents()), [])
+        self.assertTrue(self.i._loaded)
+        self.assertEqual(get.call_count, 1)
         
 
 class ArticleTests(unittest.TestCase):
@@ -77,3 +105,42 @@ class ArticleTests(unittest.TestCase):
     def test_url(self):
         self.assertEqual(self.a.url, "https://journals.aps.org/prl/abstract/10.1103/PhysRevLett.121.064502")
         self.assertEqual(self.a.pdf_url, "https://journals.aps.org/prl/pdf/10.1103/PhysRevLett.121.064502")
+
+
+class ParseContentsTests(unittest.TestCase):
+    def setUp(self):
+        article = functools.partial(scrapers.ArticleInfo, author='A. Author, and B. Writer', teaser=None, url='url', pdf_url='pdf')
+        self.info = [article(name='Top'),
+                     scrapers.DividerInfo(name='D1'),
+                     article(name='A1'),
+                     scrapers.SectionInfo(name='S1', articles=[article(name='A2'), article(name='A3')]),
+                     scrapers.DividerInfo(name='D2'),
+                     article(name='A4')]
+
+    def test_structure(self):
+        contents = api.parse_contents_from_info(self.info, issue=None)
+        self.assertEqual(repr(contents), "[Article('Top'), Section(D1, 2 members), Section(D2, 1 members)]")
+        self.assertEqual(repr(contents[1].members), "[Article('A1'), Section(S1, 2 members)]")
+        self.assertEqual([a.last_name for a in contents[0].authors], ['Author', 'Writer'])
+
+    def test_not_mutated(self):
+        expected = list(self.info)
+        api.parse_contents_from_info(self.info, issue=None)
+        self.assertEqual(self.info, expected)
+
+    def test_generator(self):
+        contents = api.parse_contents_from_info((i for i in self.info), issue=None)
+        self.assertEqual(repr(contents), repr(api.parse_contents_from_info(self.info, issue=None)))
+
+    def test_compact_objects(self):
+        contents = api.parse_contents_from_info(self.info, issue=None)
+        for obj in (contents[0], contents[0].authors[0], contents[1]):
+            self.assertFalse(hasattr(obj, '__dict__'))
+        a, b = api.Author(''.join(['A.', ' Author'])), api.Author('B. Author')
+        self.assertIs(a.last_name, b.last_name)
+
+
+class UtilTests(unittest.TestCase):
+    def test_parse_issue_date(self):
+        self.assertEqual(util.parse_issue_date(' 6 July 2018 (010401 \u2014 019901)'), datetime.date(2018, 7, 6))
+        self.assertIsNone(util.parse_issue_date('Issue 6'))
@@ -0,0 +1,180 @@
+import io
+import mock
+import os
+import stat
+import tempfile
+import threading
+import time
+import unittest
+from apsjournals.web import auth, scrapers, session, sessionstore
+
+
+PDF_URL = 'https://journals.aps.org/prl/pdf/10.1103/PhysRevLett.121.064502'
+
+
+def mock_response(status_code=200, url=PDF_URL, headers=None, history=(), content=b'', cookies=None):
+    return mock.Mock(status_code=status_code, url=url, headers=headers or {}, history=list(history), content=content,
+                     cookies=cookies or {}, iter_content=lambda chunk_size: iter([content]))
+
+
+def login_as(token):
+    """A replacement for auth._login, setting the session cookies as a login would"""
+    def login(username, password, store):
+        time.sleep(0.01)  # give concurrent renewals a chance to overlap
+        auth._set_cookies({'auth_token': token, 'rack.session': 'rack'})
+        if store is not None:
+            store.save(username, auth.cookies())
+    return login
+
+
+class SessionStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = sessionstore.SessionStore(os.path.join(self.tmp.name, 'sessions', 'session.json'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_save_load(self):
+        self.assertIsNone(self.store.load())
+        self.store.save('me', {'auth_token': 'a', 'rack.session': 'r'})
+        record = self.store.load()
+        self.assertEqual(record.username, 'me')
+        self.assertEqual(record.cookies, {'auth_token': 'a', 'rack.session': 'r'})
+        self.assertEqual(stat.S_IMODE(os.stat(self.store.path).st_mode), 0o600)
+        self.assertEqual(stat.S_IMODE(os.stat(os.path.dirname(self.store.path)).st_mode) & 0o077, 0)
+        self.store.clear()
+        self.assertIsNone(self.store.load())
+        self.store.clear()
+
+    def test_corrupt(self):
+        with open(self.store.path, 'w') as fid:
+            fid.write('{"username": ')
+        self.assertIsNone(self.store.load())
+
+    def test_lock(self):
+        inside = []
+
+        def locked():
+            with self.store.lock():
+                inside.append(1)
+                time.sleep(0.01)
+                self.assertEqual(len(inside), 1)
+                inside.pop()
+
+        threads = [threading.Thread(target=locked) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+
+class AuthTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = sessionstore.SessionStore(os.path.join(self.tmp.name, 'session.json'))
+
+    def tearDown(self):
+        auth._AUTH_TOKEN = auth._RACK_SESSION = auth._CREDENTIALS = None
+        sessionstore.set_default_session_store(None)
+        session.get_session().cookies.clear()
+        self.tmp.cleanup()
+
+    def test_is_expired(self):
+        self.assertFalse(auth.is_expired(mock_response(200, headers={'Content-Type': 'application/pdf'})))
+        self.assertTrue(auth.is_expired(mock_response(401)))
+        self.assertTrue(auth.is_expired(mock_response(302, headers={'Location': 'https://journals.aps.org/login'})))
+        redirect = mock_response(302, headers={'Location': '/login/'})
+        self.assertTrue(auth.is_expired(mock_response(200, url='https://journals.aps.org/login/', history=[redirect])))
+
+    def test_authenticate_saves(self):
+        page = mock_response(content=b'<form action="/login"><input name="authenticity_token" value="t"/></form>',
+                             cookies={'rack.session': 'rack'})
+        with mock.patch.object(session.get_session(), 'get', return_value=page), \
+                mock.patch.object(session.get_session(), 'post', return_value=mock_response(302, cookies={'auth_token': 'a1'})) as post:
+            auth.authenticate('me', 'pw', store=self.store)
+        self.assertEqual(post.call_args[1]['data']['password'], 'pw')
+        self.assertEqual(auth.cookies(), {'auth_token': 'a1', 'rack.session': 'rack'})
+        self.assertEqual(session.get_session().cookies.get('auth_token'), 'a1')
+        self.assertEqual(self.store.load().cookies, auth.cookies())
+        self.assertNotIn('pw', open(self.store.path).read())
+
+    def test_authenticate_reuses_store(self):
+        self.store.save('me', {'auth_token': 'stored', 'rack.session': 'rack'})
+        with mock.patch('apsjournals.web.auth._login') as login, mock.patch('getpass.getpass') as prompt:
+            auth.authenticate('me', store=self.store)
+        login.assert_not_called()
+        prompt.assert_not_called()
+        self.assertEqual(auth.token(), 'stored')
+        self.assertEqual(session.get_session().cookies.get('auth_token'), 'stored')
+        with mock.patch('apsjournals.web.auth._login', side_effect=login_as('other')) as login:
+            auth.authenticate('someone else', 'pw', store=self.store)
+        login.assert_called_once()
+        self.assertEqual(self.store.load().username, 'someone else')
+
+    def test_restore(self):
+        self.assertFalse(auth.restore(self.store))
+        self.store.save('me', {'auth_token': 'stored', 'rack.session': 'rack'})
+        self.assertTrue(auth.restore(self.store))
+        self.assertTrue(auth.is_authenticated())
+        with self.assertRaises(auth.AuthenticationError):
+            auth.renew('stored')  # no credentials
+
+    def test_renew_once(self):
+        sessionstore.set_default_session_store(self.store)
+        auth._set_cookies({'auth_token': 'old', 'rack.session': 'rack'})
+        auth._CREDENTIALS = ('me', 'pw')
+        with mock.patch('apsjournals.web.auth._login', side_effect=login_as('new')) as login:
+            threads = [threading.Thread(target=auth.renew, args=('old',)) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        login.assert_called_once_with('me', 'pw', self.store)
+        self.assertEqual(auth.token(), 'new')
+        self.assertEqual(session.get_session().cookies.get('auth_token'), 'new')
+
+    def test_renew_from_store(self):
+        sessionstore.set_default_session_store(self.store)
+        auth._set_cookies({'auth_token': 'old', 'rack.session': 'rack'})
+        self.store.save('me', {'auth_token': 'renewed elsewhere', 'rack.session': 'rack'})
+        with mock.patch('apsjournals.web.auth._login') as login:
+            auth.renew('old')
+        login.assert_not_called()
+        self.assertEqual(auth.token(), 'renewed elsewhere')
+
+    def test_download_renews_expired_session(self):
+        auth._set_cookies({'auth_token': 'old', 'rack.session': 'rack'})
+        auth._CREDENTIALS = ('me', 'pw')
+        responses = [mock_response(200, url='https://journals.aps.org/login', headers={'Content-Type': 'text/html'}),
+                     mock_response(200, headers={'Content-Type': 'application/pdf'}, content=b'%PDF-1.4')]
+        out = io.BytesIO()
+        with mock.patch.object(session.get_session(), 'get', side_effect=responses) as get, \
+                mock.patch('apsjournals.web.auth._login', side_effect=login_as('new')) as login:
+            info = scrapers.download_pdf(PDF_URL, out_file=out)
+        login.assert_called_once()
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(info.size, 8)
+        self.assertEqual(out.getvalue(), b'%PDF-1.4')
+
+    def test_download_still_unauthorized(self):
+        auth._set_cookies({'auth_token': 'old', 'rack.session': 'rack'})
+        auth._CREDENTIALS = ('me', 'pw')
+        with mock.patch.object(session.get_session(), 'get', side_effect=lambda *a, **k: mock_response(403)) as get, \
+                mock.patch('apsjournals.web.auth._login', side_effect=login_as('new')) as login:
+            with self.assertRaises(auth.AuthenticationError):
+                scrapers.download_pdf(PDF_URL, out_file=io.BytesIO())
+        login.assert_called_once()
+        self.assertEqual(get.call_count, 2)
+
+    def test_download_error_page(self):
+        auth._set_cookies({'auth_token': 'old', 'rack.session': 'rack'})
+        not_found = mock_response(404, headers={'Content-Type': 'text/html; charset=utf-8'}, content=b'<html>Not Found</html>')
+        not_found.reason = 'Not Found'
+        with mock.patch.object(session.get_session(), 'get', return_value=not_found) as get, \
+                mock.patch('apsjournals.web.auth.renew') as renew:
+            with self.assertRaises(scrapers.ScrapingError) as raised:
+                scrapers.download_pdf(PDF_URL, out_file=io.BytesIO())
+        self.assertIn('Not Found', str(raised.exception))
+        renew.assert_not_called()
+        self.assertEqual(get.call_count, 1)
@@ -0,0 +1,75 @@
+import functools
+import mock
+import multiprocessing
+import unittest
+from apsjournals import api, bulk
+from apsjournals.web import scrapers
+from apsjournals.web.constants import EndPoint
+from tests.test_scrapers import get_aps_static
+
+
+class BulkTests(unittest.TestCase):
+    def setUp(self):
+        self.j = api.Journal('PRL', 'prl')
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)):
+            self.issue = self.j.issue(121, 6)
+
+    def load(self, targets, **kwargs):
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Issue)) as get:
+            return bulk.load_issues(targets, rate=100.0, **kwargs), get.call_count
+
+    def expected(self):
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Issue)):
+            return [a.name for a in api.Issue(vol=self.issue.vol, num=6).articles]
+
+    def test_process_pool(self):
+        other = api.Journal('PRL', 'prl')
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)):
+            other_issue = other.issue(121, 6)
+        result, calls = self.load([self.issue, other_issue], processes=2)
+        self.assertEqual(calls, 2)
+        self.assertEqual(result, [bulk.LoadInfo(self.issue, None), bulk.LoadInfo(other_issue, None)])
+        self.assertTrue(self.issue._loaded)
+        with mock.patch('apsjournals.web.scrapers.get_aps') as get:
+            names = [a.name for a in self.issue.articles]
+        get.assert_not_called()  # served from the issue cache
+        self.assertEqual(names, self.expected())
+
+    def test_pool_forked_before_fetching(self):
+        events = []
+        pool = multiprocessing.Pool
+
+        def get_aps(url):
+            events.append('fetch')
+            return get_aps_static(url, ep=EndPoint.Issue)
+
+        with mock.patch('multiprocessing.Pool', side_effect=lambda *a: events.append('pool') or pool(*a)), \
+                mock.patch('apsjournals.web.scrapers.get_aps', side_effect=get_aps):
+            result = bulk.load_issues([self.issue], processes=1, rate=100.0)
+        self.assertIsNone(result[0].error)
+        self.assertEqual(events, ['pool', 'fetch'])
+
+    def test_in_thread_parsing(self):
+        result, calls = self.load([self.issue], processes=0, backend=scrapers.Backend.Lxml)
+        self.assertEqual(calls, 1)
+        self.assertIsNone(result[0].error)
+        self.assertEqual([a.name for a in self.issue.articles], self.expected())
+
+    def test_skip_loaded(self):
+        self.load([self.issue, self.issue], processes=0)
+        result, calls = self.load([self.issue], processes=0)
+        self.assertEqual(calls, 0)
+        self.assertIsNone(result[0].error)
+        _, calls = self.load([self.issue], processes=0, reload=True)
+        self.assertEqual(calls, 1)
+
+    def test_tuple_targets(self):
+        result, _ = self.load([(self.j, 121, 6)], processes=0)
+        self.assertIs(result[0].issue, self.issue)
+
+    def test_failures(self):
+        missing = api.Issue(vol=self.issue.vol, num=7)  # no static page
+        result, _ = self.load([missing, self.issue], processes=0)
+        self.assertIsInstance(result[0].error, FileNotFoundError)
+        self.assertIsNone(result[1].error)
+        self.assertFalse(missing._loaded)
@@ -0,0 +1,143 @@
+import collections
+import functools
+import mock
+import os
+import sqlite3
+import tempfile
+import unittest
+from apsjournals import api
+from apsjournals.web import cache, scrapers
+from apsjournals.web.constants import EndPoint
+from tests.test_scrapers import get_aps_static
+
+
+def mock_response(status_code=200, content=b'', headers=None):
+    return mock.Mock(status_code=status_code, content=content, headers=headers or {})
+
+
+class CacheTestMixin:
+    def make_cache(self, path):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = self.make_cache(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_get_missing(self):
+        self.assertIsNone(self.cache.get('https://journals.aps.org/prl/issues/'))
+
+    def test_set_get(self):
+        url = EndPoint.Issue.format(journal='prl', volume=121, issue=6)
+        self.cache.set(url, b'body', etag='"abc"', last_modified='Mon, 01 Jan 2018 00:00:00 GMT')
+        entry = self.cache.get(url)
+        self.assertEqual(entry.body, b'body')
+        self.assertEqual(entry.etag, '"abc"')
+        self.assertEqual(entry.last_modified, 'Mon, 01 Jan 2018 00:00:00 GMT')
+        self.assertFalse(entry.immutable)
+        self.assertIn(url, self.cache)
+        self.cache.set(url, b'body', immutable=True)
+        self.assertTrue(self.cache.get(url).immutable)
+
+    def test_delete_clear(self):
+        self.cache.set('a', b'1')
+        self.cache.set('b', b'2')
+        self.cache.delete('a')
+        self.assertNotIn('a', self.cache)
+        self.assertIn('b', self.cache)
+        self.cache.clear()
+        self.assertNotIn('b', self.cache)
+
+
+class DirectoryCacheTests(CacheTestMixin, unittest.TestCase):
+    def make_cache(self, path):
+        return cache.DirectoryCache(os.path.join(path, 'responses'))
+
+
+class SQLiteCacheTests(CacheTestMixin, unittest.TestCase):
+    def make_cache(self, path):
+        return cache.SQLiteCache(os.path.join(path, 'responses.db'))
+
+    def test_older_database(self):
+        path = os.path.join(self.tmp.name, 'older.db')
+        conn = sqlite3.connect(path)
+        with conn:
+            conn.execute('CREATE TABLE responses (url TEXT PRIMARY KEY, body BLOB, etag TEXT, last_modified TEXT, stored REAL)')
+            conn.execute("INSERT INTO responses VALUES ('a', x'31', NULL, NULL, 0)")
+        conn.close()
+        older = cache.SQLiteCache(path)
+        self.assertEqual(older.get('a'), cache.CacheEntry('a', b'1', None, None, 0, False))
+        older.set('b', b'2', immutable=True)
+        self.assertTrue(older.get('b').immutable)
+
+
+class CachedScraperTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = cache.DirectoryCache(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_immutable_served_from_cache(self):
+        s = scrapers.IssueScraper(cache=self.cache)
+        with mock.patch('apsjournals.web.scrapers.get_aps_response', return_value=mock_response(content=b'issue')) as get:
+            self.assertEqual(s.get(journal='prl', volume=121, issue=6, closed=True), b'issue')
+            self.assertEqual(s.get(journal='prl', volume=121, issue=6, closed=True), b'issue')
+        self.assertEqual(get.call_count, 1)
+
+    def test_current_issue_revalidated(self):
+        j = api.Journal('PRL', 'prl', 'PRL Desc')
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)):
+            volume = j.volume(121)
+        self.assertEqual(max(j.volumes), 122)  # the latest volume, 121 is closed
+        self.assertTrue(volume.issue(26).closed)
+        latest = j.volume(122)
+        latest._issues = collections.OrderedDict((n, api.Issue(latest, n)) for n in (1, 2))
+        self.assertTrue(latest.issue(1).closed)
+        current = latest.issue(2)
+        self.assertFalse(current.closed)
+        with mock.patch.object(scrapers.IssueScraper, 'get', return_value='<html></html>') as get:
+            current.articles
+        self.assertFalse(get.call_args[1]['closed'])
+
+        s = scrapers.IssueScraper(cache=self.cache)
+        with mock.patch('apsjournals.web.scrapers.get_aps_response', return_value=mock_response(content=b'issue', headers={'ETag': '"v1"'})):
+            self.assertEqual(s.get(journal='prl', volume=122, issue=2, closed=current.closed), b'issue')
+        with mock.patch('apsjournals.web.scrapers.get_aps_response', return_value=mock_response(content=b'more articles', headers={'ETag': '"v2"'})) as get:
+            self.assertEqual(s.get(journal='prl', volume=122, issue=2, closed=current.closed), b'more articles')
+        self.assertEqual(get.call_args[1]['headers'], {'If-None-Match': '"v1"'})
+
+    def test_closed_issue_revalidated_once(self):
+        # a copy stored while the issue was current may lack articles added since
+        s = scrapers.IssueScraper(cache=self.cache)
+        with mock.patch('apsjournals.web.scrapers.get_aps_response', return_value=mock_response(content=b'issue', headers={'ETag': '"v1"'})):
+            s.get(journal='prl', volume=122, issue=2, closed=False)
+        with mock.patch('apsjournals.web.scrapers.get_aps_response', return_value=mock_response(content=b'more articles', headers={'ETag': '"v2"'})) as get:
+            self.assertEqual(s.get(journal='prl', volume=122, issue=2, closed=True), b'more articles')
+            self.assertEqual(s.get(journal='prl', volume=122, issue=2, closed=True), b'more articles')
+        self.assertEqual(get.call_count, 1)
+        self.cache.set(EndPoint.Issue.format(journal='prl', volume=122, issue=3), b'issue', etag='"v1"')
+        with mock.patch('apsjournals.web.scrapers.get_aps_response', return_value=mock_response(status_code=304)) as get:
+            self.assertEqual(s.get(journal='prl', volume=122, issue=3, closed=True), b'issue')
+            self.assertEqual(s.get(journal='prl', volume=122, issue=3, closed=True), b'issue')
+        self.assertEqual(get.call_count, 1)
+
+    def test_revalidation(self):
+        s = scrapers.VolumeIndexScraper(cache=self.cache)
+        with mock.patch('apsjournals.web.scrapers.get_aps_response', return_value=mock_response(content=b'index', headers={'ETag': '"v1"'})):
+            self.assertEqual(s.get(journal='prl', volume=None), b'index')
+        with mock.patch('apsjournals.web.scrapers.get_aps_response', return_value=mock_response(status_code=304)) as get:
+            self.assertEqual(s.get(journal='prl', volume=None), b'index')
+        self.assertEqual(get.call_args[1]['headers'], {'If-None-Match': '"v1"'})
+
+    def test_default_cache(self):
+        cache.set_default_cache(self.cache)
+        try:
+            with mock.patch('apsjournals.web.scrapers.get_aps_response', return_value=mock_response(content=b'issue')):
+                scrapers.IssueScraper().get(journal='prl', volume=121, issue=6)
+        finally:
+            cache.set_default_cache(None)
+        self.assertIn(EndPoint.Issue.format(journal='prl', volume=121, issue=6), self.cache)
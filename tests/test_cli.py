@@ -0,0 +1,96 @@
+import io
+import json
+import mock
+import os
+import tempfile
+import unittest
+from apsjournals import api, cli
+from apsjournals.web import auth, session, sessionstore
+from apsjournals.web.constants import EndPoint
+from tests.test_pdf import mock_download_pdf
+from tests.test_scrapers import get_aps_static
+
+
+def get_aps_any(url: str):
+    try:
+        return get_aps_static(url, ep=EndPoint.Issue)
+    except ValueError:
+        return get_aps_static(url, ep=EndPoint.Volume)
+
+
+def run(argv, stdin=''):
+    out = io.StringIO()
+    with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=get_aps_any):
+        status = cli.main(argv, stdin=io.StringIO(stdin), stdout=out)
+    return status, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+class CliTests(unittest.TestCase):
+    def setUp(self):
+        # a fresh journal, rather than the shared apsjournals.PRL loaded by other tests
+        patcher = mock.patch.dict(cli._JOURNALS, {'prl': api.Journal('PRL', 'prl', 'PRL Desc')})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_parse_target(self):
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=get_aps_any):
+            self.assertEqual([i.num for i in cli.parse_target('prl/121/6')], [6])
+            self.assertEqual(len(cli.parse_target('PRL/121/')), 26)
+        for target in ('prl', 'prl/121/6/1', 'prl/x/6'):
+            with self.assertRaises(cli.TargetError):
+                cli.parse_target(target)
+        with self.assertRaises(cli.TargetError):
+            cli.journal('xyz')
+
+    def test_read_targets(self):
+        stdin = io.StringIO('prl/121/6\n\n# a comment\nprl/121/7  # trailing\n')
+        self.assertEqual(list(cli.read_targets(['a', '-', 'b'], stdin)), ['a', 'prl/121/6', 'prl/121/7', 'b'])
+
+    def test_issues(self):
+        status, records = run(['issues', 'prl', '121'])
+        self.assertEqual(status, 0)
+        self.assertEqual(len(records), 26)
+        self.assertEqual(records[5], {'journal': 'prl', 'volume': 121, 'issue': 6, 'date': '2018-08-10'})
+
+    def test_contents_stdin(self):
+        with mock.patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            status, records = run(['contents'], stdin='prl/121/6\n# comment\nxyz/1/1\n')
+        self.assertEqual(status, 1)
+        self.assertIn('xyz/1/1', stderr.getvalue())
+        self.assertTrue(records)
+        self.assertTrue(all(r['issue'] == 6 for r in records))
+        self.assertIsInstance(records[0]['authors'], list)
+
+    def test_download_requires_username(self):
+        with mock.patch('apsjournals.web.auth.is_authenticated', return_value=False), \
+                mock.patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            status, records = run(['download', 'prl/121/6'])
+        self.assertEqual(status, 1)
+        self.assertEqual(records, [])
+        self.assertIn('--username', stderr.getvalue())
+
+    def test_compile(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out_file = os.path.join(tmp, 'out.pdf')
+            with mock.patch('apsjournals.web.auth.is_authenticated', return_value=True), \
+                    mock.patch('apsjournals.web.scrapers.download_pdf', side_effect=mock_download_pdf):
+                status, records = run(['--rate', '1000', '--workers', '8', 'compile', 'prl/121/6', '--out', out_file])
+            self.assertEqual(status, 0)
+            self.assertEqual(records, [{'file': out_file, 'issues': 1, 'failed': []}])
+            self.assertTrue(os.path.isfile(out_file))
+
+    def test_download_stored_session(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'session.json')
+            sessionstore.SessionStore(path).save('me', {'auth_token': 'stored', 'rack.session': 'rack'})
+            try:
+                with mock.patch('apsjournals.web.scrapers.download_pdf', side_effect=mock_download_pdf):
+                    status, records = run(['--session', path, '--rate', '1000', 'download', 'prl/121/6', '--out-dir', tmp])
+                self.assertEqual(auth.token(), 'stored')
+            finally:
+                auth._AUTH_TOKEN = auth._RACK_SESSION = None
+                sessionstore.set_default_session_store(None)
+                session.get_session().cookies.clear()
+            self.assertEqual(status, 0)
+            self.assertEqual(records[0]['failed'], [])
+            self.assertTrue(os.path.isfile(os.path.join(tmp, 'prl-121-6.pdf')))
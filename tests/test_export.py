@@ -0,0 +1,82 @@
+import collections
+import csv
+import functools
+import mock
+import os
+import tempfile
+import unittest
+from apsjournals import api, export
+from apsjournals.web.constants import EndPoint
+from tests.test_scrapers import get_aps_static
+
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class ExportTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def records(self):
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Issue)):
+            return list(export.iter_issue_records('prl', 121, 6))
+
+    def test_records(self):
+        records = self.records()
+        self.assertEqual(records[0].section, 'HIGHLIGHTED ARTICLES')
+        self.assertEqual(records[0].title, 'Magnetic Levitation Stabilized by Streaming Fluid Flows')
+        self.assertEqual(records[6].section, 'LETTERS / General Physics: Statistical and Quantum Mechanics, Quantum Information, etc.')
+        self.assertEqual(records[0].authors, 'K.A. Baldwin; J.-B. de Fouchier; P.S. Atkinson; R.J.A. Hill; M.R. Swift; D.J. Fairhurst')
+        self.assertEqual(records[6].title, 'Coulomb-Gas Electrostatics Controls Large Fluctuations of the Kardar-Parisi-Zhang Equation')
+
+    def test_matches_object_model(self):
+        j = api.Journal('PRL', 'prl')
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)):
+            issue = j.issue(121, 6)
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Issue)):
+            articles = issue.articles
+        records = self.records()
+        self.assertEqual([r.title for r in records], [a.name for a in articles])
+        self.assertEqual([r.authors for r in records], [export.AUTHOR_SEPARATOR.join(a.first_name + ' ' + a.last_name if a.first_name != a.last_name else a.first_name
+                                                                                     for a in article.authors) for article in articles])
+
+    def test_to_columns(self):
+        columns = export.to_columns(self.records())
+        self.assertEqual(tuple(columns), export.COLUMNS)
+        self.assertEqual(set(columns['volume']), {121})
+
+    def test_export_csv_resumable(self):
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Issue)) as get:
+            paths = export.export_issues([('prl', 121, 6)], self.tmp.name, format='csv')
+            self.assertEqual(export.export_issues([('prl', 121, 6)], self.tmp.name, format='csv'), paths)
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(os.listdir(self.tmp.name), ['prl-121-6.csv'])
+        with open(paths[0], newline='', encoding='utf-8') as fid:
+            rows = list(csv.DictReader(fid))
+        self.assertEqual(len(rows), len(self.records()))
+        self.assertEqual(rows[0]['title'], 'Magnetic Levitation Stabilized by Streaming Fluid Flows')
+
+    def test_volume_export(self):
+        j = api.Journal('PRL', 'prl')
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)):
+            v = j.volume(121)
+        v._issues = collections.OrderedDict([(6, v._issues[6])])
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Issue)):
+            paths = v.export(self.tmp.name, format='csv')
+        self.assertEqual([os.path.basename(p) for p in paths], ['prl-121-6.csv'])
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            export.export_issue('prl', 121, 6, self.tmp.name, format='xlsx')
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_export_parquet(self):
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Issue)):
+            path = export.export_issue('prl', 121, 6, self.tmp.name, format='parquet')
+        self.assertEqual(pyarrow.parquet.read_table(path).num_rows, len(self.records()))
@@ -0,0 +1,29 @@
+import json
+import pathlib
+import subprocess
+import sys
+import unittest
+
+
+ROOT = pathlib.Path(__file__).parent.parent
+
+_LOADED = 'import json, sys; {}; print(json.dumps(sorted(sys.modules)))'
+
+
+def loaded_modules(statement: str) -> set:
+    # a fresh interpreter, as this one has long imported everything
+    out = subprocess.check_output([sys.executable, '-c', _LOADED.format(statement)], cwd=ROOT.as_posix())
+    return {m.split('.')[0] for m in json.loads(out.decode('utf-8').splitlines()[-1])}
+
+
+class LazyImportTests(unittest.TestCase):
+    def test_import_is_light(self):
+        loaded = loaded_modules('import apsjournals')
+        for heavy in ('scrapy', 'requests', 'urllib3', 'lxml', 'fpdf', 'PyPDF2', 'asyncio'):
+            self.assertNotIn(heavy, loaded)
+
+    def test_first_use_imports(self):
+        loaded = loaded_modules('from apsjournals.web import scrapers, session; session.get_session(); '
+                                'scrapers.IssueScraper().extract("<html></html>")')
+        self.assertTrue({'scrapy', 'requests'} <= loaded)
+        self.assertNotIn('fpdf', loaded)
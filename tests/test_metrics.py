@@ -0,0 +1,74 @@
+import functools
+import io
+import mock
+import os
+import tempfile
+import unittest
+import apsjournals
+from apsjournals import metrics
+from apsjournals.web import cache, scrapers
+from apsjournals.web.constants import EndPoint
+from tests.test_cache import mock_response
+from tests.test_pdf import mock_download_pdf
+from tests.test_scrapers import get_aps_static
+
+
+class MetricsTests(unittest.TestCase):
+    def test_disabled(self):
+        self.assertFalse(metrics.enabled())
+        with mock.patch('apsjournals.metrics._emit') as emit:
+            with metrics.span('x'):
+                metrics.count('y')
+            items = [1, 2]
+            self.assertIs(metrics.timed_iter('z', items), items)
+        emit.assert_not_called()
+
+    def test_registry(self):
+        registry = metrics.Registry()
+        metrics.add_listener(registry)
+        try:
+            for _ in range(3):
+                with metrics.span('x'):
+                    pass
+            metrics.count('bytes', 10)
+            metrics.count('bytes', 5)
+            self.assertEqual(list(metrics.timed_iter('z', iter([1, 2]))), [1, 2])
+        finally:
+            metrics.remove_listener(registry)
+        self.assertFalse(metrics.enabled())
+        self.assertEqual(registry.spans['x'].calls, 3)
+        self.assertEqual(registry.spans['z'].calls, 1)
+        self.assertEqual(registry.counters, {'bytes': 15})
+        self.assertIsNone(registry.cache_hit_ratio())
+
+    def test_cache_hit_ratio(self):
+        with tempfile.TemporaryDirectory() as tmp, metrics.profile(out=io.StringIO()) as registry:
+            c = cache.DirectoryCache(tmp)
+            url = EndPoint.Issue.format(journal='prl', volume=121, issue=6)
+            with mock.patch('apsjournals.web.session.get_session') as get_session:
+                get_session.return_value.get.return_value = mock_response(200, b'body')
+                scrapers.get_aps_cached(url, c, immutable=True)
+                scrapers.get_aps_cached(url, c, immutable=True)
+                get_session.return_value.get.return_value = mock_response(304)
+                scrapers.get_aps_cached(url, c)
+        self.assertEqual(registry.counters['web.requests'], 2)
+        self.assertEqual(registry.counters['web.bytes'], 4)
+        self.assertEqual(registry.counters['cache.revalidated'], 1)
+        self.assertAlmostEqual(registry.cache_hit_ratio(), 2 / 3)
+        self.assertEqual(registry.spans['web.get'].calls, 2)
+
+    def test_profile_issue_pdf(self):
+        out = io.StringIO()
+        with tempfile.TemporaryDirectory() as tmp, metrics.profile(out=out) as registry:
+            with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)):
+                issue = apsjournals.PRL.issue(121, 6)
+            with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Issue)):
+                articles = issue.articles
+            with mock.patch('apsjournals.web.scrapers.download_pdf', side_effect=mock_download_pdf):
+                issue.pdf(os.path.join(tmp, 'issue.pdf'), workers=8, rate=1000)
+        spans = registry.spans
+        for phase in ('scrape.extract', 'api.parse_contents', 'pdf.build', 'pdf.render', 'pdf.write'):
+            self.assertIn(phase, spans)
+        self.assertEqual(spans['pdf.download'].calls, len(articles))
+        self.assertLessEqual(spans['pdf.render'].total, spans['pdf.build'].total)
+        self.assertIn('pdf.build', out.getvalue())
@@ -1,25 +1,54 @@
 import functools
+import hashlib
+import io
 import mock
 import os
 import pathlib
 import PyPDF2 as pypdf
+import re
+import tempfile
 import unittest
 import apsjournals
+from apsjournals import api, pdf
+from apsjournals.web import scrapers
 from apsjournals.web.constants import EndPoint
 from tests.test_api import get_aps_static
 
 
-_PDF_NUM = 0
 PDF_ROOT = pathlib.Path(__file__).parent / 'static' / 'pdfs'
 
 
 def mock_download_pdf(pdf_url: str, out_file: str):
-    global _PDF_NUM
-    pdf_file = PDF_ROOT / ('a b c'.split()[_PDF_NUM % 3] + '.pdf')
+    # downloads run concurrently, so pick the static pdf from the article position
+    # encoded in the file name rather than from the order of the calls
+    num = int(os.path.basename(out_file).split(' ')[0])
+    pdf_file = PDF_ROOT / ('a b c'.split()[num % 3] + '.pdf')
     with open(pdf_file.as_posix(), 'rb') as in_file:
-        with open(out_file, 'wb') as fid:
-            fid.write(in_file.read())
-    _PDF_NUM += 1
+        data = in_file.read()
+    with open(out_file, 'wb') as fid:
+        fid.write(data)
+    return scrapers.DownloadInfo(pdf_url, out_file, len(data), hashlib.sha256(data).hexdigest())
+
+
+def read_pdf(name: str):
+    """The bytes, a reader and the page tree root reference of a static pdf"""
+    with open((PDF_ROOT / (name + '.pdf')).as_posix(), 'rb') as fid:
+        data = fid.read()
+    reader = pypdf.PdfFileReader(io.BytesIO(data))
+    return data, reader, reader.trailer['/Root'].raw_get('/Pages')
+
+
+def incremental_update(data: bytes, reader, objects: dict, size: int=None) -> bytes:
+    """Append an incremental update to a pdf, (re)defining objects by number, with a classic
+    cross-reference table of one subsection per object"""
+    body, xref = b'', b''
+    for num, obj in sorted(objects.items()):
+        xref += '{:d} 1\n{:010d} 00000 n \n'.format(num, len(data) + len(body)).encode('ascii')
+        body += '{:d} 0 obj\n'.format(num).encode('ascii') + obj + b'\nendobj\n'
+    prev = int(re.findall(rb'startxref\s+(\d+)', data)[-1])
+    trailer = 'trailer\n<< /Size {:d} /Root {:d} 0 R /Prev {:d} >>\nstartxref\n{:d}\n%%EOF\n'.format(
+        size or reader.trailer['/Size'], reader.trailer.raw_get('/Root').idnum, prev, len(data) + len(body))
+    return data + body + b'xref\n' + xref + trailer.encode('ascii')
 
 
 class PdfTests(unittest.TestCase):
@@ -28,8 +57,179 @@ class PdfTests(unittest.TestCase):
             with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)):
                 issue = apsjournals.PRL.issue(121, 6)
             with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Issue)):
-                issue.pdf((PDF_ROOT / 'test.pdf').as_posix())
+                issue.pdf((PDF_ROOT / 'test.pdf').as_posix(), workers=8, rate=1000)
         with open((PDF_ROOT / 'test.pdf').as_posix(), 'rb') as pre_fid:
             reader = pypdf.PdfFileReader(pre_fid)
             self.assertEqual(reader.getNumPages(), 181)
+            outline = reader.getOutlines()
+            self.assertEqual([o.title for o in outline[:3]], ['Cover', 'Contents', 'HIGHLIGHTED ARTICLES'])
+        self.assertFalse((PDF_ROOT / 'pre_test.pdf').exists())
         os.remove((PDF_ROOT / 'test.pdf').as_posix()) # cleanup
+
+    def test_articles_sharing_a_name(self):
+        # a fresh journal, as the titles of the shared apsjournals.PRL articles are left alone
+        journal = api.Journal('PRL', 'prl', 'PRL Desc')
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)):
+            issue = journal.issue(121, 6)
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Issue)):
+            articles = issue.articles
+        articles[1].name = articles[0].name  # a.pdf and b.pdf, see mock_download_pdf
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch('apsjournals.web.scrapers.download_pdf', side_effect=mock_download_pdf):
+            issue.pdf(os.path.join(tmp, 'out.pdf'), workers=8, rate=1000)
+            with open(os.path.join(tmp, 'out.pdf'), 'rb') as fid:
+                reader = pypdf.PdfFileReader(fid)
+                self.assertEqual(reader.getNumPages(), 181)
+                outline = [o for o in reader.getOutlines()[3] if not isinstance(o, list)]
+                first, second = [reader.getDestinationPageNumber(o) for o in outline[:2]]
+                self.assertEqual([o.title for o in outline[:2]], [articles[0].name] * 2)
+                self.assertEqual(second - first, pdf.count_pages((PDF_ROOT / 'a.pdf').as_posix()))
+
+    def test_issue_meta_failures(self):
+        def flaky_download_pdf(pdf_url: str, out_file: str):
+            if pdf_url.endswith('064502'):
+                raise ValueError('download failed')
+            return mock_download_pdf(pdf_url, out_file)
+
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)):
+            issue = apsjournals.PRL.issue(121, 6)
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Issue)):
+            articles = issue.articles
+        with mock.patch('apsjournals.web.scrapers.download_pdf', side_effect=flaky_download_pdf):
+            with tempfile.TemporaryDirectory() as tmp:
+                metas = pdf.get_issue_meta(issue, tmp, workers=8, rate=1000, burst=8)
+        self.assertEqual([m.article for m in metas], articles)
+        failed = [m for m in metas if m.error is not None]
+        self.assertEqual([m.article.name for m in failed], ['Magnetic Levitation Stabilized by Streaming Fluid Flows'] * 2)
+        self.assertTrue(all(m.pages > 0 for m in metas if m.error is None))
+        self.assertTrue(all(len(m.sha256) == 64 for m in metas if m.error is None))
+
+    def test_issue_meta_checkpoint(self):
+        def flaky_download_pdf(pdf_url: str, out_file: str):
+            if pdf_url.endswith('064502'):
+                raise ValueError('download failed')
+            return mock_download_pdf(pdf_url, out_file)
+
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)):
+            issue = apsjournals.PRL.issue(121, 6)
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Issue)):
+            articles = issue.articles
+        with tempfile.TemporaryDirectory() as tmp:
+            with mock.patch('apsjournals.web.scrapers.download_pdf', side_effect=flaky_download_pdf):
+                first = pdf.get_issue_meta(issue, tmp, workers=8, rate=1000, burst=8, checkpoint=pdf.BuildCheckpoint(tmp))
+            checkpoint = pdf.BuildCheckpoint(tmp)  # reloaded from disk
+            self.assertEqual([f['name'] for f in checkpoint.failures], ['Magnetic Levitation Stabilized by Streaming Fluid Flows'] * 2)
+            self.assertIn('download failed', checkpoint.failures[0]['error'])
+
+            # corrupt one verified article, it must be downloaded again along with the failed ones
+            with open(first[1].file, 'ab') as fid:
+                fid.write(b'garbage')
+            with mock.patch('apsjournals.web.scrapers.download_pdf', side_effect=mock_download_pdf) as download:
+                second = pdf.get_issue_meta(issue, tmp, workers=8, rate=1000, burst=8, checkpoint=checkpoint)
+            self.assertEqual(sorted(c[0][0] for c in download.call_args_list), sorted([articles[0].pdf_url] * 2 + [articles[1].pdf_url]))
+            self.assertEqual(checkpoint.failures, [])
+            self.assertTrue(all(m.error is None for m in second))
+            kept = [n for n, m in enumerate(first) if m.error is None and n != 1]
+            self.assertEqual([second[n].sha256 for n in kept], [first[n].sha256 for n in kept])
+
+    def test_count_pages(self):
+        path = (PDF_ROOT / 'a.pdf').as_posix()
+        with open(path, 'rb') as fid:
+            expected = pypdf.PdfFileReader(fid).getNumPages()
+            fid.seek(0)
+            self.assertEqual(pdf.count_pages(fid), expected)
+        self.assertEqual(pdf.count_pages(path), expected)
+        with mock.patch('apsjournals.pdf.probe_page_count', return_value=None):
+            self.assertEqual(pdf.count_pages(path), expected)  # falls back to a full parse
+
+    def test_probe_page_count(self):
+        for name, expected in (('a', 3), ('b', 2), ('c', 4)):
+            self.assertEqual(pdf.probe_page_count((PDF_ROOT / (name + '.pdf')).as_posix()), expected)
+        self.assertIsNone(pdf.probe_page_count(io.BytesIO(b'%PDF-1.3 not a pdf')))
+
+    def test_probe_incremental_update(self):
+        # an incremental update replacing the page tree root, whose table only lists the new object
+        data, reader, pages = read_pdf('a')
+        update = incremental_update(data, reader, {pages.idnum: b'<< /Type /Pages /Kids [] /Count 7 >>'})
+        self.assertEqual(pdf.probe_page_count(io.BytesIO(update)), 7)
+
+    def test_probe_indirect_count(self):
+        # "/Count 47 0 R" must not be read as a count of 4, it is left to the full parse
+        data, reader, pages = read_pdf('a')
+        kids = ' '.join('{:d} 0 R'.format(k.idnum) for k in pages.getObject().raw_get('/Kids')).encode('ascii')
+        count = int(reader.trailer['/Size'])
+        root = b'<< /Type /Pages /Kids [' + kids + b'] /Count %d 0 R >>' % count
+        update = incremental_update(data, reader, {pages.idnum: root, count: b'3'}, size=count + 1)
+        self.assertIn(b'/Count %d 0 R' % count, update)
+        self.assertIsNone(pdf.probe_page_count(io.BytesIO(update)))
+        self.assertEqual(pdf.count_pages(io.BytesIO(update)), 3)
+        direct = incremental_update(data, reader, {pages.idnum: b'<< /Type /Pages /Kids [' + kids + b']/Count 3>>'})
+        self.assertEqual(pdf.probe_page_count(io.BytesIO(direct)), 3)
+
+    def test_kept_work_dir_with_title(self):
+        # a kept work dir used to be created only when there was no title page
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)):
+            issue = apsjournals.PRL.issue(121, 6)
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Issue)):
+            issue.articles
+        with tempfile.TemporaryDirectory() as tmp, mock.patch('apsjournals.web.scrapers.download_pdf', side_effect=mock_download_pdf):
+            out_file, work_dir = os.path.join(tmp, 'out.pdf'), os.path.join(tmp, 'missing', 'work')
+            failed = pdf._compile([(issue, pdf.ApsPDF(issue, out_file))], out_file, title=['Title'], workers=8, rate=1000, work_dir=work_dir)
+            self.assertEqual(failed, [])
+            self.assertTrue(os.path.isfile(os.path.join(work_dir, pdf.BuildCheckpoint.FILE_NAME)))
+            with open(out_file, 'rb') as fid:
+                self.assertEqual(pypdf.PdfFileReader(fid).getNumPages(), 1 + 181)
+
+    def test_compile_issues(self):
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)):
+            issue = apsjournals.PRL.issue(121, 6)
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Issue)):
+            issue.articles
+        with tempfile.TemporaryDirectory() as tmp, mock.patch('apsjournals.web.scrapers.download_pdf', side_effect=mock_download_pdf):
+            out_file = os.path.join(tmp, 'compiled.pdf')
+            failed = pdf.compile_issues([issue, issue], out_file, title=['Physical Review Letters', 'Volume 121'], workers=8, rate=1000)
+            self.assertEqual(failed, [])
+            self.assertEqual(sorted(os.listdir(tmp)), ['compiled.pdf'])  # no partial output or downloads left behind
+            with open(out_file, 'rb') as fid:
+                reader = pypdf.PdfFileReader(fid)
+                self.assertEqual(reader.getNumPages(), 1 + 2 * 181)
+                outline = reader.getOutlines()
+                self.assertEqual([o.title for o in outline if not isinstance(o, list)],
+                                 ['Physical Review Letters Volume 121', 'Issue 6 (10 August 2018)', 'Issue 6 (10 August 2018)'])
+                self.assertEqual([o[0].title for o in outline if isinstance(o, list)], ['Cover', 'Cover'])
+                self.assertEqual([reader.getDestinationPageNumber(o[1]) for o in outline if isinstance(o, list)], [2, 183])
+
+                # the contents of each issue link to the pages the outline points to
+                def flatten(items):
+                    for item in items:
+                        yield from flatten(item) if isinstance(item, list) else [item]
+                names = {a.name for a in issue.articles}
+                bookmarked = [reader.getDestinationPageNumber(o) for o in flatten(outline) if o.title in names]
+                pages = {p.indirectRef.idnum: n for n, p in enumerate(reader.pages)}
+                dests = reader.trailer['/Root']['/Dests']
+                linked = [pages[dests[a.getObject()['/Dest']][0].idnum] for n in range(reader.getNumPages())
+                          for a in reader.getPage(n).get('/Annots', []) if '/Dest' in a.getObject()]
+                self.assertEqual(len(bookmarked), 2 * len(issue.articles))
+                self.assertEqual(linked, bookmarked)
+
+    def test_contents_layout(self):
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)):
+            issue = apsjournals.PRL.issue(121, 6)
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Issue)):
+            articles = issue.articles
+        meta_cache = {n: pdf.ArticleMeta(a, None, 1 + n % 3, None, None) for n, a in enumerate(articles) if n % 5}
+        doc = pdf.ApsPDF(issue, None)
+        blocks, contents_pages = doc._layout_contents(meta_cache)
+        self.assertTrue(all(b.y + b.h <= doc.page_break_trigger for b in blocks))
+        doc.add_page_cover()
+        doc.add_page_contents(meta_cache, offset=10)
+        self.assertEqual(doc.page_no(), 1 + contents_pages)
+        self.assertGreater(contents_pages, 1)
+
+        # each article entry links to its first page, following the exact number of contents pages
+        entries = [meta_cache[n] for n in range(len(articles)) if n in meta_cache]
+        first = 10 + 1 + contents_pages
+        self.assertEqual([l.target_page for l in doc._meta_links], [first + sum(m.pages for m in entries[:n]) for n in range(len(entries))])
+        self.assertEqual({l.source_page for l in doc._meta_links}, set(range(1, 1 + contents_pages)))
+        x0, y0, x1, y1 = doc.link_rect(doc._meta_links[0])
+        self.assertTrue(0 < x0 < x1 <= doc.w * doc.k and 0 < y0 < y1 <= doc.h * doc.k)
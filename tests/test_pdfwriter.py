@@ -0,0 +1,57 @@
+import io
+import unittest
+import PyPDF2 as pypdf
+from apsjournals import pdfwriter
+from tests.test_pdf import PDF_ROOT
+
+
+class StreamingPdfWriterTests(unittest.TestCase):
+    def setUp(self):
+        self.sources = [(PDF_ROOT / (n + '.pdf')).as_posix() for n in 'abc']
+        self.out = io.BytesIO()
+        with pdfwriter.StreamingPdfWriter(self.out, producer='tests') as writer:
+            writer.add_link(1, (10, 20, 110, 40), 6)
+            self.firsts = [writer.append(self.sources[0])]
+            with self.assertRaises(ValueError):
+                writer.add_link(0, (10, 20, 110, 40), 6)  # already written
+            self.firsts.extend(writer.append(s) for s in self.sources[1:])
+            for n, first in enumerate(self.firsts):
+                parent = writer.add_bookmark('abc'[n], first)
+                writer.add_bookmark('first page', first, parent=parent)
+            writer.add_bookmark('empty', writer.num_pages)
+        self.reader = pypdf.PdfFileReader(io.BytesIO(self.out.getvalue()), strict=True)
+
+    def test_pages(self):
+        self.assertEqual(self.firsts, [0, 3, 5])
+        self.assertEqual(self.reader.getNumPages(), 9)
+        page = 0
+        for source in self.sources:
+            with open(source, 'rb') as fid:
+                reader = pypdf.PdfFileReader(fid)
+                for n in range(reader.getNumPages()):
+                    self.assertEqual(self.reader.getPage(page).getContents().getData(), reader.getPage(n).getContents().getData())
+                    self.assertEqual(self.reader.getPage(page).extractText(), reader.getPage(n).extractText())
+                    page += 1
+
+    def test_outline(self):
+        outline = self.reader.getOutlines()
+        self.assertEqual([o.title for o in outline if not isinstance(o, list)], ['a', 'b', 'c', 'empty'])
+        self.assertEqual([o[0].title for o in outline if isinstance(o, list)], ['first page'] * 3)
+        pages = [self.reader.getDestinationPageNumber(o) for o in outline if not isinstance(o, list)]
+        self.assertEqual(pages, [0, 3, 5, 8])
+
+    def test_links(self):
+        annots = [a.getObject() for a in self.reader.getPage(1)['/Annots']]
+        self.assertEqual([[float(v) for v in a['/Rect']] for a in annots], [[10, 20, 110, 40]])
+        dest = self.reader.trailer['/Root']['/Dests'][annots[0]['/Dest']]
+        self.assertEqual(dest[0].idnum, self.reader.getPage(6).indirectRef.idnum)
+        self.assertNotIn('/Annots', self.reader.getPage(0))
+
+    def test_info(self):
+        self.assertEqual(self.reader.getDocumentInfo().producer, 'tests')
+
+    def test_closed(self):
+        writer = pdfwriter.StreamingPdfWriter(io.BytesIO())
+        writer.close()
+        with self.assertRaises(ValueError):
+            writer.append(self.sources[0])
@@ -0,0 +1,135 @@
+import datetime
+import email.utils
+import mock
+import time
+import unittest
+from apsjournals.web import scheduler, scrapers, session
+
+
+def mock_response(status_code=200, headers=None):
+    return mock.Mock(status_code=status_code, headers=headers or {}, content=b'', reason='reason')
+
+
+def make_scheduler(**kwargs):
+    config = dict(scheduler.DEFAULT_CONFIG, rate=100.0, burst=100, max_rate=1000.0, backoff_factor=0.001)
+    config.update(kwargs)
+    return scheduler.Scheduler(**config)
+
+
+class ParseRetryAfterTests(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(scheduler.parse_retry_after('5'), 5.0)
+        self.assertEqual(scheduler.parse_retry_after('-1'), 0.0)
+        self.assertIsNone(scheduler.parse_retry_after(None))
+        self.assertIsNone(scheduler.parse_retry_after('soon'))
+        later = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=30)
+        self.assertAlmostEqual(scheduler.parse_retry_after(email.utils.format_datetime(later)), 30, delta=2)
+        self.assertEqual(scheduler.parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0.0)
+
+
+class SchedulerTests(unittest.TestCase):
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            make_scheduler(min_rate=10, rate=1)
+        with self.assertRaises(ValueError):
+            make_scheduler(decrease=1)
+
+    def test_backoff(self):
+        s = make_scheduler(backoff_factor=1, max_backoff=4)
+        for attempt, (low, high) in enumerate([(0.5, 1), (1, 2), (2, 4), (2, 4)]):
+            for _ in range(20):
+                self.assertTrue(low <= s.backoff(attempt) <= high)
+
+    def test_retry(self):
+        s = make_scheduler()
+        send = mock.Mock(side_effect=[mock_response(503), mock_response(500), mock_response(200)])
+        response = s.send('GET', 'url', send)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(send.call_count, 3)
+        self.assertLess(s.rate, 100)
+
+    def test_retries_exhausted(self):
+        s = make_scheduler(max_retries=2)
+        send = mock.Mock(return_value=mock_response(502))
+        self.assertEqual(s.send('GET', 'url', send).status_code, 502)
+        self.assertEqual(send.call_count, 3)
+
+    def test_no_retry_post(self):
+        s = make_scheduler()
+        send = mock.Mock(return_value=mock_response(503))
+        self.assertEqual(s.send('POST', 'url', send).status_code, 503)
+        self.assertEqual(send.call_count, 1)
+
+    def test_retry_after(self):
+        s = make_scheduler()
+        send = mock.Mock(side_effect=[mock_response(429, {'Retry-After': '0.2'}), mock_response(200)])
+        start = time.monotonic()
+        self.assertEqual(s.send('GET', 'url', send).status_code, 200)
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        start = time.monotonic()
+        s.pause(0.1)
+        s.wait()  # every request waits out the pause
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+
+    def test_retry_after_too_long(self):
+        s = make_scheduler(max_backoff=0.1)
+        send = mock.Mock(return_value=mock_response(503, {'Retry-After': '3600'}))
+        self.assertEqual(s.send('GET', 'url', send).status_code, 503)
+        self.assertEqual(send.call_count, 1)
+        start = time.monotonic()
+        s.wait()
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_adapt(self):
+        s = make_scheduler(rate=10.0, min_rate=1.0, max_rate=10.5, increase=0.2)
+        for _ in range(5):
+            s.send('GET', 'url', lambda: mock_response(200))
+        self.assertEqual(s.rate, 10.5)
+        with self.assertRaises(IOError):
+            s.send('GET', 'url', mock.Mock(side_effect=IOError('connection reset')))
+        self.assertEqual(s.rate, 5.25)
+        s.send('GET', 'url', lambda: mock_response(200))
+        self.assertAlmostEqual(s.rate, 5.45)
+        slow = make_scheduler(rate=10.0, min_rate=4.0, target_latency=-1)
+        slow.send('GET', 'url', lambda: mock_response(200))
+        self.assertEqual(slow.rate, 5.0)
+        time.sleep(0.25)
+        slow.send('GET', 'url', lambda: mock_response(200))
+        self.assertEqual(slow.rate, 4.0)
+
+    def test_one_cut_per_interval(self):
+        s = make_scheduler(rate=1.0, min_rate=0.01)
+        for _ in range(3):
+            s.send('POST', 'url', lambda: mock_response(503))
+        self.assertEqual(s.rate, 0.5)
+
+
+class SharedSchedulerTests(unittest.TestCase):
+    def setUp(self):
+        scheduler.configure(backoff_factor=0.001, max_retries=1)
+
+    def tearDown(self):
+        scheduler.configure(**scheduler.DEFAULT_CONFIG)
+
+    def test_configure(self):
+        s = scheduler.get_scheduler()
+        self.assertIs(s, scheduler.get_scheduler())
+        scheduler.configure(rate=8, max_rate=32)
+        self.assertEqual(scheduler.get_scheduler().rate, 8)
+        with self.assertRaises(ValueError):
+            scheduler.configure(rate=100)  # above max_rate
+        with self.assertRaises(ValueError):
+            scheduler.configure(rates=1)
+        self.assertEqual(scheduler.get_scheduler().rate, 8)
+
+    def test_session_requests(self):
+        responses = [mock_response(503), mock_response(200)]
+        with mock.patch('requests.Session.request', side_effect=responses) as request:
+            self.assertEqual(session.get_session().get('https://journals.aps.org').status_code, 200)
+        self.assertEqual(request.call_count, 2)
+
+    def test_get_aps_refused(self):
+        with mock.patch('requests.Session.request', return_value=mock_response(503)) as request:
+            with self.assertRaises(scrapers.ScrapingError):
+                scrapers.get_aps('https://journals.aps.org/prl/issues/')
+        self.assertEqual(request.call_count, 2)
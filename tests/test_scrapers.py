@@ -1,9 +1,13 @@
 import datetime
 import functools
+import hashlib
+import io
 import mock
+import os
 import pathlib
+import tempfile
 import unittest
-from apsjournals.web import scrapers
+from apsjournals.web import auth, scrapers
 from apsjournals.web.constants import EndPoint
 
 
@@ -71,6 +75,14 @@ class ScraperTests(unittest.TestCase):
             info = s.load(journal='prl', volume=121, issue=6)
             self.assertEqual(info[0], scrapers.IssueInfo(url='https://journals.aps.org/prl/issues/121/1', num=1, label=' 6 July 2018 (010401 — 019901)'))
 
+    def test_journal_index_scraper(self):
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)):
+            s = scrapers.JournalIndexScraper()
+            info = s.load(journal='prl', volume=121)
+        self.assertEqual([v.num for v in info.volumes], list(range(1, 123)[::-1]))
+        self.assertEqual(list(info.issues.keys()), [121])
+        self.assertEqual(info.issues[121][0], scrapers.IssueInfo(url='https://journals.aps.org/prl/issues/121/1', num=1, label=' 6 July 2018 (010401 — 019901)'))
+
     def test_issue_scraper(self):
         with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Issue)):
             s = scrapers.IssueScraper()
@@ -148,3 +160,83 @@ class ScraperTests(unittest.TestCase):
                             scrapers.ArticleInfo(name='Paradox of Contact Angle Selection on Stretched Soft Solids', author='Jacco H. Snoeijer, Etienne Rolley, and Bruno Andreotti', teaser=None, url='https://journals.aps.org/prl/abstract/10.1103/PhysRevLett.121.068003', pdf_url='https://journals.aps.org/prl/pdf/10.1103/PhysRevLett.121.068003')])
                         ]                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                                               
             self.assertEqual(tuple(info), tuple(expected))
+
+
+class BackendTests(unittest.TestCase):
+    """The lxml backend must produce exactly the same info as the scrapy backend"""
+    def assert_equivalent(self, scraper_cls, ep, **kwargs):
+        url = ep.format(**kwargs)
+        for source in (get_aps_static(url, ep), get_aps_static(url, ep).encode('utf-8')):
+            expected = scraper_cls(backend=scrapers.Backend.Scrapy).extract(source, **kwargs)
+            actual = scraper_cls(backend=scrapers.Backend.Lxml).extract(source, **kwargs)
+            self.assertEqual(actual, expected)
+            self.assertTrue(all(type(x) is type(y) for x, y in zip(actual, expected)))
+
+    def test_volume_index(self):
+        self.assert_equivalent(scrapers.VolumeIndexScraper, EndPoint.Volume, journal='prl', volume=None)
+
+    def test_issue_index(self):
+        self.assert_equivalent(scrapers.IssueIndexScraper, EndPoint.Volume, journal='prl', volume=121)
+
+    def test_journal_index(self):
+        self.assert_equivalent(scrapers.JournalIndexScraper, EndPoint.Volume, journal='prl', volume=121)
+
+    def test_issue(self):
+        self.assert_equivalent(scrapers.IssueScraper, EndPoint.Issue, journal='prl', volume=121, issue=6)
+
+    def test_empty_issue(self):
+        self.assertEqual(scrapers.IssueScraper(backend='lxml').extract('<html></html>'), [])
+
+    def test_default_backend(self):
+        scrapers.set_default_backend('lxml')
+        try:
+            self.assertEqual(scrapers.IssueScraper().backend, scrapers.Backend.Lxml)
+        finally:
+            scrapers.set_default_backend(scrapers.Backend.Scrapy)
+        with self.assertRaises(ValueError):
+            scrapers.IssueScraper(backend='bs4')
+
+
+class DownloadTests(unittest.TestCase):
+    def setUp(self):
+        self.data = b'%PDF-1.4 ' + 100 * b'x'
+        self.response = mock.Mock(status_code=200, url='url', headers={'Content-Type': 'application/pdf'}, history=[])
+        self.response.iter_content.side_effect = lambda chunk_size: (self.data[i:i + chunk_size] for i in range(0, len(self.data), chunk_size))
+        self.patches = [mock.patch('apsjournals.web.auth.require_authentication'),
+                        mock.patch('apsjournals.web.session.get_session')]
+        for p in self.patches:
+            p.start()
+        scrapers.session.get_session.return_value.get.return_value = self.response
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_download_to_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'a.pdf')
+            info = scrapers.download_pdf('url', out_file=path, chunk_size=16)
+            with open(path, 'rb') as fid:
+                self.assertEqual(fid.read(), self.data)
+            self.assertEqual(os.listdir(tmp), ['a.pdf'])
+        self.assertEqual(info, scrapers.DownloadInfo('url', path, len(self.data), hashlib.sha256(self.data).hexdigest()))
+        self.assertTrue(self.response.close.called)
+
+    def test_download_to_buffer(self):
+        buffer = io.BytesIO()
+        info = scrapers.download_pdf('url', out_file=buffer)
+        self.assertEqual(buffer.getvalue(), self.data)
+        self.assertEqual(info.size, len(self.data))
+
+    def test_failed_download(self):
+        self.response.iter_content.side_effect = IOError('connection reset')
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.assertRaises(IOError):
+                scrapers.download_pdf('url', out_file=os.path.join(tmp, 'a.pdf'))
+            self.assertEqual(os.listdir(tmp), [])
+        self.response.status_code = 404
+        with self.assertRaises(scrapers.ScrapingError):
+            scrapers.download_pdf('url', out_file=io.BytesIO())
+        self.response.status_code = 403  # refused, and there are no credentials to log in again with
+        with self.assertRaises(auth.AuthenticationError):
+            scrapers.download_pdf('url', out_file=io.BytesIO())
@@ -0,0 +1,77 @@
+import collections
+import functools
+import mock
+import os
+import tempfile
+import unittest
+from apsjournals import api, search
+from apsjournals.web.constants import EndPoint
+from tests.test_scrapers import get_aps_static
+
+
+class TokenizeTests(unittest.TestCase):
+    def test_tokenize(self):
+        self.assertEqual(search.tokenize("Schrödinger's Cat-State, 2D"), ['schrodinger', 's', 'cat', 'state', '2d'])
+        self.assertEqual(search.tokenize(None), [])
+
+
+class SearchIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'index.json')
+        j = api.Journal('PRL', 'prl')
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)):
+            self.issue = j.issue(121, 6)
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Issue)):
+            self.articles = self.issue.articles
+        self.unique = list(collections.OrderedDict((a.url, a) for a in self.articles).values())
+        self.index = search.SearchIndex(self.path)
+        self.index.add_issue(self.issue)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_add_issue(self):
+        self.assertEqual(len(self.index), len(self.unique))
+        self.assertLess(len(self.unique), len(self.articles))  # highlighted articles are listed twice
+        self.assertIn(self.issue, self.index)
+        self.assertEqual(self.index.add_issue(self.issue), 0)
+
+    def test_update_skips_unloaded(self):
+        index = search.SearchIndex()
+        unloaded = api.Issue(vol=self.issue.vol, num=7)
+        with mock.patch('apsjournals.web.scrapers.get_aps') as get:
+            self.assertEqual(index.update([unloaded, self.issue]), len(self.unique))
+        get.assert_not_called()
+        self.assertNotIn(unloaded, index)
+
+    def test_search_author(self):
+        docs = self.index.search(author='Fairhurst')
+        self.assertEqual([d.title for d in docs], ['Magnetic Levitation Stabilized by Streaming Fluid Flows'])
+        self.assertIn('D.J. Fairhurst', docs[0].authors)
+        self.assertEqual((docs[0].journal, docs[0].volume, docs[0].issue), ('prl', 121, 6))
+
+    def test_search_text(self):
+        docs = self.index.search(text='levitation streaming')
+        self.assertEqual(len(docs), 1)
+        self.assertEqual(self.index.search(text='levitation nonexistentword'), [])
+        expected = [a.name for a in self.unique if 'quantum' in search.tokenize(a.name) + search.tokenize(a.teaser)]
+        self.assertEqual([d.title for d in self.index.search(text='Quantum')], expected)
+
+    def test_filters(self):
+        self.assertEqual(len(self.index.search(journal='prl', volumes=(120, 121))), len(self.unique))
+        self.assertEqual(self.index.search(author='Fairhurst', volumes=(95, 100)), [])
+        self.assertEqual(self.index.search(author='Fairhurst', journal='prd'), [])
+        self.assertEqual(len(self.index.search(author='Fairhurst', journal=self.issue.journal)), 1)
+
+    def test_persistence(self):
+        self.index.save()
+        loaded = search.SearchIndex(self.path)
+        self.assertEqual(len(loaded), len(self.index))
+        self.assertIn(self.issue, loaded)
+        self.assertEqual(loaded.search(author='Fairhurst'), self.index.search(author='Fairhurst'))
+        self.assertEqual(loaded.search(text='quantum'), self.index.search(text='quantum'))
+
+    def test_save_without_path(self):
+        with self.assertRaises(ValueError):
+            search.SearchIndex().save()
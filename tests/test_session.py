@@ -0,0 +1,35 @@
+import mock
+import unittest
+from apsjournals.web import auth, scrapers, session
+
+
+class SessionTests(unittest.TestCase):
+    def tearDown(self):
+        session.configure(**session.DEFAULT_CONFIG)
+
+    def test_shared(self):
+        self.assertIs(session.get_session(), session.get_session())
+
+    def test_configure(self):
+        session.get_session().cookies.set('auth_token', 'abc')
+        session.configure(pool_maxsize=2, timeout=5)
+        s = session.get_session()
+        self.assertEqual(s.timeout, 5)
+        self.assertEqual(s.get_adapter('https://journals.aps.org')._pool_maxsize, 2)
+        self.assertEqual(s.cookies.get('auth_token'), 'abc')
+        with self.assertRaises(ValueError):
+            session.configure(pool_size=2)
+
+    def test_default_timeout(self):
+        with mock.patch('requests.Session.request') as request:
+            session.get_session().get('https://journals.aps.org')
+        self.assertEqual(request.call_args[1]['timeout'], session.DEFAULT_CONFIG['timeout'])
+
+    def test_get_aps_uses_session(self):
+        with mock.patch.object(session.get_session(), 'get') as get:
+            get.return_value.content = b'page'
+            self.assertEqual(scrapers.get_aps('https://journals.aps.org/prl/issues/'), b'page')
+
+    def test_download_requires_auth(self):
+        with self.assertRaises(auth.AuthenticationError):
+            scrapers.download_pdf('https://journals.aps.org/prl/pdf/x', out_file='x.pdf')
@@ -0,0 +1,149 @@
+import functools
+import hashlib
+import io
+import mock
+import os
+import tempfile
+import unittest
+import apsjournals
+from apsjournals import pdf
+from apsjournals.web import scrapers, store
+from apsjournals.web.constants import EndPoint
+from tests.test_pdf import PDF_ROOT, mock_download_pdf
+from tests.test_scrapers import get_aps_static
+
+
+def fake_download_pdf(pdf_url: str, out_file: str):
+    data = ('%PDF ' + pdf_url.split('/')[-1]).encode('ascii') * 20
+    with open(out_file, 'wb') as fid:
+        fid.write(data)
+    return scrapers.DownloadInfo(pdf_url, out_file, len(data), hashlib.sha256(data).hexdigest())
+
+
+def static_download_pdf(pdf_url: str, out_file: str):
+    # a real pdf, chosen from the url so that the same article always has the same content
+    with open((PDF_ROOT / ('a b c'.split()[sum(pdf_url.encode()) % 3] + '.pdf')).as_posix(), 'rb') as fid:
+        data = fid.read()
+    with open(out_file, 'wb') as fid:
+        fid.write(data)
+    return scrapers.DownloadInfo(pdf_url, out_file, len(data), hashlib.sha256(data).hexdigest())
+
+
+def unique_download_pdf(pdf_url: str, out_file: str):
+    # a real pdf whose content is unique to the url, so that no two articles share a stored object
+    static_download_pdf(pdf_url, out_file)
+    with open(out_file, 'ab') as fid:
+        fid.write(b'%' + pdf_url.encode('ascii') + b'\n')
+    with open(out_file, 'rb') as fid:
+        data = fid.read()
+    return scrapers.DownloadInfo(pdf_url, out_file, len(data), hashlib.sha256(data).hexdigest())
+
+
+class PdfStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = store.PdfStore(os.path.join(self.tmp.name, 'store'))
+        self.out = os.path.join(self.tmp.name, 'out.pdf')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def fetch(self, s, url, out_file):
+        with mock.patch('apsjournals.web.scrapers.download_pdf', side_effect=fake_download_pdf) as download:
+            info = s.fetch(url, out_file)
+        return info, download.call_count
+
+    def test_fetch_once(self):
+        info, calls = self.fetch(self.store, 'http://x/pdf/a', self.out)
+        self.assertEqual(calls, 1)
+        self.assertIn('http://x/pdf/a', self.store)
+        os.remove(self.out)
+        again, calls = self.fetch(self.store, 'http://x/pdf/a', self.out)
+        self.assertEqual(calls, 0)
+        self.assertEqual((again.size, again.sha256), (info.size, info.sha256))
+        with open(self.out, 'rb') as fid:
+            self.assertEqual(hashlib.sha256(fid.read()).hexdigest(), info.sha256)
+        self.assertEqual(os.stat(self.out).st_ino, os.stat(self.store.get('http://x/pdf/a').path).st_ino)
+
+    def test_modified_link(self):
+        info, _ = self.fetch(self.store, 'http://x/pdf/a', self.out)
+        with open(self.out, 'r+b') as fid:  # same size, in place, so through the link into the store
+            fid.write(b'%XXX')
+        self.assertIsNone(self.store.get('http://x/pdf/a'))
+        self.assertNotIn('http://x/pdf/a', self.store)
+        os.remove(self.out)
+        again, calls = self.fetch(self.store, 'http://x/pdf/a', self.out)
+        self.assertEqual(calls, 1)
+        self.assertEqual(again.sha256, info.sha256)
+        self.assertEqual(self.store.get('http://x/pdf/a').sha256, info.sha256)
+
+    def test_copy(self):
+        s = store.PdfStore(os.path.join(self.tmp.name, 'copies'), link=False)
+        self.fetch(s, 'http://x/pdf/a', self.out)
+        self.assertNotEqual(os.stat(self.out).st_ino, os.stat(s.get('http://x/pdf/a').path).st_ino)
+
+    def test_file_object(self):
+        out = io.BytesIO()
+        info, _ = self.fetch(self.store, 'http://x/pdf/a', out)
+        self.assertEqual(hashlib.sha256(out.getvalue()).hexdigest(), info.sha256)
+
+    def test_content_addressed(self):
+        self.fetch(self.store, 'http://x/pdf/a', self.out)
+        self.fetch(self.store, 'http://y/pdf/a', self.out)  # same content, different url
+        self.assertEqual(len(os.listdir(os.path.join(self.store.path, 'objects'))), 1)
+        self.assertEqual(self.store.get('http://x/pdf/a').path, self.store.get('http://y/pdf/a').path)
+
+    def test_lru_eviction(self):
+        s = store.PdfStore(os.path.join(self.tmp.name, 'capped'), max_bytes=300)
+        a, _ = self.fetch(s, 'http://x/pdf/a', self.out)
+        b, _ = self.fetch(s, 'http://x/pdf/b', self.out)
+        os.utime(s.get('http://x/pdf/a').path, (1, 1))
+        os.utime(s.get('http://x/pdf/b').path, (2, 2))
+        s.get('http://x/pdf/a')  # now the most recently used
+        self.fetch(s, 'http://x/pdf/c', self.out)
+        self.assertIn('http://x/pdf/a', s)
+        self.assertNotIn('http://x/pdf/b', s)
+        self.assertIn('http://x/pdf/c', s)
+        self.assertLessEqual(s.size(), 300)
+
+    def test_clear(self):
+        self.fetch(self.store, 'http://x/pdf/a', self.out)
+        self.store.clear()
+        self.assertNotIn('http://x/pdf/a', self.store)
+        self.assertEqual(self.store.size(), 0)
+
+
+class DefaultStoreTests(unittest.TestCase):
+    def test_issue_meta_reuses_store(self):
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)):
+            issue = apsjournals.PRL.issue(121, 6)
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Issue)):
+            articles = issue.articles
+        with tempfile.TemporaryDirectory() as tmp, mock.patch('apsjournals.web.store._DEFAULT_STORE', store.PdfStore(os.path.join(tmp, 'store'))):
+            with mock.patch('apsjournals.web.scrapers.download_pdf', side_effect=static_download_pdf) as download:
+                first = pdf.get_issue_meta(issue, os.path.join(tmp, 'first'), workers=1, rate=1000)
+            self.assertEqual(download.call_count, len({a.pdf_url for a in articles}))
+            with mock.patch('apsjournals.web.scrapers.download_pdf', side_effect=mock_download_pdf) as download, \
+                    mock.patch('apsjournals.web.store._sha256', side_effect=store._sha256) as sha256:
+                second = pdf.get_issue_meta(issue, os.path.join(tmp, 'second'), workers=4, rate=1e-3)
+            download.assert_not_called()
+            self.assertEqual(sha256.call_count, len(articles))  # each stored pdf is verified once
+        self.assertTrue(all(m.error is None for m in first + second))
+        self.assertEqual([(m.pages, m.sha256) for m in first], [(m.pages, m.sha256) for m in second])
+
+    def test_corrupt_work_dir_not_reused(self):
+        # a build writing into a linked work dir file in place must not corrupt later builds
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)):
+            issue = apsjournals.PRL.issue(121, 6)
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Issue)):
+            articles = issue.articles
+        with tempfile.TemporaryDirectory() as tmp, mock.patch('apsjournals.web.store._DEFAULT_STORE', store.PdfStore(os.path.join(tmp, 'store'))):
+            with mock.patch('apsjournals.web.scrapers.download_pdf', side_effect=unique_download_pdf):
+                first = pdf.get_issue_meta(issue, os.path.join(tmp, 'first'), workers=1, rate=1000)
+            with open(first[1].file, 'r+b') as fid:
+                fid.write(b'%XXX')  # same size
+            with mock.patch('apsjournals.web.scrapers.download_pdf', side_effect=unique_download_pdf) as download:
+                second = pdf.get_issue_meta(issue, os.path.join(tmp, 'second'), workers=1, rate=1000)
+            self.assertEqual([c[0][0] for c in download.call_args_list], [articles[1].pdf_url])
+        self.assertEqual([m.sha256 for m in second], [m.sha256 for m in first])
+        self.assertEqual(len(second), len(articles))
@@ -0,0 +1,76 @@
+import collections
+import datetime
+import functools
+import json
+import mock
+import os
+import tempfile
+import unittest
+from apsjournals import api, sync
+from apsjournals.web import scrapers
+from apsjournals.web.constants import EndPoint
+from tests.test_scrapers import get_aps_static
+
+
+def index_info(volumes: int, issues: dict):
+    """Build a journal index with volumes 1 to `volumes`, expanding the given issue counts"""
+    vols = [scrapers.VolumeInfo('/prl/issues/{:d}'.format(v), v, datetime.date(2018, 1, 1), datetime.date(2018, 6, 1)) for v in range(volumes, 0, -1)]
+    expanded = collections.OrderedDict((v, [scrapers.IssueInfo('/prl/issues/{:d}/{:d}'.format(v, i), i, '') for i in range(1, n + 1)])
+                                       for v, n in issues.items())
+    return scrapers.JournalIndexInfo(volumes=vols, issues=expanded)
+
+
+class SyncTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'state.json')
+        self.j = api.Journal('PRL', 'prl')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_first_sync(self):
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)) as get:
+            found = sync.sync(self.path, journals=[self.j])
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual([i.num for i in found[self.j]], list(range(1, 27)))
+        self.assertIs(found[self.j][5], self.j.issue(121, 6))
+        with open(self.path) as fid:
+            self.assertEqual(json.load(fid), {'prl': [121, 26]})
+
+    def test_since_watermark(self):
+        state = sync.CrawlState()
+        state._marks['prl'] = sync.Watermark(121, 20)
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)) as get:
+            issues = sync.new_issues(self.j, state)
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual([i.num for i in issues], list(range(21, 27)))
+        self.assertEqual(state.get(self.j), sync.Watermark(121, 20))  # new_issues does not update the state
+
+    def test_new_volume(self):
+        state = sync.CrawlState(self.path)
+        pages = {None: index_info(3, {3: 2}), 2: index_info(3, {2: 27})}
+        with mock.patch('apsjournals.web.scrapers.JournalIndexScraper.load', side_effect=lambda journal, volume=None: pages[volume]) as load:
+            self.j._load_index(volume=2)
+            cached = self.j.issue(2, 26)
+            state.mark(cached)
+            found = sync.sync(state, journals=[self.j])
+        self.assertEqual([(i.vol.num, i.num) for i in found[self.j]], [(2, 27), (3, 1), (3, 2)])
+        self.assertIs(self.j.issue(2, 26), cached)
+        self.assertEqual(load.call_count, 3)
+        self.assertEqual(sync.CrawlState(self.path).get(self.j), sync.Watermark(3, 2))
+
+    def test_nothing_new(self):
+        state = sync.CrawlState()
+        state._marks['prl'] = sync.Watermark(121, 26)
+        with mock.patch('apsjournals.web.scrapers.get_aps', side_effect=functools.partial(get_aps_static, ep=EndPoint.Volume)):
+            self.assertEqual(sync.sync(state, journals=[self.j]), {self.j: []})
+        self.assertEqual(state.get(self.j), sync.Watermark(121, 26))
+
+    def test_mark_never_moves_back(self):
+        state = sync.CrawlState()
+        v = api.Volume(journal=self.j, num=121, start=None, end=None)
+        state.mark(api.Issue(vol=v, num=6))
+        state.mark(api.Issue(vol=v, num=2))
+        self.assertEqual(state.get(self.j), sync.Watermark(121, 6))
+        self.assertIn(self.j, state)
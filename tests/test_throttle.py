@@ -0,0 +1,23 @@
+import time
+import unittest
+from apsjournals.web import throttle
+
+
+class TokenBucketTests(unittest.TestCase):
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            throttle.TokenBucket(rate=0)
+        with self.assertRaises(ValueError):
+            throttle.TokenBucket(rate=1, capacity=0)
+
+    def test_burst(self):
+        bucket = throttle.TokenBucket(rate=0.001, capacity=3)
+        self.assertTrue(all(bucket.try_acquire() for _ in range(3)))
+        self.assertFalse(bucket.try_acquire())
+
+    def test_acquire_waits(self):
+        bucket = throttle.TokenBucket(rate=20, capacity=1)
+        start = time.monotonic()
+        for _ in range(3):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)